@@ -0,0 +1,119 @@
+from sqlalchemy import text
+
+# Net change in unsold inventory per (product, distribution center) for the rows touched by a statement.
+# {rows} is filled in with the transition-table SELECTs available to each trigger.
+_APPLY_DELTAS = """
+    WITH deltas AS (
+        {rows}
+    ),
+    per_center AS (
+        SELECT product_id, distribution_center_id, SUM(delta) AS delta
+        FROM deltas
+        GROUP BY product_id, distribution_center_id
+        HAVING SUM(delta) <> 0
+    ),
+    center_upsert AS (
+        INSERT INTO product_dc_availability (product_id, distribution_center_id, available_count)
+        SELECT product_id, distribution_center_id, delta
+        FROM per_center
+        ORDER BY product_id, distribution_center_id
+        ON CONFLICT (product_id, distribution_center_id)
+        DO UPDATE SET available_count = product_dc_availability.available_count + EXCLUDED.available_count
+    )
+    INSERT INTO product_availability (product_id, available_count)
+    SELECT product_id, SUM(delta)
+    FROM per_center
+    GROUP BY product_id
+    HAVING SUM(delta) <> 0
+    ORDER BY product_id
+    ON CONFLICT (product_id)
+    DO UPDATE SET available_count = product_availability.available_count + EXCLUDED.available_count;
+"""
+
+_NEW_ROWS = """
+        SELECT product_id, COALESCE(product_distribution_center_id, 0) AS distribution_center_id, 1 AS delta
+        FROM new_rows
+        WHERE sold_at IS NULL AND product_id IS NOT NULL"""
+
+_OLD_ROWS = """
+        SELECT product_id, COALESCE(product_distribution_center_id, 0) AS distribution_center_id, -1 AS delta
+        FROM old_rows
+        WHERE sold_at IS NULL AND product_id IS NOT NULL"""
+
+def _trigger_function(name: str, rows: str) -> str:
+    return f"""
+CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$
+BEGIN
+    {_APPLY_DELTAS.format(rows=rows)}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Statement-level triggers with transition tables, so bulk inserts and COPY
+# cost one aggregated upsert per statement instead of one per row
+AVAILABILITY_TRIGGER_DDL = [
+    _trigger_function("inventory_availability_on_insert", _NEW_ROWS),
+    _trigger_function("inventory_availability_on_update", _NEW_ROWS + "\n        UNION ALL" + _OLD_ROWS),
+    _trigger_function("inventory_availability_on_delete", _OLD_ROWS),
+    "DROP TRIGGER IF EXISTS inventory_availability_insert ON inventory_items",
+    """
+CREATE TRIGGER inventory_availability_insert
+AFTER INSERT ON inventory_items
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION inventory_availability_on_insert()
+""",
+    "DROP TRIGGER IF EXISTS inventory_availability_update ON inventory_items",
+    """
+CREATE TRIGGER inventory_availability_update
+AFTER UPDATE ON inventory_items
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION inventory_availability_on_update()
+""",
+    "DROP TRIGGER IF EXISTS inventory_availability_delete ON inventory_items",
+    """
+CREATE TRIGGER inventory_availability_delete
+AFTER DELETE ON inventory_items
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION inventory_availability_on_delete()
+""",
+]
+
+AVAILABILITY_TRIGGER_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS inventory_availability_insert ON inventory_items",
+    "DROP TRIGGER IF EXISTS inventory_availability_update ON inventory_items",
+    "DROP TRIGGER IF EXISTS inventory_availability_delete ON inventory_items",
+    "DROP FUNCTION IF EXISTS inventory_availability_on_insert()",
+    "DROP FUNCTION IF EXISTS inventory_availability_on_update()",
+    "DROP FUNCTION IF EXISTS inventory_availability_on_delete()",
+]
+
+def install_availability_triggers(target, connection, **kw):
+    """Create the triggers that maintain product availability (PostgreSQL only)"""
+    if connection.dialect.name != "postgresql":
+        return
+    for statement in AVAILABILITY_TRIGGER_DDL:
+        connection.execute(text(statement))
+
+def rebuild_product_availability(connection):
+    """Recompute the availability summary tables from inventory_items.
+
+    Used after bulk loads; blocks inventory writes until the surrounding transaction commits.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("LOCK TABLE inventory_items IN SHARE MODE"))
+    connection.execute(text("DELETE FROM product_availability"))
+    connection.execute(text("DELETE FROM product_dc_availability"))
+    connection.execute(text("""
+        INSERT INTO product_dc_availability (product_id, distribution_center_id, available_count)
+        SELECT product_id, COALESCE(product_distribution_center_id, 0), COUNT(*)
+        FROM inventory_items
+        WHERE sold_at IS NULL AND product_id IS NOT NULL
+        GROUP BY product_id, COALESCE(product_distribution_center_id, 0)
+    """))
+    connection.execute(text("""
+        INSERT INTO product_availability (product_id, available_count)
+        SELECT product_id, SUM(available_count)
+        FROM product_dc_availability
+        GROUP BY product_id
+    """))
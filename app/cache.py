@@ -0,0 +1,192 @@
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # redis is only needed for the shared cache backend
+    redis_asyncio = None
+
+load_dotenv()
+
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+class TTLCache:
+    """Bounded in-process cache with LRU eviction and per-entry expiry"""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+class RedisCache:
+    """Cache shared by all workers, stored as JSON in Redis under a per-cache prefix"""
+
+    def __init__(self, name: str, url: str, ttl: float = 300):
+        if redis_asyncio is None:
+            raise RuntimeError("The redis package is required when CACHE_REDIS_URL is set")
+        self.name = name
+        self.ttl = ttl
+        self.prefix = f"chatbot:{name}:"
+        self.client = redis_asyncio.from_url(url)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = await self.client.get(self.prefix + key)
+        except Exception as e:
+            print(f"Redis cache error ({self.name}): {e}")
+            self.errors += 1
+            raw = None
+
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        try:
+            await self.client.set(
+                self.prefix + key,
+                json.dumps(value, default=str),
+                px=int((self.ttl if ttl is None else ttl) * 1000)
+            )
+        except Exception as e:
+            print(f"Redis cache error ({self.name}): {e}")
+            self.errors += 1
+
+    async def delete(self, key: str):
+        try:
+            await self.client.delete(self.prefix + key)
+        except Exception as e:
+            print(f"Redis cache error ({self.name}): {e}")
+            self.errors += 1
+
+    async def clear(self):
+        try:
+            async for key in self.client.scan_iter(match=self.prefix + "*"):
+                await self.client.delete(key)
+        except Exception as e:
+            print(f"Redis cache error ({self.name}): {e}")
+            self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+class TieredCache:
+    """Per-worker TTLCache in front of a shared RedisCache"""
+
+    def __init__(self, local: TTLCache, shared: RedisCache):
+        self.name = local.name
+        self.local = local
+        self.shared = shared
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.local.get(key)
+        if value is not None:
+            return value
+        value = await self.shared.get(key)
+        if value is not None:
+            await self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        await self.local.set(key, value, ttl)
+        await self.shared.set(key, value, ttl)
+
+    async def delete(self, key: str):
+        await self.local.delete(key)
+        await self.shared.delete(key)
+
+    async def clear(self):
+        await self.local.clear()
+        await self.shared.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "tiered", "local": self.local.stats(), "shared": self.shared.stats()}
+
+def make_cache(name: str, maxsize: int, ttl: float):
+    """Build a cache, shared across workers through Redis when CACHE_REDIS_URL is set"""
+    local = TTLCache(name, maxsize=maxsize, ttl=ttl)
+    if not CACHE_REDIS_URL:
+        return local
+    try:
+        return TieredCache(local, RedisCache(name, CACHE_REDIS_URL, ttl=ttl))
+    except RuntimeError as e:
+        print(f"Falling back to in-process cache for {name}: {e}")
+        return local
+
+ID_PATTERN = re.compile(
+    r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"  # UUIDs
+    r"|\b[a-z]*\d[a-z0-9-]*\b"  # numbers and SKU-like tokens containing digits
+)
+
+def normalize_message(message: str) -> str:
+    """Normalize a message for cache lookups: lowercase, drop ids and numbers, punctuation and extra spaces"""
+    normalized = ID_PATTERN.sub(" ", message.lower())
+    normalized = re.sub(r"[^a-z\s]", " ", normalized)
+    return " ".join(normalized.split())
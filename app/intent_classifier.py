@@ -0,0 +1,189 @@
+import math
+import re
+from collections import OrderedDict, defaultdict
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import ChatMessage
+
+QUERY_TYPES = [
+    "product_search",
+    "order_status",
+    "user_orders",
+    "inventory_check",
+    "top_products",
+    "general_help",
+]
+
+# Hand-written examples so the classifier is useful before any chats are stored
+SEED_EXAMPLES = {
+    "product_search": [
+        "do you have any shirts",
+        "show me nike shoes",
+        "what pants do you sell",
+        "i am looking for a dress",
+        "what brands of jackets do you carry",
+        "do you sell adidas products",
+        "how much are the levi jeans",
+        "find me sweaters for women",
+        "what accessories do you have",
+        "price of calvin klein shirts",
+        "show me products in the men department",
+    ],
+    "order_status": [
+        "where is my order",
+        "what is the status of order 12345",
+        "has my order shipped yet",
+        "when will my package be delivered",
+        "track my order",
+        "order 5521 status",
+        "is order #884 delivered",
+        "my order has not arrived",
+        "tracking information for my shipment",
+        "when does my order ship",
+    ],
+    "user_orders": [
+        "show my order history",
+        "what have i ordered before",
+        "list all my orders",
+        "my past purchases",
+        "how many orders have i placed",
+        "orders for user 42",
+        "show me my previous orders",
+        "what did i buy last month",
+    ],
+    "inventory_check": [
+        "is this item in stock",
+        "how many of sku abc123 are available",
+        "is product 1234 available",
+        "do you have this in stock",
+        "check stock for this product",
+        "is the item still available",
+        "how many units are left",
+        "when will this be back in stock",
+    ],
+    "top_products": [
+        "what is trending",
+        "what are your best sellers",
+        "most popular products",
+        "what's hot right now",
+        "top selling items",
+        "what do most people buy",
+        "show me popular shirts",
+        "recommend your bestselling products",
+    ],
+    "general_help": [
+        "hello",
+        "hi there",
+        "thanks for your help",
+        "what is your return policy",
+        "how do i contact support",
+        "can i change my password",
+        "do you offer free shipping",
+        "how do i apply a discount code",
+        "i need help",
+        "what payment methods do you accept",
+    ],
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z]+|\d+")
+
+# Label sources (chat_messages.query_type_source) to train on. Labels the classifier
+# predicted itself would only reinforce its own mistakes.
+TRAINING_SOURCES = ("llm", "cache")
+
+class IntentClassifier:
+    """Multinomial naive Bayes over word n-grams and extracted entities.
+
+    Counts are updated incrementally, so labels produced by the LLM fallback
+    can be learned from without retraining. The vocabulary holds at most
+    max_vocabulary features; the least recently seen one is forgotten first.
+    """
+
+    def __init__(self, alpha: float = 0.5, max_vocabulary: int = 50000):
+        self.alpha = alpha
+        self.max_vocabulary = max_vocabulary
+        self.class_counts: Dict[str, int] = defaultdict(int)
+        self.feature_counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.feature_totals: Dict[str, int] = defaultdict(int)
+        # Feature -> None, least recently seen first
+        self.vocabulary: OrderedDict = OrderedDict()
+        self.fit(
+            (text, label) for label, texts in SEED_EXAMPLES.items() for text in texts
+        )
+
+    def featurize(self, message: str, extracted_info: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Turn a message into unigram, bigram and entity features"""
+        tokens = ["<num>" if token.isdigit() else token for token in TOKEN_PATTERN.findall(message.lower())]
+        features = list(tokens)
+        features.extend(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        for key in (extracted_info or {}):
+            features.append(f"<entity:{key}>")
+        return features
+
+    def add_example(self, message: str, label: str, extracted_info: Optional[Dict[str, Any]] = None):
+        """Learn from a single labelled message"""
+        if label not in QUERY_TYPES:
+            return
+        self.class_counts[label] += 1
+        for feature in self.featurize(message, extracted_info):
+            self.feature_counts[label][feature] += 1
+            self.feature_totals[label] += 1
+            self.vocabulary[feature] = None
+            self.vocabulary.move_to_end(feature)
+        while len(self.vocabulary) > self.max_vocabulary:
+            self._forget(self.vocabulary.popitem(last=False)[0])
+
+    def _forget(self, feature: str):
+        """Drop a feature's counts from every class"""
+        for label, counts in self.feature_counts.items():
+            count = counts.pop(feature, 0)
+            self.feature_totals[label] -= count
+
+    def fit(self, examples: Iterable[Tuple[str, str]]):
+        """Learn from (message, label) pairs"""
+        for message, label in examples:
+            self.add_example(message, label)
+
+    async def fit_from_db(self, db: AsyncSession, limit: int = 50000) -> int:
+        """Learn from stored user messages whose query type was decided by the LLM"""
+        result = await db.execute(
+            select(ChatMessage.content, ChatMessage.query_type)
+            .where(
+                ChatMessage.message_type == "user",
+                ChatMessage.query_type.isnot(None),
+                ChatMessage.query_type_source.in_(TRAINING_SOURCES)
+            )
+            .order_by(ChatMessage.id.desc())
+            .limit(limit)
+        )
+        rows = result.all()
+        self.fit((content, query_type) for content, query_type in rows)
+        return len(rows)
+
+    def predict(self, message: str, extracted_info: Optional[Dict[str, Any]] = None) -> Tuple[str, float]:
+        """Return the most likely query type and its posterior probability"""
+        features = self.featurize(message, extracted_info)
+        if not features:
+            return "general_help", 0.0
+
+        total_examples = sum(self.class_counts.values())
+        vocabulary_size = len(self.vocabulary) + 1
+        scores = {}
+        for label in QUERY_TYPES:
+            class_count = self.class_counts.get(label, 0)
+            if not class_count:
+                continue
+            denominator = self.feature_totals[label] + self.alpha * vocabulary_size
+            counts = self.feature_counts[label]
+            score = math.log(class_count / total_examples)
+            for feature in features:
+                score += math.log((counts.get(feature, 0) + self.alpha) / denominator)
+            scores[label] = score
+
+        best_label = max(scores, key=scores.get)
+        best_score = scores[best_label]
+        normalizer = sum(math.exp(score - best_score) for score in scores.values())
+        return best_label, 1.0 / normalizer
@@ -0,0 +1,261 @@
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import groq
+from groq import AsyncGroq
+from dotenv import load_dotenv
+
+from .metrics import (
+    LLM_HEDGES, LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_REQUESTS, LLM_RETRIES, LLM_THROTTLED, LLM_THROTTLE_WAIT,
+    record_tokens, stream_usage
+)
+
+load_dotenv()
+
+# Requests in flight to the provider at once, per worker
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Prompt + completion tokens per minute, per worker; 0 disables the token budget
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+# Seconds a call may wait for a slot and token budget before giving up
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+# Per-attempt timeout in seconds (for streams: until the first chunk, then between chunks)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+# Send a second, identical request if the first hasn't answered after this long; 0 disables hedging
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER_MS", "0")) / 1000
+
+class LLMUnavailableError(Exception):
+    """The provider could not be used within the limits: queue timeout, or retries exhausted"""
+
+class TokenBucket:
+    """Tokens-per-minute budget; callers wait, first come first served, until enough has refilled"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> bool:
+        """Take amount tokens, returning whether the caller had to wait"""
+        # A request larger than the whole bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        waited = False
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                waited = True
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+        return waited
+
+    def adjust(self, amount: float):
+        """Give back (or, when negative, take) tokens once the real usage is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+def estimate_tokens(params: Dict[str, Any]) -> int:
+    """Rough upper bound of a request's tokens: ~4 characters per prompt token plus max_tokens"""
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in params.get("messages", []))
+    return prompt_chars // 4 + int(params.get("max_tokens") or 0)
+
+def usage_total(usage: Any) -> Optional[int]:
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+    return (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+
+def retry_reason(error: BaseException) -> Optional[str]:
+    """Why a failed request is worth retrying, or None if it isn't"""
+    if isinstance(error, groq.RateLimitError):
+        return "rate_limited"
+    if isinstance(error, groq.APIStatusError) and error.status_code >= 500:
+        return "server_error"
+    if isinstance(error, (groq.APITimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, groq.APIConnectionError):
+        return "connection"
+    return None
+
+def retry_delay(attempt: int, error: BaseException) -> float:
+    """Exponential backoff with full jitter, never shorter than the provider's Retry-After"""
+    delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(delay, min(float(retry_after), LLM_RETRY_MAX_DELAY)) if retry_after else delay
+    except ValueError:
+        return delay
+
+class LLMClient:
+    """Groq chat completions behind a concurrency limit, a token budget, timeouts and retries.
+
+    Calls are labeled (e.g. "classify", "generate") for the llm_* metrics. The SDK's own
+    retries are disabled so that every retry goes through the limits here.
+    """
+
+    def __init__(self, client: Optional[AsyncGroq] = None):
+        self.client = client or AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            # GROQ_BASE_URL points the client at another endpoint, e.g. scripts/mock_llm_server.py for load tests
+            base_url=os.getenv("GROQ_BASE_URL"),
+            max_retries=0,
+            timeout=LLM_TIMEOUT,
+        )
+        self._slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        self._budget = TokenBucket(LLM_TOKENS_PER_MINUTE) if LLM_TOKENS_PER_MINUTE > 0 else None
+
+    @asynccontextmanager
+    async def _capacity(self, call: str, estimate: int):
+        """Hold a concurrency slot and the estimated tokens for one request"""
+        start = time.perf_counter()
+        LLM_QUEUE_DEPTH.inc()
+        try:
+            if self._slots.locked():
+                LLM_THROTTLED.labels(call, "concurrency").inc()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), LLM_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise LLMUnavailableError(f"no LLM request slot free within {LLM_QUEUE_TIMEOUT:.0f}s")
+            if self._budget is not None:
+                try:
+                    remaining = max(0.0, LLM_QUEUE_TIMEOUT - (time.perf_counter() - start))
+                    if await asyncio.wait_for(self._budget.acquire(estimate), remaining):
+                        LLM_THROTTLED.labels(call, "tokens").inc()
+                except BaseException as e:
+                    self._slots.release()
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise LLMUnavailableError(f"LLM token budget exhausted for {LLM_QUEUE_TIMEOUT:.0f}s")
+                    raise
+        finally:
+            LLM_QUEUE_DEPTH.dec()
+        LLM_THROTTLE_WAIT.labels(call).observe(time.perf_counter() - start)
+
+        LLM_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            LLM_IN_FLIGHT.dec()
+            self._slots.release()
+
+    def _settle(self, call: str, estimate: int, usage: Any):
+        """Count the tokens used and correct the budget for the estimate"""
+        record_tokens(call, usage)
+        total = usage_total(usage)
+        if self._budget is not None and total is not None:
+            self._budget.adjust(estimate - total)
+
+    async def _attempt(self, call: str, params: Dict[str, Any], estimate: int, timeout: float):
+        async with self._capacity(call, estimate):
+            response = await asyncio.wait_for(self.client.chat.completions.create(**params), timeout)
+        self._settle(call, estimate, response.usage)
+        return response
+
+    async def _hedged_attempt(self, call: str, params: Dict[str, Any], estimate: int, timeout: float):
+        """One attempt, plus a duplicate request if the first is still pending after LLM_HEDGE_AFTER"""
+        if LLM_HEDGE_AFTER <= 0:
+            return await self._attempt(call, params, estimate, timeout)
+
+        primary = asyncio.ensure_future(self._attempt(call, params, estimate, timeout))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=LLM_HEDGE_AFTER)
+            # Hedge only with a slot to spare, so hedging never adds load when we're saturated
+            if done or self._slots.locked():
+                return await primary
+
+            LLM_HEDGES.labels(call, "launched").inc()
+            hedge = asyncio.ensure_future(self._attempt(call, params, estimate, timeout))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            LLM_HEDGES.labels(call, "won").inc()
+                        return task.result()
+            # Both failed: report the original request's error
+            raise primary.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def complete(self, call: str, timeout: Optional[float] = None, **params):
+        """chat.completions.create(**params), retried with backoff on rate limits, 5xx, timeouts and connection errors"""
+        timeout = timeout or LLM_TIMEOUT
+        estimate = estimate_tokens(params)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                response = await self._hedged_attempt(call, params, estimate, timeout)
+            except LLMUnavailableError:
+                LLM_REQUESTS.labels(call, "throttled").inc()
+                raise
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None or attempt == LLM_MAX_RETRIES:
+                    LLM_REQUESTS.labels(call, "error").inc()
+                    if reason is not None:
+                        raise LLMUnavailableError(f"LLM {call} call failed after {attempt + 1} attempts: {e!r}") from e
+                    raise
+                LLM_RETRIES.labels(call, reason).inc()
+                await asyncio.sleep(retry_delay(attempt, e))
+                continue
+            LLM_REQUESTS.labels(call, "success").inc()
+            return response
+
+    async def stream(self, call: str, timeout: Optional[float] = None, **params) -> AsyncIterator[Any]:
+        """Streamed completion chunks. Failures are retried only before the first chunk, since
+        retrying later would repeat text the caller has already passed on."""
+        timeout = timeout or LLM_TIMEOUT
+        estimate = estimate_tokens(params)
+        attempt = 0
+        while True:
+            emitted = False
+            usage = None
+            try:
+                async with self._capacity(call, estimate):
+                    try:
+                        stream = await asyncio.wait_for(
+                            self.client.chat.completions.create(stream=True, **params), timeout
+                        )
+                        chunks = stream.__aiter__()
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                            except StopAsyncIteration:
+                                break
+                            usage = stream_usage(chunk) or usage
+                            emitted = True
+                            yield chunk
+                    finally:
+                        self._settle(call, estimate, usage)
+            except LLMUnavailableError:
+                LLM_REQUESTS.labels(call, "throttled").inc()
+                raise
+            except Exception as e:
+                reason = retry_reason(e)
+                if emitted or reason is None or attempt == LLM_MAX_RETRIES:
+                    LLM_REQUESTS.labels(call, "error").inc()
+                    if reason is not None and not emitted:
+                        raise LLMUnavailableError(f"LLM {call} stream failed after {attempt + 1} attempts: {e!r}") from e
+                    raise
+                LLM_RETRIES.labels(call, reason).inc()
+                await asyncio.sleep(retry_delay(attempt, e))
+                attempt += 1
+                continue
+            LLM_REQUESTS.labels(call, "success").inc()
+            return
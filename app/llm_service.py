@@ -1,17 +1,172 @@
 import os
 import json
-from typing import List, Dict, Any, Optional
-from groq import Groq
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+import asyncio
+import inspect
+import time
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, bindparam
 from dotenv import load_dotenv
 
+from .cache import make_cache, normalize_message
+from .database import replica_router
+from .intent_classifier import IntentClassifier, QUERY_TYPES
+from .llm_client import LLMClient, LLMUnavailableError
+from .metrics import SPECULATION_SAVED, SPECULATIVE_QUERIES, set_query_type, stage
+
 load_dotenv()
 
+# Default (ttl seconds, max entries) of the result cache per query type.
+# Override with QUERY_CACHE_TTL_<QUERY_TYPE> / QUERY_CACHE_SIZE_<QUERY_TYPE>, e.g. QUERY_CACHE_TTL_TOP_PRODUCTS=600
+QUERY_CACHE_DEFAULTS = {
+    "product_search": (60, 1000),
+    "order_status": (10, 5000),
+    "user_orders": (30, 5000),
+    "inventory_check": (15, 2000),
+    "top_products": (300, 50),
+}
+
+# Parameters matched with ILIKE, so their case does not change the result
+CASE_INSENSITIVE_PARAMS = {"category", "brand", "department"}
+
+FALLBACK_RESPONSE = "I apologize, but I'm experiencing technical difficulties. Please try again later or contact our support team."
+# Sent instead when the LLM call layer is saturated or the provider keeps failing
+BUSY_RESPONSE = "I'm receiving a lot of questions right now and couldn't get to yours in time. Please try again in a moment."
+
+# "pipeline": classify, look up, then answer from a text context.
+# "tools": the model picks and parameterizes the lookups itself through tool calls, with no classification call.
+LLM_MODE = os.getenv("LLM_MODE", "pipeline").strip().lower()
+if LLM_MODE not in ("pipeline", "tools"):
+    print(f"Unknown LLM_MODE {LLM_MODE!r}, using 'pipeline'")
+    LLM_MODE = "pipeline"
+
+# Rows of each lookup sent back to the model in tools mode, and the largest `limit` it may ask for
+TOOL_RESULT_LIMIT = 10
+
+# Tool arguments that must be integers; models sometimes send them as strings
+INTEGER_TOOL_PARAMS = {"order_id", "user_id", "product_id", "limit"}
+
+# Tool name -> query type, for the lookups the model can call in tools mode
+TOOL_QUERY_TYPES = {
+    "search_products": "product_search",
+    "get_order_status": "order_status",
+    "get_user_orders": "user_orders",
+    "check_inventory": "inventory_check",
+    "get_top_products": "top_products",
+}
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_products",
+            "description": "Search the catalog by category, brand and/or department, most available first",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string", "description": "Product category, e.g. jeans, sweaters, shoes"},
+                    "brand": {"type": "string", "description": "Brand name, e.g. Nike, Levi's"},
+                    "department": {"type": "string", "enum": ["Men", "Women"]},
+                    "limit": {"type": "integer", "description": "Maximum number of products", "default": 10},
+                },
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_order_status",
+            "description": "Status and shipping dates of one order, or of a user's 10 most recent orders",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "order_id": {"type": "integer"},
+                    "user_id": {"type": "integer"},
+                },
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_user_orders",
+            "description": "A user's order history with item counts and order totals, newest first",
+            "parameters": {
+                "type": "object",
+                "properties": {"user_id": {"type": "integer"}},
+                "required": ["user_id"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "check_inventory",
+            "description": "Units in stock for a product, in total and per distribution center",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "product_id": {"type": "integer"},
+                    "sku": {"type": "string"},
+                },
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_top_products",
+            "description": "Best-selling products by units sold",
+            "parameters": {
+                "type": "object",
+                "properties": {"limit": {"type": "integer", "default": 10}},
+            },
+        },
+    },
+]
+
+# Start likely database lookups while the LLM classifies a message, at most SPECULATIVE_PREFETCH_MAX per turn
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "true").lower() == "true"
+SPECULATIVE_PREFETCH_MAX = int(os.getenv("SPECULATIVE_PREFETCH_MAX", "2"))
+
+# Extracted fields that make a query type worth starting early; a lookup without them is a table scan or a no-op
+SPECULATION_REQUIRES = {
+    "order_status": ("order_id", "user_id"),
+    "user_orders": ("user_id",),
+    "product_search": ("brand", "category"),
+    "inventory_check": ("product_id", "sku"),
+}
+
+# Seconds allowed for one classification attempt; it is a short answer, so fail over quickly
+LLM_CLASSIFY_TIMEOUT = float(os.getenv("LLM_CLASSIFY_TIMEOUT", "10"))
+
 class LLMService:
     def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        # Groq client behind concurrency and token limits, timeouts and retries
+        self.llm = LLMClient()
         self.model = "llama3-8b-8192"  # Using Llama 3 model
+        self.mode = LLM_MODE
+        # Number of most recent messages sent to the LLM as conversation context
+        self.history_window = int(os.getenv("CHAT_HISTORY_WINDOW", "5"))
+        self.intent_classifier = IntentClassifier(max_vocabulary=int(os.getenv("INTENT_MAX_VOCABULARY", "50000")))
+        # Below this confidence the local classifier defers to the LLM
+        self.intent_confidence_threshold = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8"))
+        self.speculative_prefetch = SPECULATIVE_PREFETCH
+        # Normalized message -> query_type, so repeated questions skip the LLM classification call
+        self.intent_cache = make_cache(
+            "intent",
+            maxsize=int(os.getenv("INTENT_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("INTENT_CACHE_TTL", "3600"))
+        )
+        # (query_type, normalized kwargs) -> rows, so aggregate queries don't rerun on every chat turn
+        self.query_caches = {
+            query_type: make_cache(
+                f"query:{query_type}",
+                maxsize=int(os.getenv(f"QUERY_CACHE_SIZE_{query_type.upper()}", size)),
+                ttl=float(os.getenv(f"QUERY_CACHE_TTL_{query_type.upper()}", ttl))
+            )
+            for query_type, (ttl, size) in QUERY_CACHE_DEFAULTS.items()
+        }
         
     def get_system_prompt(self) -> str:
         """Get the system prompt for the chatbot"""
@@ -30,33 +185,90 @@ class LLMService:
         
         When querying the database, use the provided functions to get accurate information."""
     
-    def query_database(self, db: Session, query_type: str, **kwargs) -> List[Dict[str, Any]]:
-        """Query the database based on the type of information needed"""
+    def _get_query_handler(self, query_type: str):
+        """Map a query type to the method that runs it"""
+        return {
+            "product_search": self._search_products,
+            "order_status": self._get_order_status,
+            "user_orders": self._get_user_orders,
+            "inventory_check": self._check_inventory,
+            "top_products": self._get_top_products,
+        }.get(query_type)
+    
+    def _normalize_query_params(self, handler, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep only the arguments the handler accepts, dropping empty values and case differences"""
+        accepted = inspect.signature(handler).parameters
+        params = {}
+        for key, value in kwargs.items():
+            if key not in accepted or key == "db" or value is None:
+                continue
+            if key in CASE_INSENSITIVE_PARAMS and isinstance(value, str):
+                value = value.strip().lower()
+            params[key] = value
+        return params
+    
+    def _query_cache_key(self, params: Dict[str, Any]) -> str:
+        return json.dumps(params, sort_keys=True, default=str)
+    
+    async def query_database(self, db: Optional[AsyncSession], query_type: str, **kwargs) -> List[Dict[str, Any]]:
+        """Query the database based on the type of information needed, serving repeated lookups from the result cache.
+        
+        With db=None a read session (possibly on a replica) is opened for the lookup alone, so no
+        connection is held while the LLM is working.
+        """
+        handler = self._get_query_handler(query_type)
+        if handler is None:
+            return []
+        
+        return await self._run_query(db, query_type, self._normalize_query_params(handler, kwargs))
+    
+    async def _run_query(self, db: Optional[AsyncSession], query_type: str, params: Dict[str, Any],
+                         stage_name: str = "query_database") -> List[Dict[str, Any]]:
+        handler = self._get_query_handler(query_type)
+        cache = self.query_caches[query_type]
+        cache_key = self._query_cache_key(params)
+        cached = await cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            if query_type == "product_search":
-                return self._search_products(db, **kwargs)
-            elif query_type == "order_status":
-                return self._get_order_status(db, **kwargs)
-            elif query_type == "user_orders":
-                return self._get_user_orders(db, **kwargs)
-            elif query_type == "inventory_check":
-                return self._check_inventory(db, **kwargs)
-            elif query_type == "top_products":
-                return self._get_top_products(db, **kwargs)
-            else:
-                return []
+            with stage(stage_name):
+                if db is None:
+                    async with replica_router.session() as read_db:
+                        results = await handler(read_db, **params)
+                else:
+                    results = await handler(db, **params)
         except Exception as e:
             print(f"Database query error: {e}")
             return []
+        
+        await cache.set(cache_key, results)
+        return results
+    
+    async def invalidate_query_cache(self, query_type: Optional[str] = None, **kwargs):
+        """Drop cached query results.
+        
+        With no query_type every result cache is cleared; with kwargs only the entry for those arguments is removed.
+        """
+        query_types = [query_type] if query_type else list(self.query_caches)
+        for name in query_types:
+            cache = self.query_caches.get(name)
+            if cache is None:
+                continue
+            if kwargs:
+                params = self._normalize_query_params(self._get_query_handler(name), kwargs)
+                await cache.delete(self._query_cache_key(params))
+            else:
+                await cache.clear()
     
-    def _search_products(self, db: Session, category: str = None, brand: str = None, 
+    async def _search_products(self, db: AsyncSession, category: str = None, brand: str = None, 
                         department: str = None, limit: int = 10) -> List[Dict[str, Any]]:
         """Search for products based on criteria"""
         query = """
         SELECT p.id, p.name, p.brand, p.category, p.department, p.retail_price, p.sku,
-               COUNT(ii.id) as available_inventory
+               COALESCE(pa.available_count, 0) as available_inventory
         FROM products p
-        LEFT JOIN inventory_items ii ON p.id = ii.product_id AND ii.sold_at IS NULL
+        LEFT JOIN product_availability pa ON pa.product_id = p.id
         WHERE 1=1
         """
         params = {}
@@ -71,14 +283,13 @@ class LLMService:
             query += " AND p.department ILIKE :department"
             params['department'] = f"%{department}%"
             
-        query += " GROUP BY p.id, p.name, p.brand, p.category, p.department, p.retail_price, p.sku"
         query += " ORDER BY available_inventory DESC"
         query += f" LIMIT {limit}"
         
-        result = db.execute(text(query), params)
-        return [dict(row) for row in result]
+        result = await db.execute(text(query), params)
+        return [dict(row) for row in result.mappings()]
     
-    def _get_order_status(self, db: Session, order_id: int = None, user_id: int = None) -> List[Dict[str, Any]]:
+    async def _get_order_status(self, db: AsyncSession, order_id: int = None, user_id: int = None) -> List[Dict[str, Any]]:
         """Get order status information"""
         if order_id:
             query = """
@@ -88,7 +299,7 @@ class LLMService:
             JOIN users u ON o.user_id = u.id
             WHERE o.order_id = :order_id
             """
-            result = db.execute(text(query), {"order_id": order_id})
+            result = await db.execute(text(query), {"order_id": order_id})
         elif user_id:
             query = """
             SELECT o.order_id, o.status, o.created_at, o.shipped_at, o.delivered_at, o.returned_at,
@@ -98,13 +309,13 @@ class LLMService:
             ORDER BY o.created_at DESC
             LIMIT 10
             """
-            result = db.execute(text(query), {"user_id": user_id})
+            result = await db.execute(text(query), {"user_id": user_id})
         else:
             return []
         
-        return [dict(row) for row in result]
+        return [dict(row) for row in result.mappings()]
     
-    def _get_user_orders(self, db: Session, user_id: int) -> List[Dict[str, Any]]:
+    async def _get_user_orders(self, db: AsyncSession, user_id: int) -> List[Dict[str, Any]]:
         """Get all orders for a specific user"""
         query = """
         SELECT o.order_id, o.status, o.created_at, o.num_of_item,
@@ -117,56 +328,99 @@ class LLMService:
         GROUP BY o.order_id, o.status, o.created_at, o.num_of_item
         ORDER BY o.created_at DESC
         """
-        result = db.execute(text(query), {"user_id": user_id})
-        return [dict(row) for row in result]
+        result = await db.execute(text(query), {"user_id": user_id})
+        return [dict(row) for row in result.mappings()]
     
-    def _check_inventory(self, db: Session, product_id: int = None, sku: str = None) -> List[Dict[str, Any]]:
+    async def _check_inventory(self, db: AsyncSession, product_id: int = None, sku: str = None) -> List[Dict[str, Any]]:
         """Check inventory availability"""
         if product_id:
             query = """
             SELECT p.id, p.name, p.sku, p.retail_price,
-                   COUNT(ii.id) as available_items
+                   COALESCE(pa.available_count, 0) as available_items
             FROM products p
-            LEFT JOIN inventory_items ii ON p.id = ii.product_id AND ii.sold_at IS NULL
+            LEFT JOIN product_availability pa ON pa.product_id = p.id
             WHERE p.id = :product_id
-            GROUP BY p.id, p.name, p.sku, p.retail_price
             """
-            result = db.execute(text(query), {"product_id": product_id})
+            result = await db.execute(text(query), {"product_id": product_id})
         elif sku:
             query = """
             SELECT p.id, p.name, p.sku, p.retail_price,
-                   COUNT(ii.id) as available_items
+                   COALESCE(pa.available_count, 0) as available_items
             FROM products p
-            LEFT JOIN inventory_items ii ON p.id = ii.product_id AND ii.sold_at IS NULL
+            LEFT JOIN product_availability pa ON pa.product_id = p.id
             WHERE p.sku = :sku
-            GROUP BY p.id, p.name, p.sku, p.retail_price
             """
-            result = db.execute(text(query), {"sku": sku})
+            result = await db.execute(text(query), {"sku": sku})
         else:
             return []
         
-        return [dict(row) for row in result]
+        items = [dict(row) for row in result.mappings()]
+        if not items:
+            return items
+        
+        # Break availability down by distribution center
+        center_query = text("""
+        SELECT pda.product_id, pda.distribution_center_id, dc.name as distribution_center, pda.available_count
+        FROM product_dc_availability pda
+        LEFT JOIN distribution_centers dc ON dc.id = pda.distribution_center_id
+        WHERE pda.product_id IN :product_ids AND pda.available_count > 0
+        ORDER BY pda.available_count DESC
+        """).bindparams(bindparam("product_ids", expanding=True))
+        centers = await db.execute(center_query, {"product_ids": [item["id"] for item in items]})
+        by_product = {}
+        for row in centers.mappings():
+            by_product.setdefault(row["product_id"], []).append({
+                "distribution_center_id": row["distribution_center_id"],
+                "distribution_center": row["distribution_center"],
+                "available_count": row["available_count"]
+            })
+        for item in items:
+            item["availability_by_center"] = by_product.get(item["id"], [])
+        
+        return items
     
-    def _get_top_products(self, db: Session, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get top selling products"""
+    async def _get_top_products(self, db: AsyncSession, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get top selling products from the product_sales rollup"""
         query = """
         SELECT p.id, p.name, p.brand, p.category, p.retail_price,
-               COUNT(oi.id) as total_sales,
-               COUNT(ii.id) as available_inventory
-        FROM products p
-        LEFT JOIN order_items oi ON p.id = oi.product_id
-        LEFT JOIN inventory_items ii ON p.id = ii.product_id AND ii.sold_at IS NULL
-        GROUP BY p.id, p.name, p.brand, p.category, p.retail_price
-        ORDER BY total_sales DESC
+               ps.units_sold as total_sales,
+               ps.units_returned as total_returns,
+               ps.last_sold_at,
+               COALESCE(pa.available_count, 0) as available_inventory
+        FROM product_sales ps
+        JOIN products p ON p.id = ps.product_id
+        LEFT JOIN product_availability pa ON pa.product_id = ps.product_id
+        ORDER BY ps.units_sold DESC
         LIMIT :limit
         """
-        result = db.execute(text(query), {"limit": limit})
-        return [dict(row) for row in result]
+        result = await db.execute(text(query), {"limit": limit})
+        return [dict(row) for row in result.mappings()]
     
-    def generate_response(self, db: Session, user_message: str, conversation_history: List[Dict[str, str]] = None) -> str:
-        """Generate a response using the LLM with database context"""
+    async def classify_message(self, user_message: str, extracted_info: Dict[str, Any],
+                               prediction: Optional[Tuple[str, float]] = None) -> Tuple[str, Optional[float], str]:
+        """Classify the message locally, falling back to the cache and then the LLM when confidence is low.
         
-        # Analyze the user message to determine what information is needed
+        prediction is the local classifier's (query_type, confidence), if the caller already has it.
+        Returns (query_type, confidence, source) where source is "local", "cache" or "llm".
+        A failed LLM call is raised, so the caller's "classify" stage counts it before falling back.
+        """
+        query_type, confidence = prediction or self.intent_classifier.predict(user_message, extracted_info)
+        if confidence >= self.intent_confidence_threshold:
+            return query_type, confidence, "local"
+        
+        cache_key = normalize_message(user_message)
+        cached = await self.intent_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return cached, None, "cache"
+        
+        query_type = await self._classify_with_llm(user_message)
+        self.intent_classifier.add_example(user_message, query_type, extracted_info)
+        if cache_key:
+            await self.intent_cache.set(cache_key, query_type)
+        return query_type, None, "llm"
+    
+    async def _classify_with_llm(self, user_message: str) -> str:
+        """Ask the LLM which type of information the message needs"""
         analysis_prompt = f"""
         Analyze this customer message and determine what type of information is needed:
         "{user_message}"
@@ -182,49 +436,272 @@ class LLMService:
         Respond with just the category name.
         """
         
+        analysis_response = await self.llm.complete(
+            "classify",
+            timeout=LLM_CLASSIFY_TIMEOUT,
+            model=self.model,
+            messages=[{"role": "user", "content": analysis_prompt}],
+            max_tokens=50,
+            temperature=0.1
+        )
+        
+        answer = analysis_response.choices[0].message.content.strip().lower()
+        for query_type in QUERY_TYPES:
+            if query_type in answer:
+                return query_type
+        return "general_help"
+    
+    async def _build_messages(self, db: Optional[AsyncSession], user_message: str, conversation_history: List[Dict[str, str]] = None,
+                              turn_info: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
+        """Classify the message, look up database context and build the chat messages for the final LLM call"""
+        # Extract relevant information from the message
+        extracted_info = self._extract_info_from_message(user_message)
+        
+        # When the local classifier is unsure, start the likely lookups while the LLM classifies
+        prediction = self.intent_classifier.predict(user_message, extracted_info)
+        speculate = self.speculative_prefetch and prediction[1] < self.intent_confidence_threshold
+        prefetches = self._start_prefetches(prediction[0], extracted_info) if speculate else {}
+        
+        # Analyze the user message to determine what information is needed
         try:
-            analysis_response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": analysis_prompt}],
-                max_tokens=50,
-                temperature=0.1
-            )
-            
-            query_type = analysis_response.choices[0].message.content.strip().lower()
-            
-            # Extract relevant information from the message
-            extracted_info = self._extract_info_from_message(user_message)
-            
-            # Query the database if needed
+            with stage("classify"):
+                query_type, confidence, source = await self.classify_message(user_message, extracted_info, prediction)
+        except Exception as e:
+            # Answer with the local guess rather than failing the whole turn; its prefetch is still useful
+            print(f"LLM classification failed, using local prediction: {e}")
+            (query_type, confidence), source = prediction, "local"
+        except BaseException:
+            self._discard_prefetches(prefetches)
+            raise
+        set_query_type(query_type)
+        if turn_info is not None:
+            turn_info.update(query_type=query_type, intent_confidence=confidence, intent_source=source)
+        
+        # Query the database if needed, using the speculative lookup when there is one
+        db_results = None
+        prefetch = prefetches.pop(query_type, None)
+        self._discard_prefetches(prefetches)
+        if prefetch is not None:
+            db_results = await self._use_prefetch(query_type, prefetch)
+        elif speculate and query_type != "general_help":
+            SPECULATIVE_QUERIES.labels(query_type, "unpredicted").inc()
+        if db_results is None:
             db_results = []
             if query_type != "general_help":
-                db_results = self.query_database(db, query_type, **extracted_info)
-            
-            # Build the context for the LLM
-            context = self._build_context(query_type, db_results, extracted_info)
-            
-            # Generate the response
-            messages = [
-                {"role": "system", "content": self.get_system_prompt()},
-                {"role": "user", "content": f"Context: {context}\n\nCustomer message: {user_message}"}
-            ]
-            
-            if conversation_history:
-                for msg in conversation_history[-5:]:  # Include last 5 messages for context
-                    messages.append({"role": msg["role"], "content": msg["content"]})
-            
-            response = self.client.chat.completions.create(
+                db_results = await self.query_database(db, query_type, **extracted_info)
+        
+        # Build the context for the LLM
+        context = self._build_context(query_type, db_results, extracted_info)
+        
+        messages = [
+            {"role": "system", "content": self.get_system_prompt()},
+            {"role": "user", "content": f"Context: {context}\n\nCustomer message: {user_message}"}
+        ]
+        
+        if conversation_history:
+            for msg in conversation_history[-self.history_window:]:  # Include the most recent messages for context
+                messages.append({"role": msg["role"], "content": msg["content"]})
+        
+        return messages
+    
+    async def _plan_with_tools(self, user_message: str, conversation_history: List[Dict[str, str]] = None,
+                               turn_info: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Let the model choose its database lookups as tool calls and run them in parallel.
+        
+        Returns the messages for the final LLM call, or (messages, answer) with the model's
+        direct answer when it needed no lookups.
+        """
+        messages = [{"role": "system", "content": self.get_system_prompt()}]
+        if conversation_history:
+            for msg in conversation_history[-self.history_window:]:
+                messages.append({"role": msg["role"], "content": msg["content"]})
+        messages.append({"role": "user", "content": user_message})
+        
+        with stage("llm_plan"):
+            response = await self.llm.complete(
+                "plan",
                 model=self.model,
                 messages=messages,
+                tools=TOOLS,
+                tool_choice="auto",
                 max_tokens=500,
                 temperature=0.7
             )
+        message = response.choices[0].message
+        tool_calls = [call for call in (message.tool_calls or []) if call.function is not None]
+        
+        query_types = [TOOL_QUERY_TYPES.get(call.function.name) for call in tool_calls]
+        query_type = next((name for name in query_types if name), "general_help")
+        set_query_type(query_type)
+        if turn_info is not None:
+            turn_info.update(query_type=query_type, intent_confidence=None, intent_source="tools")
+        
+        if not tool_calls:
+            return messages, message.content or ""
+        
+        # Each lookup opens its own read session only while its query runs, so they can run in parallel
+        results = await asyncio.gather(*[
+            self._run_tool(call.function.name, call.function.arguments) for call in tool_calls
+        ])
+        
+        messages.append({
+            "role": "assistant",
+            "content": message.content or "",
+            "tool_calls": [
+                {"id": call.id, "type": "function",
+                 "function": {"name": call.function.name, "arguments": call.function.arguments}}
+                for call in tool_calls
+            ]
+        })
+        for call, result in zip(tool_calls, results):
+            messages.append({
+                "role": "tool",
+                "tool_call_id": call.id,
+                "name": call.function.name,
+                "content": json.dumps(result, default=str)
+            })
+        return messages, None
+    
+    async def _run_tool(self, name: str, arguments: Optional[str]) -> Any:
+        """Run one tool call through query_database, returning an error object the model can read on bad input"""
+        query_type = TOOL_QUERY_TYPES.get(name)
+        if query_type is None:
+            return {"error": f"unknown tool {name}"}
+        try:
+            kwargs = json.loads(arguments or "{}")
+        except json.JSONDecodeError:
+            return {"error": "arguments are not valid JSON"}
+        if not isinstance(kwargs, dict):
+            return {"error": "arguments must be an object"}
+        for key in INTEGER_TOOL_PARAMS & kwargs.keys():
+            if kwargs[key] is None:
+                continue
+            try:
+                kwargs[key] = int(kwargs[key])
+            except (TypeError, ValueError):
+                return {"error": f"{key} must be an integer"}
+        if "limit" in kwargs and kwargs["limit"] is not None:
+            kwargs["limit"] = max(1, min(kwargs["limit"], TOOL_RESULT_LIMIT))
+        
+        results = await self.query_database(None, query_type, **kwargs)
+        return results[:TOOL_RESULT_LIMIT]
+    
+    def _start_prefetches(self, predicted_type: str, extracted_info: Dict[str, Any]) -> Dict[str, asyncio.Task]:
+        """Start the lookups the message most likely needs: the local classifier's guess, then
+        those the extracted order id, user id, brand or category point at"""
+        prefetches = {}
+        for query_type in [predicted_type] + [name for name in SPECULATION_REQUIRES if name != predicted_type]:
+            if len(prefetches) >= SPECULATIVE_PREFETCH_MAX:
+                break
+            fields = SPECULATION_REQUIRES.get(query_type, ())
+            if self._get_query_handler(query_type) is None or (fields and not any(extracted_info.get(f) is not None for f in fields)):
+                continue
+            prefetches[query_type] = asyncio.create_task(self._prefetch(query_type, extracted_info))
+        return prefetches
+    
+    async def _prefetch(self, query_type: str, extracted_info: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], float]:
+        """Run a speculative lookup on its own read session, returning (rows, seconds taken)"""
+        start = time.perf_counter()
+        params = self._normalize_query_params(self._get_query_handler(query_type), extracted_info)
+        results = await self._run_query(None, query_type, params, stage_name="query_prefetch")
+        return results, time.perf_counter() - start
+    
+    async def _use_prefetch(self, query_type: str, prefetch: asyncio.Task) -> Optional[List[Dict[str, Any]]]:
+        """Rows of a speculative lookup the turn turned out to need, or None if it failed"""
+        classified_at = time.perf_counter()
+        try:
+            results, seconds = await prefetch
+        except Exception as e:
+            print(f"Speculative {query_type} lookup failed: {e}")
+            return None
+        waited = time.perf_counter() - classified_at
+        SPECULATIVE_QUERIES.labels(query_type, "hit").inc()
+        SPECULATION_SAVED.labels(query_type).observe(max(0.0, seconds - waited))
+        return results
+    
+    def _discard_prefetches(self, prefetches: Dict[str, asyncio.Task]):
+        """Cancel unneeded speculative lookups so they give their connections back right away"""
+        for query_type, task in prefetches.items():
+            SPECULATIVE_QUERIES.labels(query_type, "miss").inc()
+            task.cancel()
+            task.add_done_callback(self._prefetch_done)
+    
+    def _prefetch_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Discarded speculative lookup failed: {task.exception()}")
+    
+    async def generate_response(self, db: Optional[AsyncSession], user_message: str, conversation_history: List[Dict[str, str]] = None,
+                                turn_info: Optional[Dict[str, Any]] = None) -> str:
+        """Generate a response using the LLM with database context.
+        
+        If turn_info is given it is filled with details about the turn, such as the chosen query_type.
+        With db=None each lookup opens a short-lived read session instead of sharing one for the turn.
+        """
+        try:
+            if self.mode == "tools":
+                messages, answer = await self._plan_with_tools(user_message, conversation_history, turn_info)
+                if answer is not None:
+                    return answer
+            else:
+                messages = await self._build_messages(db, user_message, conversation_history, turn_info)
+            
+            with stage("llm_generate"):
+                response = await self.llm.complete(
+                    "generate",
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.7
+                )
             
             return response.choices[0].message.content
             
+        except LLMUnavailableError as e:
+            print(f"LLM unavailable: {e}")
+            return BUSY_RESPONSE
         except Exception as e:
             print(f"Error generating response: {e}")
-            return "I apologize, but I'm experiencing technical difficulties. Please try again later or contact our support team."
+            return FALLBACK_RESPONSE
+    
+    async def stream_response(self, db: Optional[AsyncSession], user_message: str, conversation_history: List[Dict[str, str]] = None,
+                              turn_info: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Generate a response like generate_response, yielding text chunks as the LLM produces them"""
+        emitted = False
+        try:
+            if self.mode == "tools":
+                messages, answer = await self._plan_with_tools(user_message, conversation_history, turn_info)
+                if answer is not None:
+                    emitted = True
+                    yield answer
+                    return
+            else:
+                messages = await self._build_messages(db, user_message, conversation_history, turn_info)
+            
+            with stage("llm_generate"):
+                stream = self.llm.stream(
+                    "generate",
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.7
+                )
+                
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        emitted = True
+                        yield delta
+            
+        except LLMUnavailableError as e:
+            print(f"LLM unavailable: {e}")
+            if not emitted:
+                yield BUSY_RESPONSE
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+            if not emitted:
+                yield FALLBACK_RESPONSE
     
     def _extract_info_from_message(self, message: str) -> Dict[str, Any]:
         """Extract relevant information from the user message"""
@@ -289,6 +766,8 @@ class LLMService:
             context_parts.append("Inventory information:")
             for item in db_results:
                 context_parts.append(f"{item['name']} (SKU: {item['sku']}): {item['available_items']} available - ${item['retail_price']}")
+                for center in item.get('availability_by_center', []):
+                    context_parts.append(f"  {center['distribution_center'] or 'Unknown center'}: {center['available_count']} available")
         
         elif query_type == "top_products":
             context_parts.append("Top selling products:")
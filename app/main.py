@@ -1,16 +1,29 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select, delete, update, func, tuple_
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+import anyio
+import asyncio
+import base64
+import json
+import os
+import secrets
 import uuid
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, AsyncIterator, Tuple
 
-from .database import get_db, engine
-from .models import Base, ChatSession, ChatMessage, User
-from .schemas import ChatMessageRequest, ChatResponse, ChatSessionResponse, ChatMessageResponse
+from .cache import TieredCache
+from .database import get_async_db, get_async_read_db, AsyncSessionLocal, pool_stats, replica_router
+from .models import ChatSession, ChatMessage, User
+from .schemas import ChatMessageRequest, ChatResponse, ChatSessionResponse, ChatMessageResponse, ChatSessionSummary, ChatSessionPage
 from .llm_service import LLMService
+from .message_writer import message_writer
+from .metrics import ChatTurn, render_metrics, stage, start_turn
+from .profiling import RequestTimingMiddleware
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# The schema is managed by Alembic migrations: run `alembic upgrade head` before starting the API
 
 app = FastAPI(
     title="E-commerce Customer Support Chatbot API",
@@ -25,11 +38,62 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
 
+# Server-Timing breakdown and X-Request-ID on every response, profiles of slow requests
+app.add_middleware(RequestTimingMiddleware)
+
 # Initialize LLM service
 llm_service = LLMService()
 
+# Token the /api/admin endpoints require in the X-Admin-Token header; unset, they are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admit only requests carrying ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them"
+        )
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing or invalid X-Admin-Token"
+        )
+
+@app.on_event("startup")
+async def train_intent_classifier():
+    """Teach the local intent classifier from previously classified chat messages"""
+    try:
+        async with replica_router.session() as db:
+            count = await llm_service.intent_classifier.fit_from_db(db)
+        print(f"Intent classifier trained on {count} stored messages")
+    except Exception as e:
+        print(f"Could not train intent classifier from chat history: {e}")
+
+@app.on_event("startup")
+async def start_replica_monitor():
+    """Health-check the read replicas in the background"""
+    if replica_router.replicas:
+        app.state.replica_monitor = asyncio.create_task(replica_router.monitor())
+
+@app.on_event("startup")
+async def start_message_writer():
+    """Replay crashed workers' message logs and start batching message inserts (CHAT_WRITE_BEHIND)"""
+    await message_writer.start()
+
+@app.on_event("shutdown")
+async def stop_message_writer():
+    await message_writer.stop()
+
+@app.on_event("shutdown")
+async def stop_replica_monitor():
+    monitor = getattr(app.state, "replica_monitor", None)
+    if monitor:
+        monitor.cancel()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -38,6 +102,7 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "chat": "/api/chat",
+            "chat_stream": "/api/chat/stream",
             "sessions": "/api/sessions",
             "health": "/api/health"
         }
@@ -48,74 +113,199 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "chatbot-api"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: chat stage latencies, stage errors and LLM token counts"""
+    content, content_type = render_metrics()
+    return Response(content=content, headers={"Content-Type": content_type})
+
+@app.get("/api/admin/cache", dependencies=[Depends(require_admin)])
+async def cache_stats():
+    """Hit/miss statistics for the in-process and shared caches"""
+    return {
+        "intent": llm_service.intent_cache.stats(),
+        "query_results": {
+            query_type: cache.stats() for query_type, cache in llm_service.query_caches.items()
+        }
+    }
+
+@app.get("/api/admin/pool", dependencies=[Depends(require_admin)])
+async def database_pool_stats():
+    """Connection pool checkout waits and utilization, for sizing workers against the database"""
+    return {**pool_stats(), "write_behind": message_writer.stats()}
+
+@app.delete("/api/admin/cache", dependencies=[Depends(require_admin)])
+async def invalidate_cache(query_type: Optional[str] = None):
+    """Drop cached database results, for one query type or all of them.
+    
+    The in-process caches belong to the worker serving this request. With CACHE_REDIS_URL the
+    shared tier is cleared for everyone, but other workers' in-process tiers keep their entries
+    until they expire. The response's scope says which of the two happened.
+    """
+    if query_type and query_type not in llm_service.query_caches:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown query type: {query_type}"
+        )
+    await llm_service.invalidate_query_cache(query_type)
+    caches = [llm_service.query_caches[query_type]] if query_type else list(llm_service.query_caches.values())
+    shared = all(isinstance(cache, TieredCache) for cache in caches)
+    return {
+        "message": "Cache invalidated",
+        "query_type": query_type,
+        "scope": "shared" if shared else "worker",
+        "worker_pid": os.getpid(),
+        "detail": (
+            "Cleared the shared cache and this worker's in-process tier; other workers' in-process "
+            "entries expire within their TTL"
+            if shared else
+            "Cleared this worker's in-process cache only; other workers keep their entries until they "
+            "expire (set CACHE_REDIS_URL to share caches between workers)"
+        )
+    }
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(
     request: ChatMessageRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Main chat endpoint that handles customer messages and returns AI responses
     """
+    turn = start_turn()
     try:
         # Get or create chat session
-        session = await get_or_create_session(db, request.user_id, request.session_id)
+        with stage("session_lookup"):
+            session = await get_or_create_session(db, request.user_id, request.session_id)
         
         # Store user message
-        user_message = ChatMessage(
-            session_id=session.id,
-            message_type="user",
-            content=request.message
-        )
-        db.add(user_message)
-        db.commit()
-        db.refresh(user_message)
+        with stage("user_message_insert"):
+            if message_writer.enabled:
+                user_message_id = await message_writer.add_message(session.id, "user", request.message)
+            else:
+                user_message = ChatMessage(
+                    session_id=session.id,
+                    message_type="user",
+                    content=request.message
+                )
+                db.add(user_message)
+                await db.commit()
+                await db.refresh(user_message)
+                user_message_id = user_message.id
+        replica_router.record_write(*session_write_keys(session))
         
-        # Get conversation history for context
-        conversation_history = get_conversation_history(db, session.id)
+        # Get conversation history for context (from the primary, so it includes this message)
+        with stage("history_load"):
+            conversation_history = await get_conversation_history(db, session.id)
+        # Release the request's connection before the LLM calls; the assistant message gets its own session
+        await db.close()
         
-        # Generate AI response
-        ai_response = llm_service.generate_response(
-            db=db,
+        # Generate AI response; its catalog and order lookups each take a read session (maybe on a replica)
+        # only while they run, so no connection is held across the LLM calls
+        turn_info = {}
+        ai_response = await llm_service.generate_response(
+            db=None,
             user_message=request.message,
-            conversation_history=conversation_history
+            conversation_history=conversation_history,
+            turn_info=turn_info
         )
         
-        # Store AI response
-        ai_message = ChatMessage(
-            session_id=session.id,
-            message_type="assistant",
-            content=ai_response
-        )
-        db.add(ai_message)
-        db.commit()
-        db.refresh(ai_message)
+        # Store AI response, recording the intent on the user message so the local classifier can learn from it
+        with stage("assistant_message_insert"):
+            ai_message_id = await store_assistant_message(session.id, ai_response, user_message_id,
+                                                          turn_info.get("query_type"), turn_info.get("intent_source"))
+        replica_router.record_write(*session_write_keys(session))
         
         return ChatResponse(
             response=ai_response,
             session_id=session.session_id,
-            message_id=ai_message.id
+            message_id=ai_message_id
         )
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing chat message: {str(e)}"
         )
+    
+    finally:
+        turn.finish()
+
+@app.post("/api/chat/stream")
+async def chat_stream(
+    request: ChatMessageRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Streaming chat endpoint that sends the AI response as server-sent events while it is generated
+    """
+    # The turn continues in stream_chat_events, which reports it once the stream ends
+    turn = start_turn()
+    try:
+        # Get or create chat session
+        with stage("session_lookup"):
+            session = await get_or_create_session(db, request.user_id, request.session_id)
+        
+        # Store user message
+        with stage("user_message_insert"):
+            if message_writer.enabled:
+                user_message_id = await message_writer.add_message(session.id, "user", request.message)
+            else:
+                user_message = ChatMessage(
+                    session_id=session.id,
+                    message_type="user",
+                    content=request.message
+                )
+                db.add(user_message)
+                await db.commit()
+                user_message_id = user_message.id
+        replica_router.record_write(*session_write_keys(session))
+        
+        # Get conversation history for context
+        with stage("history_load"):
+            conversation_history = await get_conversation_history(db, session.id)
+        # FastAPI keeps this dependency open until the stream ends; give its connection back now
+        await db.close()
+        
+    except Exception as e:
+        turn.finish()
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing chat message: {str(e)}"
+        )
+    
+    return StreamingResponse(
+        stream_chat_events(session.id, session.session_id, user_message_id, request.message, conversation_history,
+                           session_write_keys(session), turn),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/api/sessions/{session_id}", response_model=ChatSessionResponse)
-async def get_session(session_id: str, db: Session = Depends(get_db)):
+async def get_session(session_id: str, db: AsyncSession = Depends(get_async_read_db)):
     """Get a specific chat session with all messages"""
-    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
+    session = await db.scalar(select(ChatSession).where(ChatSession.session_id == session_id))
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
     
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session.id
-    ).order_by(ChatMessage.timestamp).all()
+    messages = (await db.scalars(
+        select(ChatMessage)
+        .where(ChatMessage.session_id == session.id)
+        .order_by(ChatMessage.timestamp)
+    )).all()
+    messages = [
+        {"id": msg.id, "session_id": msg.session_id, "message_type": msg.message_type,
+         "content": msg.content, "timestamp": msg.timestamp}
+        for msg in messages
+    ]
+    stored = {msg["id"] for msg in messages}
+    messages += [row for row in message_writer.pending_messages(session.id) if row["id"] not in stored]
+    messages.sort(key=lambda msg: (msg["timestamp"], msg["id"]))
     
     return ChatSessionResponse(
         id=session.id,
@@ -125,78 +315,134 @@ async def get_session(session_id: str, db: Session = Depends(get_db)):
         is_active=session.is_active,
         messages=[
             ChatMessageResponse(
-                id=msg.id,
-                session_id=msg.session_id,
-                message_type=msg.message_type,
-                content=msg.content,
-                timestamp=msg.timestamp
+                id=msg["id"],
+                session_id=msg["session_id"],
+                message_type=msg["message_type"],
+                content=msg["content"],
+                timestamp=msg["timestamp"]
             ) for msg in messages
         ]
     )
 
-@app.get("/api/sessions", response_model=List[ChatSessionResponse])
+@app.get("/api/sessions", response_model=ChatSessionPage)
 async def list_sessions(
     user_id: Optional[int] = None,
-    limit: int = 10,
-    db: Session = Depends(get_db)
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_messages: bool = False,
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """List chat sessions, optionally filtered by user_id"""
-    query = db.query(ChatSession)
+    """List chat sessions newest first, optionally filtered by user_id.
+    
+    Pages are keyset-paginated on (created_at, id): pass the returned next_cursor to get the
+    following page. Each session carries its message count and last message; full transcripts
+    are only included with include_messages=true.
+    """
+    message_count = (
+        select(func.count(ChatMessage.id))
+        .where(ChatMessage.session_id == ChatSession.id)
+        .correlate(ChatSession)
+        .scalar_subquery()
+    )
+    # A correlated subquery rather than a LATERAL join, so the listing also works on SQLite
+    last_message_id = (
+        select(ChatMessage.id)
+        .where(ChatMessage.session_id == ChatSession.id)
+        .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+        .limit(1)
+        .correlate(ChatSession)
+        .scalar_subquery()
+    )
+    last_message = aliased(ChatMessage, name="last_message")
+    query = (
+        select(
+            ChatSession,
+            message_count.label("message_count"),
+            last_message.content,
+            last_message.timestamp
+        )
+        .outerjoin(last_message, last_message.id == last_message_id)
+    )
     
     if user_id:
-        query = query.filter(ChatSession.user_id == user_id)
+        query = query.where(ChatSession.user_id == user_id)
     
-    sessions = query.order_by(ChatSession.created_at.desc()).limit(limit).all()
+    if cursor:
+        created_at, session_pk = decode_session_cursor(cursor)
+        query = query.where(tuple_(ChatSession.created_at, ChatSession.id) < tuple_(created_at, session_pk))
     
-    result = []
-    for session in sessions:
-        messages = db.query(ChatMessage).filter(
-            ChatMessage.session_id == session.id
-        ).order_by(ChatMessage.timestamp).all()
-        
-        result.append(ChatSessionResponse(
-            id=session.id,
-            user_id=session.user_id,
-            session_id=session.session_id,
-            created_at=session.created_at,
-            is_active=session.is_active,
-            messages=[
+    # Fetch one extra row to know whether another page exists
+    rows = (await db.execute(
+        query.order_by(ChatSession.created_at.desc(), ChatSession.id.desc()).limit(limit + 1)
+    )).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    messages_by_session = {}
+    if include_messages and rows:
+        messages = (await db.scalars(
+            select(ChatMessage)
+            .where(ChatMessage.session_id.in_([session.id for session, *_ in rows]))
+            .order_by(ChatMessage.session_id, ChatMessage.timestamp, ChatMessage.id)
+        )).all()
+        for msg in messages:
+            messages_by_session.setdefault(msg.session_id, []).append(
                 ChatMessageResponse(
                     id=msg.id,
                     session_id=msg.session_id,
                     message_type=msg.message_type,
                     content=msg.content,
                     timestamp=msg.timestamp
-                ) for msg in messages
-            ]
-        ))
+                )
+            )
     
-    return result
+    sessions = [
+        ChatSessionSummary(
+            id=session.id,
+            user_id=session.user_id,
+            session_id=session.session_id,
+            created_at=session.created_at,
+            is_active=session.is_active,
+            message_count=count,
+            last_message_at=last_message_at,
+            last_message=last_content,
+            messages=messages_by_session.get(session.id, []) if include_messages else None
+        )
+        for session, count, last_content, last_message_at in rows
+    ]
+    
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_session_cursor(sessions[-1].created_at, sessions[-1].id)
+    
+    return ChatSessionPage(sessions=sessions, next_cursor=next_cursor)
 
 @app.delete("/api/sessions/{session_id}")
-async def delete_session(session_id: str, db: Session = Depends(get_db)):
+async def delete_session(session_id: str, db: AsyncSession = Depends(get_async_db)):
     """Delete a chat session and all its messages"""
-    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
+    session = await db.scalar(select(ChatSession).where(ChatSession.session_id == session_id))
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
     
-    # Delete all messages in the session
-    db.query(ChatMessage).filter(ChatMessage.session_id == session.id).delete()
+    # Delete all messages in the session, including ones still waiting to be written
+    message_writer.discard_session(session.id)
+    await db.execute(delete(ChatMessage).where(ChatMessage.session_id == session.id))
     
     # Delete the session
-    db.delete(session)
-    db.commit()
+    await db.delete(session)
+    await db.commit()
+    replica_router.record_write(*session_write_keys(session))
     
     return {"message": "Session deleted successfully"}
 
-async def get_or_create_session(db: Session, user_id: Optional[int], session_id: Optional[str]) -> ChatSession:
+async def get_or_create_session(db: AsyncSession, user_id: Optional[int], session_id: Optional[str]) -> ChatSession:
     """Get existing session or create a new one"""
     if session_id:
         # Try to find existing session
-        session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
+        session = await db.scalar(select(ChatSession).where(ChatSession.session_id == session_id))
         if session:
             return session
     
@@ -208,23 +454,134 @@ async def get_or_create_session(db: Session, user_id: Optional[int], session_id:
         is_active=True
     )
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
     
     return session
 
-def get_conversation_history(db: Session, session_id: int) -> List[dict]:
-    """Get conversation history for context"""
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session_id
-    ).order_by(ChatMessage.timestamp).all()
+def session_write_keys(session: ChatSession) -> Tuple[str, ...]:
+    """Keys under which get_async_read_db keeps reads on the primary right after this session changes"""
+    return (f"session:{session.session_id}", f"user:{session.user_id}")
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    """Format a payload as a server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def stream_chat_events(session_pk: int, session_id: str, user_message_id: int, user_message: str,
+                             conversation_history: List[dict], write_keys: Tuple[str, ...] = (),
+                             turn: Optional[ChatTurn] = None) -> AsyncIterator[str]:
+    """Relay LLM tokens as server-sent events and store the assistant message once the stream ends"""
+    chunks = []
+    turn_info = {}
+    message_id = None
+    if turn is not None:
+        turn.activate()
+    
+    yield format_sse({"session_id": session_id}, event="session")
+    
+    try:
+        async for token in llm_service.stream_response(None, user_message, conversation_history, turn_info):
+            chunks.append(token)
+            yield format_sse({"token": token})
+    finally:
+        # Persist whatever was generated, even when the client disconnects mid-stream
+        with anyio.CancelScope(shield=True):
+            with stage("assistant_message_insert"):
+                message_id = await save_assistant_message(session_pk, "".join(chunks), user_message_id,
+                                                          turn_info.get("query_type"), turn_info.get("intent_source"))
+            replica_router.record_write(*write_keys)
+        if turn is not None:
+            turn.finish()
+    
+    yield format_sse({"session_id": session_id, "message_id": message_id}, event="done")
+
+async def save_assistant_message(session_pk: int, content: str, user_message_id: int,
+                                 query_type: Optional[str], query_type_source: Optional[str]) -> Optional[int]:
+    """Store a streamed assistant message, logging instead of raising on failure"""
+    if not content:
+        return None
+    try:
+        return await store_assistant_message(session_pk, content, user_message_id, query_type, query_type_source)
+    except Exception as e:
+        print(f"Error saving streamed response: {e}")
+        return None
+
+async def store_assistant_message(session_pk: int, content: str, user_message_id: int,
+                                  query_type: Optional[str], query_type_source: Optional[str]) -> int:
+    """Store an assistant message and the user message's intent in their own transaction.
+    
+    The request session has been released by now, so generation never holds a pooled connection.
+    """
+    if message_writer.enabled:
+        if query_type:
+            message_writer.set_query_type(user_message_id, query_type, query_type_source)
+        return await message_writer.add_message(session_pk, "assistant", content)
+    
+    async with AsyncSessionLocal() as db:
+        if query_type:
+            await db.execute(
+                update(ChatMessage)
+                .where(ChatMessage.id == user_message_id)
+                .values(query_type=query_type, query_type_source=query_type_source)
+            )
+        ai_message = ChatMessage(
+            session_id=session_pk,
+            message_type="assistant",
+            content=content
+        )
+        db.add(ai_message)
+        await db.commit()
+        return ai_message.id
+
+def encode_session_cursor(created_at: datetime, session_pk: int) -> str:
+    """Opaque keyset cursor for the session listing"""
+    payload = json.dumps([created_at.isoformat(), session_pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_session_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_session_cursor; rejects malformed cursors with a 400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, session_pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(session_pk)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+async def get_conversation_history(db: AsyncSession, session_id: int, limit: Optional[int] = None) -> List[dict]:
+    """Get the most recent messages of a session for context, oldest first.
+    
+    Only the last `limit` messages (default: the LLM history window) are read, newest-first
+    through the (session_id, timestamp DESC) index, so the cost doesn't grow with the session.
+    """
+    if limit is None:
+        limit = llm_service.history_window
+    if limit <= 0:
+        return []
+    
+    rows = (await db.execute(
+        select(ChatMessage.id, ChatMessage.timestamp, ChatMessage.message_type, ChatMessage.content)
+        .where(ChatMessage.session_id == session_id)
+        .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+        .limit(limit)
+    )).all()
+    messages = [tuple(row) for row in rows]
+    
+    # With CHAT_WRITE_BEHIND, the newest messages may not have reached the table yet
+    stored = {row[0] for row in rows}
+    messages += [(row["id"], row["timestamp"], row["message_type"], row["content"])
+                 for row in message_writer.pending_messages(session_id) if row["id"] not in stored]
+    messages.sort(key=lambda message: (message[1], message[0]))
     
     history = []
-    for msg in messages:
-        role = "user" if msg.message_type == "user" else "assistant"
+    for _, _, message_type, content in messages[-limit:]:
+        role = "user" if message_type == "user" else "assistant"
         history.append({
             "role": role,
-            "content": msg.content
+            "content": content
         })
     
     return history
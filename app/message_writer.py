@@ -0,0 +1,335 @@
+import asyncio
+import glob
+import json
+import os
+import secrets
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .database import ASYNC_DATABASE_URL, PoolMetrics, engine_options
+from .metrics import WRITE_BEHIND_BATCH, WRITE_BEHIND_FLUSH, WRITE_BEHIND_PENDING
+from .models import ChatMessage, utcnow
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks on Windows; run a single worker there
+    fcntl = None
+
+load_dotenv()
+
+# Batch chat message inserts across requests instead of committing each message
+CHAT_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+# How long the writer collects messages before logging and inserting them
+CHAT_WRITE_BEHIND_INTERVAL = float(os.getenv("CHAT_WRITE_BEHIND_INTERVAL_MS", "5")) / 1000
+CHAT_WRITE_BEHIND_BATCH_SIZE = int(os.getenv("CHAT_WRITE_BEHIND_BATCH_SIZE", "500"))
+# Directory of the per-worker append-only logs replayed after a crash
+CHAT_WRITE_BEHIND_DIR = os.getenv("CHAT_WRITE_BEHIND_DIR", "write_behind")
+# Message ids reserved from the database sequence per round trip
+CHAT_WRITE_BEHIND_ID_BLOCK = int(os.getenv("CHAT_WRITE_BEHIND_ID_BLOCK", "100"))
+# Seconds to wait before retrying after the database rejected a batch
+CHAT_WRITE_BEHIND_RETRY = 1.0
+
+write_behind_pool_metrics = PoolMetrics("write_behind")
+
+RESERVE_IDS_QUERY = text(
+    "SELECT nextval(pg_get_serial_sequence('chat_messages', 'id')) FROM generate_series(1, :count)"
+)
+
+class MessageWriter:
+    """Write-behind persistence of chat messages.
+
+    add_message() takes an id from a block reserved from the chat_messages sequence and
+    queues the row. Every CHAT_WRITE_BEHIND_INTERVAL_MS the queued records are appended to
+    a local log and fsynced. Only then are their callers answered. After that, the records
+    go to the database as one multi-row insert. The log is emptied once everything in it
+    is in the database. At startup, logs left behind by crashed workers are replayed, and
+    rows that already made it in are skipped.
+
+    Messages that are logged but not yet inserted are only visible through
+    pending_messages(), and only in the worker that wrote them.
+    """
+
+    def __init__(self, enabled: bool = CHAT_WRITE_BEHIND):
+        self.enabled = enabled
+        self._queue: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]] = []
+        self._wake = asyncio.Event()
+        self._ids: deque = deque()
+        self._id_lock = asyncio.Lock()
+        # Logged but not yet inserted: message id -> row, and message id -> intent label for stored rows
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._pending_updates: Dict[int, Dict[str, Optional[str]]] = {}
+        self._engine = None
+        self._sessionmaker = None
+        self._log = None
+        self._log_path: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self):
+        if not self.enabled:
+            return
+        options = engine_options(ASYNC_DATABASE_URL, write_behind_pool_metrics, is_async=True)
+        if "pool_size" in options:
+            # A pool of its own, so acknowledging messages never waits behind requests holding the main pool
+            options.update(pool_size=1, max_overflow=1)
+        self._engine = create_async_engine(ASYNC_DATABASE_URL, **options)
+        if self._engine.dialect.name != "postgresql":
+            print("CHAT_WRITE_BEHIND needs PostgreSQL; writing chat messages directly")
+            self.enabled = False
+            return
+        self._sessionmaker = async_sessionmaker(self._engine, class_=AsyncSession, expire_on_commit=False)
+        os.makedirs(CHAT_WRITE_BEHIND_DIR, exist_ok=True)
+        await self.replay()
+        try:
+            self._log, self._log_path = self._open_log()
+        except OSError as e:
+            print(f"Could not create the chat message log, writing chat messages directly: {e}")
+            self.enabled = False
+            await self._engine.dispose()
+            return
+        self._task = asyncio.create_task(self.run())
+
+    def _open_log(self):
+        """Create this worker's log, locked before replay() in other workers can see it"""
+        fd, temp_path = tempfile.mkstemp(prefix=".messages-", suffix=".tmp", dir=CHAT_WRITE_BEHIND_DIR)
+        log = os.fdopen(fd, "ab")
+        try:
+            if fcntl is not None:
+                fcntl.flock(log.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # Unique per start, so a recycled pid never replaces a crashed worker's log
+            path = os.path.join(CHAT_WRITE_BEHIND_DIR, f"messages-{os.getpid()}-{secrets.token_hex(4)}.log")
+            os.rename(temp_path, path)
+        except OSError:
+            log.close()
+            os.remove(temp_path)
+            raise
+        return log, path
+
+    async def stop(self):
+        """Log and insert everything still queued"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        # Remove the log while still holding its lock, so no other worker replays it meanwhile
+        if not self._pending and not self._pending_updates:
+            os.remove(self._log_path)
+        self._log.close()
+        await self._engine.dispose()
+
+    async def add_message(self, session_id: int, message_type: str, content: str,
+                          query_type: Optional[str] = None, query_type_source: Optional[str] = None) -> int:
+        """Queue a message, returning its id once it is safely in the local log"""
+        message_id = await self._reserve_id()
+        await self._submit({
+            "op": "insert",
+            "id": message_id,
+            "session_id": session_id,
+            "message_type": message_type,
+            "content": content,
+            "query_type": query_type,
+            "query_type_source": query_type_source,
+            # The same clock as rows written directly
+            "timestamp": utcnow().isoformat(),
+        })
+        return message_id
+
+    def set_query_type(self, message_id: int, query_type: str, query_type_source: Optional[str] = None):
+        """Queue an intent label for a message. It is logged with, and so acknowledged by, the next add_message()"""
+        self._queue.append(({"op": "query_type", "id": message_id, "query_type": query_type,
+                             "query_type_source": query_type_source}, None))
+        self._wake.set()
+
+    def pending_messages(self, session_id: int) -> List[Dict[str, Any]]:
+        """Messages of a session acknowledged by this worker but not yet inserted, oldest first.
+        Rows have the chat_messages columns, with timestamp as a datetime."""
+        return [dict(row) for row in self._pending.values() if row["session_id"] == session_id]
+
+    def discard_session(self, session_id: int):
+        """Forget pending messages of a deleted session"""
+        for message_id in [i for i, row in self._pending.items() if row["session_id"] == session_id]:
+            del self._pending[message_id]
+        WRITE_BEHIND_PENDING.set(len(self._pending))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "queued": len(self._queue),
+            "pending": len(self._pending),
+            "pending_updates": len(self._pending_updates),
+            "reserved_ids": len(self._ids),
+            "pool": write_behind_pool_metrics.stats(self._engine.pool) if self._engine is not None else None,
+        }
+
+    async def _reserve_id(self) -> int:
+        async with self._id_lock:
+            if not self._ids:
+                async with self._sessionmaker() as db:
+                    result = await db.execute(RESERVE_IDS_QUERY, {"count": CHAT_WRITE_BEHIND_ID_BLOCK})
+                    self._ids.extend(sorted(row[0] for row in result))
+            return self._ids.popleft()
+
+    async def _submit(self, record: Dict[str, Any]):
+        if self._task is None:
+            raise RuntimeError("message writer is not running")
+        acknowledged = asyncio.get_running_loop().create_future()
+        self._queue.append((record, acknowledged))
+        self._wake.set()
+        await acknowledged
+
+    async def run(self):
+        while True:
+            await self._wake.wait()
+            # Collect whatever else arrives within the interval into the same batch
+            await asyncio.sleep(CHAT_WRITE_BEHIND_INTERVAL)
+            self._wake.clear()
+            batch, self._queue = self._queue[:CHAT_WRITE_BEHIND_BATCH_SIZE], self._queue[CHAT_WRITE_BEHIND_BATCH_SIZE:]
+            if self._queue:
+                self._wake.set()
+
+            if batch:
+                records = [record for record, _ in batch]
+                try:
+                    await anyio.to_thread.run_sync(self._append, records)
+                except Exception as e:
+                    print(f"Could not write the chat message log: {e}")
+                    for _, acknowledged in batch:
+                        if acknowledged is not None and not acknowledged.done():
+                            acknowledged.set_exception(e)
+                    continue
+                self._apply(records)
+                for _, acknowledged in batch:
+                    if acknowledged is not None and not acknowledged.done():
+                        acknowledged.set_result(None)
+
+            if self._pending or self._pending_updates:
+                if await self._flush():
+                    if not self._pending and not self._pending_updates:
+                        self._log.truncate(0)
+                elif not self._stopping:
+                    await asyncio.sleep(CHAT_WRITE_BEHIND_RETRY)
+                    self._wake.set()
+
+            if self._stopping and not self._queue:
+                return
+
+    def _append(self, records: List[Dict[str, Any]]):
+        self._log.write(b"".join(json.dumps(record).encode() + b"\n" for record in records))
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    def _apply(self, records: List[Dict[str, Any]]):
+        """Fold logged records into the rows and updates waiting for the database"""
+        for record in records:
+            if record["op"] == "insert":
+                row = {key: value for key, value in record.items() if key != "op"}
+                # Logs written before timestamps were recorded get the replay time
+                row["timestamp"] = datetime.fromisoformat(row["timestamp"]) if row.get("timestamp") else utcnow()
+                # Logs written before label sources were recorded have none
+                row.setdefault("query_type_source", None)
+                self._pending[record["id"]] = row
+            else:
+                label = {"query_type": record["query_type"], "query_type_source": record.get("query_type_source")}
+                if record["id"] in self._pending:
+                    self._pending[record["id"]].update(label)
+                else:
+                    self._pending_updates[record["id"]] = label
+        WRITE_BEHIND_PENDING.set(len(self._pending))
+
+    async def _flush(self) -> bool:
+        """Insert pending rows and apply pending updates, returning whether the database took them"""
+        rows = list(self._pending.values())
+        updates = dict(self._pending_updates)
+        start = time.perf_counter()
+        try:
+            await self._write(rows, updates)
+        except Exception as e:
+            print(f"Could not insert {len(rows)} chat messages, keeping them in the log for a retry: {e}")
+            return False
+        WRITE_BEHIND_FLUSH.observe(time.perf_counter() - start)
+        if rows:
+            WRITE_BEHIND_BATCH.observe(len(rows))
+        for row in rows:
+            self._pending.pop(row["id"], None)
+        for message_id in updates:
+            self._pending_updates.pop(message_id, None)
+        WRITE_BEHIND_PENDING.set(len(self._pending))
+        return True
+
+    async def _write(self, rows: List[Dict[str, Any]], updates: Dict[int, Dict[str, Optional[str]]]):
+        """One transaction of inserts (skipping ids already stored) and query_type updates"""
+        async with self._sessionmaker() as db:
+            try:
+                if rows:
+                    await db.execute(pg_insert(ChatMessage.__table__).values(rows).on_conflict_do_nothing(index_elements=["id"]))
+                if updates:
+                    await db.execute(
+                        update(ChatMessage.__table__).where(ChatMessage.__table__.c.id == bindparam("message_id"))
+                        .values(query_type=bindparam("new_query_type"), query_type_source=bindparam("new_query_type_source")),
+                        [{"message_id": message_id, "new_query_type": label["query_type"],
+                          "new_query_type_source": label["query_type_source"]} for message_id, label in updates.items()]
+                    )
+                await db.commit()
+                return
+            except IntegrityError as e:
+                # Usually a message whose session was deleted; insert row by row and drop the ones that fail
+                await db.rollback()
+                print(f"Chat message batch rejected, inserting row by row: {e.orig}")
+
+            for row in rows:
+                try:
+                    async with db.begin_nested():
+                        await db.execute(pg_insert(ChatMessage.__table__).values(row).on_conflict_do_nothing(index_elements=["id"]))
+                except IntegrityError as e:
+                    print(f"Dropping chat message {row['id']}: {e.orig}")
+            for message_id, label in updates.items():
+                await db.execute(update(ChatMessage.__table__).where(ChatMessage.__table__.c.id == message_id).values(**label))
+            await db.commit()
+
+    async def replay(self):
+        """Insert what crashed workers logged but may not have stored"""
+        for path in sorted(glob.glob(os.path.join(CHAT_WRITE_BEHIND_DIR, "messages-*.log"))):
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                continue  # replayed by another worker meanwhile
+            with f:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # a running worker's log
+                    # Another worker may have replayed and removed the file between our open and lock
+                    try:
+                        if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                            continue
+                    except FileNotFoundError:
+                        continue
+                records = []
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        pass  # a record torn by the crash was never acknowledged
+                if records:
+                    self._apply(records)
+                    count = len(self._pending)
+                    if not await self._flush():
+                        # Keep the file; the rows stay pending and the writer retries them
+                        continue
+                    print(f"Replayed {count} chat messages from {path}")
+                os.remove(path)
+
+message_writer = MessageWriter()
@@ -0,0 +1,207 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, List, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+# Chat pipeline stages span milliseconds (cache hits, index lookups) to tens of seconds (LLM calls)
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "chat_stage_duration_seconds",
+    "Time spent in each stage of a chat turn",
+    ["stage", "query_type"],
+    buckets=STAGE_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "chat_stage_errors_total",
+    "Exceptions raised inside a chat turn stage",
+    ["stage", "query_type"],
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Groq tokens reported in the completion usage",
+    ["call", "kind"],
+)
+
+# Groq call layer (app/llm_client.py)
+LLM_QUEUE_DEPTH = Gauge(
+    "llm_queue_depth",
+    "LLM calls waiting for a concurrency slot or token budget",
+    multiprocess_mode="livesum",
+)
+LLM_IN_FLIGHT = Gauge(
+    "llm_in_flight_requests",
+    "LLM requests currently sent to the provider",
+    multiprocess_mode="livesum",
+)
+LLM_THROTTLED = Counter(
+    "llm_throttled_total",
+    "LLM calls that had to wait, by the limit that held them",
+    ["call", "limit"],
+)
+LLM_THROTTLE_WAIT = Histogram(
+    "llm_throttle_wait_seconds",
+    "Time LLM calls spent waiting for a concurrency slot and token budget",
+    ["call"],
+    buckets=STAGE_BUCKETS,
+)
+LLM_REQUESTS = Counter(
+    "llm_requests_total",
+    "LLM calls by final outcome, after any retries",
+    ["call", "outcome"],
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "LLM requests retried, by the failure that caused the retry",
+    ["call", "reason"],
+)
+LLM_HEDGES = Counter(
+    "llm_hedged_requests_total",
+    "Hedged LLM requests launched, and how many finished first",
+    ["call", "outcome"],
+)
+
+# Speculative database prefetch (LLMService._build_messages)
+SPECULATIVE_QUERIES = Counter(
+    "speculative_queries_total",
+    "Database lookups started before LLM classification finished: hit (used), miss (discarded), "
+    "or unpredicted (the turn needed a lookup that wasn't started)",
+    ["query_type", "outcome"],
+)
+SPECULATION_SAVED = Histogram(
+    "speculative_query_saved_seconds",
+    "Database time of used speculative lookups that overlapped LLM classification",
+    ["query_type"],
+    buckets=STAGE_BUCKETS,
+)
+
+# Write-behind chat message persistence (app/message_writer.py)
+WRITE_BEHIND_PENDING = Gauge(
+    "chat_write_behind_pending",
+    "Chat messages acknowledged from the local log but not yet in the database",
+    multiprocess_mode="livesum",
+)
+WRITE_BEHIND_BATCH = Histogram(
+    "chat_write_behind_batch_rows",
+    "Chat messages per write-behind insert",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+WRITE_BEHIND_FLUSH = Histogram(
+    "chat_write_behind_flush_seconds",
+    "Time to insert one write-behind batch",
+    buckets=STAGE_BUCKETS,
+)
+
+# Query type label for stages of a turn that ended before the message was classified
+UNCLASSIFIED = "unclassified"
+
+class ChatTurn:
+    """Stage timings of one chat turn, reported once the turn's query_type is known.
+
+    Session lookup, message inserts and history loading happen before classification,
+    so timings are buffered and labeled with the final query_type in finish().
+    """
+
+    def __init__(self):
+        self.query_type: Optional[str] = None
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, float, bool]] = []
+        self.finished = False
+
+    def activate(self):
+        """Make this the turn that stage() records into, in the current context"""
+        _current_turn.set(self)
+
+    def record(self, name: str, seconds: float, failed: bool = False):
+        self.stages.append((name, seconds, failed))
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.record("total", time.perf_counter() - self.started)
+        query_type = self.query_type or UNCLASSIFIED
+        for name, seconds, failed in self.stages:
+            observe_stage(name, query_type, seconds, failed)
+        if _current_turn.get() is self:
+            _current_turn.set(None)
+
+_current_turn: ContextVar[Optional[ChatTurn]] = ContextVar("chat_turn", default=None)
+# Turns started while handling the current HTTP request, for its Server-Timing header
+_request_turns: ContextVar[Optional[List[ChatTurn]]] = ContextVar("request_turns", default=None)
+
+def start_turn() -> ChatTurn:
+    turn = ChatTurn()
+    turn.activate()
+    turns = _request_turns.get()
+    if turns is not None:
+        turns.append(turn)
+    return turn
+
+def collect_turns() -> List[ChatTurn]:
+    """Start collecting the turns of the request handled in the current context"""
+    turns: List[ChatTurn] = []
+    _request_turns.set(turns)
+    return turns
+
+def set_query_type(query_type: str):
+    """Label the current turn's stages with the query type it was classified as"""
+    turn = _current_turn.get()
+    if turn is not None:
+        turn.query_type = query_type
+
+def observe_stage(name: str, query_type: str, seconds: float, failed: bool = False):
+    STAGE_SECONDS.labels(name, query_type).observe(seconds)
+    if failed:
+        STAGE_ERRORS.labels(name, query_type).inc()
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a stage of the current chat turn; outside a turn it is reported directly"""
+    turn = _current_turn.get()
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        if turn is not None and not turn.finished:
+            turn.record(name, seconds, failed)
+        else:
+            observe_stage(name, UNCLASSIFIED, seconds, failed)
+
+def record_tokens(call: str, usage: Any):
+    """Count prompt/completion tokens from a Groq usage object (or the dict form sent on streams)"""
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        key = f"{kind}_tokens"
+        count = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+        if count:
+            LLM_TOKENS.labels(call, kind).inc(count)
+
+def stream_usage(chunk: Any) -> Any:
+    """Usage reported on a streamed chunk; Groq sends it in x_groq on the final chunk"""
+    usage = getattr(chunk, "usage", None)
+    if usage is not None:
+        return usage
+    x_groq = getattr(chunk, "x_groq", None)
+    if isinstance(x_groq, dict):
+        return x_groq.get("usage")
+    return getattr(x_groq, "usage", None)
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheus text exposition; aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,12 +1,20 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, Index, event, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
+from .availability import install_availability_triggers
+from .sales import install_sales_triggers
+
+def utcnow() -> datetime:
+    """Naive UTC, the one clock of chat sessions and messages whichever path writes them"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 class DistributionCenter(Base):
     __tablename__ = "distribution_centers"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
@@ -16,7 +24,7 @@ class DistributionCenter(Base):
 class Product(Base):
     __tablename__ = "products"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     cost = Column(Float, nullable=False)
     category = Column(String, nullable=False)
     name = Column(String, nullable=False)
@@ -29,11 +37,19 @@ class Product(Base):
     distribution_center = relationship("DistributionCenter", back_populates="products")
     inventory_items = relationship("InventoryItem", back_populates="product")
     order_items = relationship("OrderItem", back_populates="product")
+    
+    __table_args__ = (
+        Index("ix_products_sku", "sku"),
+        # Trigram indexes for the ILIKE '%x%' product search filters (requires pg_trgm)
+        Index("ix_products_category_trgm", "category", postgresql_using="gin", postgresql_ops={"category": "gin_trgm_ops"}),
+        Index("ix_products_brand_trgm", "brand", postgresql_using="gin", postgresql_ops={"brand": "gin_trgm_ops"}),
+        Index("ix_products_department_trgm", "department", postgresql_using="gin", postgresql_ops={"department": "gin_trgm_ops"}),
+    )
 
 class InventoryItem(Base):
     __tablename__ = "inventory_items"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     created_at = Column(DateTime, default=func.now())
     sold_at = Column(DateTime, nullable=True)
@@ -48,11 +64,43 @@ class InventoryItem(Base):
     
     product = relationship("Product", back_populates="inventory_items")
     order_items = relationship("OrderItem", back_populates="inventory_item")
+    
+    __table_args__ = (
+        Index("ix_inventory_items_product_id_unsold", "product_id", postgresql_where=text("sold_at IS NULL")),
+    )
+
+# Unsold inventory count per product, maintained by triggers on inventory_items
+class ProductAvailability(Base):
+    __tablename__ = "product_availability"
+    
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    available_count = Column(Integer, nullable=False, default=0)
+
+# Unsold inventory count per product and distribution center (0 when the center is unknown)
+class ProductDistributionCenterAvailability(Base):
+    __tablename__ = "product_dc_availability"
+    
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    distribution_center_id = Column(Integer, primary_key=True)
+    available_count = Column(Integer, nullable=False, default=0)
+
+# Sales rollup per product, maintained by triggers on order_items
+class ProductSales(Base):
+    __tablename__ = "product_sales"
+    
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    units_sold = Column(Integer, nullable=False, default=0)
+    units_returned = Column(Integer, nullable=False, default=0)
+    last_sold_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_product_sales_units_sold", units_sold.desc()),
+    )
 
 class User(Base):
     __tablename__ = "users"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False)
@@ -74,7 +122,7 @@ class User(Base):
 class Order(Base):
     __tablename__ = "orders"
     
-    order_id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     status = Column(String, nullable=False)
     gender = Column(String, nullable=True)
@@ -86,11 +134,15 @@ class Order(Base):
     
     user = relationship("User", back_populates="orders")
     order_items = relationship("OrderItem", back_populates="order")
+    
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", created_at.desc()),
+    )
 
 class OrderItem(Base):
     __tablename__ = "order_items"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     order_id = Column(Integer, ForeignKey("orders.order_id"))
     user_id = Column(Integer, ForeignKey("users.id"))
     product_id = Column(Integer, ForeignKey("products.id"))
@@ -104,26 +156,97 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="order_items")
     product = relationship("Product", back_populates="order_items")
     inventory_item = relationship("InventoryItem", back_populates="order_items")
+    
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+        Index("ix_order_items_product_id", "product_id"),
+    )
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     session_id = Column(String, unique=True, nullable=False)
-    created_at = Column(DateTime, default=func.now())
+    created_at = Column(DateTime, default=utcnow)
     is_active = Column(Boolean, default=True)
     
     user = relationship("User", back_populates="chat_sessions")
     messages = relationship("ChatMessage", back_populates="session")
+    
+    # Keyset pagination of /api/sessions, with and without a user_id filter
+    __table_args__ = (
+        Index("ix_chat_sessions_created_at_id", created_at.desc(), id.desc()),
+        Index("ix_chat_sessions_user_id_created_at_id", "user_id", created_at.desc(), id.desc()),
+    )
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     session_id = Column(Integer, ForeignKey("chat_sessions.id"))
     message_type = Column(String, nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
-    timestamp = Column(DateTime, default=func.now())
+    query_type = Column(String, nullable=True)  # intent assigned to user messages
+    query_type_source = Column(String, nullable=True)  # who assigned it: local, cache, llm or tools
+    timestamp = Column(DateTime, default=utcnow)
+    
+    session = relationship("ChatSession", back_populates="messages")
+    
+    __table_args__ = (
+        Index("ix_chat_messages_session_id_timestamp_desc", "session_id", timestamp.desc(), id.desc()),
+    )
+
+# Incremental ingestion state per table: the highest row timestamp loaded so far
+class IngestionWatermark(Base):
+    __tablename__ = "ingestion_watermarks"
+    
+    table_name = Column(String, primary_key=True)
+    watermark = Column(DateTime, nullable=True)
+    chunk_size = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+# Content checksums of CSV chunks, for tables without timestamps to compare
+class IngestionChunkChecksum(Base):
+    __tablename__ = "ingestion_chunk_checksums"
     
-    session = relationship("ChatSession", back_populates="messages") 
\ No newline at end of file
+    table_name = Column(String, primary_key=True)
+    chunk_index = Column(Integer, primary_key=True)
+    checksum = Column(String, nullable=False)
+
+# One CSV load: the files it read and whether it finished, so --resume only continues an interrupted load of the same input
+class IngestionRun(Base):
+    __tablename__ = "ingestion_runs"
+    
+    id = Column(Integer, primary_key=True)
+    inputs = Column(Text, nullable=False)  # JSON: table -> {"size": bytes, "sha1": hex digest} of its CSV
+    incremental = Column(Boolean, nullable=False, default=False)
+    started_at = Column(DateTime, default=func.now())
+    completed_at = Column(DateTime, nullable=True)
+
+# Chunks committed by an unfinished CSV load, so it can resume
+class IngestionCheckpoint(Base):
+    __tablename__ = "ingestion_checkpoints"
+    
+    run_id = Column(Integer, ForeignKey("ingestion_runs.id"), primary_key=True)
+    table_name = Column(String, primary_key=True)
+    chunk = Column(String, primary_key=True)  # "<chunk size>:<index>", prefixed with "<start>-<end>:" for byte ranges
+    rows = Column(Integer, nullable=False)
+    completed_at = Column(DateTime, default=func.now())
+
+# Indexes, foreign keys and triggers a parallel load has dropped or disabled and not yet restored,
+# so a load killed before it could restore them leaves their definitions behind
+class IngestionDeferredDDL(Base):
+    __tablename__ = "ingestion_deferred_ddl"
+    
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey("ingestion_runs.id"), nullable=True)
+    kind = Column(String, nullable=False)  # index, foreign_key or trigger
+    table_name = Column(String, nullable=False)
+    name = Column(String, nullable=True)  # index or constraint name; none for the table's user triggers
+    definition = Column(Text, nullable=True)  # pg_get_indexdef / pg_get_constraintdef
+    deferred_at = Column(DateTime, default=func.now())
+
+# Keep the summary tables in sync with inventory_items and order_items
+event.listen(Base.metadata, "after_create", install_availability_triggers)
+event.listen(Base.metadata, "after_create", install_sales_triggers)
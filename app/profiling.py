@@ -0,0 +1,127 @@
+import json
+import os
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import anyio
+from dotenv import load_dotenv
+
+from .metrics import ChatTurn, collect_turns
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # pyinstrument is only needed for slow-request profiles
+    Profiler = None
+
+load_dotenv()
+
+# Requests slower than this many milliseconds are written to PROFILE_DIR; 0 disables the profiler
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Fraction of requests run under the sampling profiler, to bound its overhead under load
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.05"))
+
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+if PROFILE_SLOW_REQUEST_MS > 0 and Profiler is None:
+    print("PROFILE_SLOW_REQUEST_MS is set but pyinstrument is not installed; slow requests are logged without a profile")
+
+def request_id_from(scope: Dict[str, Any]) -> str:
+    """The caller's X-Request-ID if it is a safe file name, otherwise a new id"""
+    for name, value in scope.get("headers", []):
+        if name == b"x-request-id":
+            candidate = value.decode("latin-1")
+            if REQUEST_ID_PATTERN.match(candidate):
+                return candidate
+    return uuid.uuid4().hex
+
+def stage_durations(turns: List[ChatTurn]) -> Dict[str, float]:
+    """Seconds per stage across the request's chat turns, in the order stages first ran"""
+    durations: Dict[str, float] = {}
+    for turn in turns:
+        for name, seconds, _ in turn.stages:
+            durations[name] = durations.get(name, 0.0) + seconds
+    return durations
+
+def server_timing(turns: List[ChatTurn], elapsed: float) -> str:
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stage_durations(turns).items()]
+    entries.append(f"app;dur={elapsed * 1000:.1f}")
+    return ", ".join(entries)
+
+def write_slow_request(path: str, summary: Dict[str, Any], profile_html: Optional[str]):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(f"{path}.json", "w") as f:
+        json.dump(summary, f, indent=2)
+    if profile_html is not None:
+        with open(f"{path}.html", "w") as f:
+            f.write(profile_html)
+
+class RequestTimingMiddleware:
+    """Adds X-Request-ID and a Server-Timing stage breakdown to every response, and keeps
+    a sampling profile of requests slower than PROFILE_SLOW_REQUEST_MS.
+
+    Server-Timing is sent with the response headers, so streamed responses only include
+    the stages that finished before the stream started.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = request_id_from(scope)
+        turns = collect_turns()
+        response_status = None
+        profiler = None
+        if PROFILE_SLOW_REQUEST_MS > 0 and Profiler is not None and random.random() < PROFILE_SAMPLE_RATE:
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode()))
+                headers.append((b"server-timing", server_timing(turns, time.perf_counter() - start).encode()))
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.stop()
+            if PROFILE_SLOW_REQUEST_MS > 0 and elapsed * 1000 >= PROFILE_SLOW_REQUEST_MS:
+                with anyio.CancelScope(shield=True):
+                    await self.save_slow_request(scope, request_id, response_status, elapsed, turns, profiler)
+
+    async def save_slow_request(self, scope, request_id: str, response_status: Optional[int], elapsed: float,
+                                turns: List[ChatTurn], profiler):
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%dT%H%M%S')}-{request_id}")
+        summary = {
+            "request_id": request_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": response_status,
+            "duration_ms": round(elapsed * 1000, 1),
+            "query_types": [turn.query_type for turn in turns],
+            "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in stage_durations(turns).items()},
+        }
+        try:
+            # Rendering and writing happen off the event loop
+            await anyio.to_thread.run_sync(
+                lambda: write_slow_request(path, summary, profiler.output_html() if profiler else None)
+            )
+            print(f"Slow request {request_id}: {scope['method']} {scope['path']} took {summary['duration_ms']}ms, saved to {path}")
+        except Exception as e:
+            print(f"Could not save slow request profile {request_id}: {e}")
@@ -0,0 +1,123 @@
+from sqlalchemy import text
+
+_NEW_ROWS = """
+            SELECT product_id, 1 AS sold, CASE WHEN returned_at IS NULL THEN 0 ELSE 1 END AS returned
+            FROM new_rows
+            WHERE product_id IS NOT NULL"""
+
+_OLD_ROWS = """
+            SELECT product_id, -1 AS sold, CASE WHEN returned_at IS NULL THEN 0 ELSE -1 END AS returned
+            FROM old_rows
+            WHERE product_id IS NOT NULL"""
+
+# Inserts only ever add sales, so last_sold_at can be advanced without rescanning order_items
+_ON_INSERT = """
+CREATE OR REPLACE FUNCTION product_sales_on_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO product_sales (product_id, units_sold, units_returned, last_sold_at)
+    SELECT product_id, COUNT(*), COUNT(returned_at), MAX(created_at)
+    FROM new_rows
+    WHERE product_id IS NOT NULL
+    GROUP BY product_id
+    ORDER BY product_id
+    ON CONFLICT (product_id) DO UPDATE SET
+        units_sold = product_sales.units_sold + EXCLUDED.units_sold,
+        units_returned = product_sales.units_returned + EXCLUDED.units_returned,
+        last_sold_at = GREATEST(product_sales.last_sold_at, EXCLUDED.last_sold_at);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Updates and deletes apply count deltas, then recompute last_sold_at for the touched products only
+def _apply_deltas_function(name: str, rows: str, touched: str) -> str:
+    return f"""
+CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$
+BEGIN
+    WITH deltas AS (
+        {rows}
+    )
+    INSERT INTO product_sales (product_id, units_sold, units_returned)
+    SELECT product_id, SUM(sold), SUM(returned)
+    FROM deltas
+    GROUP BY product_id
+    HAVING SUM(sold) <> 0 OR SUM(returned) <> 0
+    ORDER BY product_id
+    ON CONFLICT (product_id) DO UPDATE SET
+        units_sold = product_sales.units_sold + EXCLUDED.units_sold,
+        units_returned = product_sales.units_returned + EXCLUDED.units_returned;
+
+    UPDATE product_sales ps
+    SET last_sold_at = (SELECT MAX(oi.created_at) FROM order_items oi WHERE oi.product_id = ps.product_id)
+    WHERE ps.product_id IN ({touched});
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+SALES_TRIGGER_DDL = [
+    _ON_INSERT,
+    _apply_deltas_function(
+        "product_sales_on_update",
+        _NEW_ROWS + "\n            UNION ALL" + _OLD_ROWS,
+        "SELECT product_id FROM new_rows UNION SELECT product_id FROM old_rows"
+    ),
+    _apply_deltas_function(
+        "product_sales_on_delete",
+        _OLD_ROWS,
+        "SELECT product_id FROM old_rows"
+    ),
+    "DROP TRIGGER IF EXISTS product_sales_insert ON order_items",
+    """
+CREATE TRIGGER product_sales_insert
+AFTER INSERT ON order_items
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION product_sales_on_insert()
+""",
+    "DROP TRIGGER IF EXISTS product_sales_update ON order_items",
+    """
+CREATE TRIGGER product_sales_update
+AFTER UPDATE ON order_items
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION product_sales_on_update()
+""",
+    "DROP TRIGGER IF EXISTS product_sales_delete ON order_items",
+    """
+CREATE TRIGGER product_sales_delete
+AFTER DELETE ON order_items
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION product_sales_on_delete()
+""",
+]
+
+SALES_TRIGGER_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS product_sales_insert ON order_items",
+    "DROP TRIGGER IF EXISTS product_sales_update ON order_items",
+    "DROP TRIGGER IF EXISTS product_sales_delete ON order_items",
+    "DROP FUNCTION IF EXISTS product_sales_on_insert()",
+    "DROP FUNCTION IF EXISTS product_sales_on_update()",
+    "DROP FUNCTION IF EXISTS product_sales_on_delete()",
+]
+
+def install_sales_triggers(target, connection, **kw):
+    """Create the triggers that maintain the product_sales rollup (PostgreSQL only)"""
+    if connection.dialect.name != "postgresql":
+        return
+    for statement in SALES_TRIGGER_DDL:
+        connection.execute(text(statement))
+
+def refresh_product_sales(connection):
+    """Recompute the product_sales rollup from order_items.
+
+    Used after bulk loads or from a scheduled job; blocks order item writes until the surrounding transaction commits.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("LOCK TABLE order_items IN SHARE MODE"))
+    connection.execute(text("DELETE FROM product_sales"))
+    connection.execute(text("""
+        INSERT INTO product_sales (product_id, units_sold, units_returned, last_sold_at)
+        SELECT product_id, COUNT(*), COUNT(returned_at), MAX(created_at)
+        FROM order_items
+        WHERE product_id IS NOT NULL
+        GROUP BY product_id
+    """))
@@ -23,6 +23,21 @@ class ChatSessionResponse(BaseModel):
     is_active: bool
     messages: List[ChatMessageResponse] = []
 
+class ChatSessionSummary(BaseModel):
+    id: int
+    user_id: Optional[int] = None
+    session_id: str
+    created_at: datetime
+    is_active: bool
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
+    last_message: Optional[str] = None
+    messages: Optional[List[ChatMessageResponse]] = None
+
+class ChatSessionPage(BaseModel):
+    sessions: List[ChatSessionSummary]
+    next_cursor: Optional[str] = None
+
 class ChatResponse(BaseModel):
     response: str
     session_id: str
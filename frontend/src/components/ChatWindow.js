@@ -41,16 +41,29 @@ const ChatWindow = () => {
     setIsLoading(true);
     setError(null);
 
-    try {
-      const response = await chatAPI.sendMessage(messageText, activeConversationId);
-      
-      const assistantMessage = {
-        role: 'assistant',
-        content: response.response,
-        timestamp: new Date().toISOString()
-      };
+    let receivedTokens = false;
 
-      setMessages(prev => [...prev, assistantMessage]);
+    try {
+      const response = await chatAPI.streamMessage(messageText, (token) => {
+        if (!receivedTokens) {
+          receivedTokens = true;
+          setIsLoading(false);
+          setMessages(prev => [...prev, {
+            role: 'assistant',
+            content: token,
+            timestamp: new Date().toISOString()
+          }]);
+          return;
+        }
+
+        // Append streamed text to the assistant message being generated
+        setMessages(prev => {
+          const updated = [...prev];
+          const last = updated[updated.length - 1];
+          updated[updated.length - 1] = { ...last, content: last.content + token };
+          return updated;
+        });
+      }, activeConversationId);
       
       // Update active conversation ID if this is a new conversation
       if (response.session_id && !activeConversationId) {
@@ -62,8 +75,10 @@ const ChatWindow = () => {
       console.error('Failed to send message:', err);
       setError('Failed to send message. Please try again.');
       
-      // Remove the user message if the API call failed
-      setMessages(prev => prev.slice(0, -1));
+      // Remove the user message if the API call failed before any response arrived
+      if (!receivedTokens) {
+        setMessages(prev => prev.slice(0, -1));
+      }
     } finally {
       setIsLoading(false);
     }
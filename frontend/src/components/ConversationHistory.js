@@ -10,19 +10,20 @@ const ConversationHistory = ({
   isLoading = false 
 }) => {
   const getConversationPreview = (conversation) => {
-    if (!conversation.messages || conversation.messages.length === 0) {
+    if (!conversation.last_message) {
       return 'No messages yet';
     }
     
-    const lastMessage = conversation.messages[conversation.messages.length - 1];
-    return lastMessage.content.length > 50 
-      ? lastMessage.content.substring(0, 50) + '...' 
-      : lastMessage.content;
+    const lastMessage = conversation.last_message;
+    return lastMessage.length > 50 
+      ? lastMessage.substring(0, 50) + '...' 
+      : lastMessage;
   };
 
   const getConversationTime = (conversation) => {
-    if (!conversation.created_at) return '';
-    const date = new Date(conversation.created_at);
+    const timestamp = conversation.last_message_at || conversation.created_at;
+    if (!timestamp) return '';
+    const date = new Date(timestamp);
     const now = new Date();
     const diffInHours = (now - date) / (1000 * 60 * 60);
     
@@ -66,11 +67,11 @@ const ConversationHistory = ({
           <div className="divide-y divide-gray-200">
             {conversations.map((conversation) => (
               <div
-                key={conversation.id}
+                key={conversation.session_id}
                 className={`conversation-item ${
-                  activeConversationId === conversation.id ? 'active' : ''
+                  activeConversationId === conversation.session_id ? 'active' : ''
                 }`}
-                onClick={() => onSelectConversation(conversation.id)}
+                onClick={() => onSelectConversation(conversation.session_id)}
               >
                 <div className="flex justify-between items-start">
                   <div className="flex-1 min-w-0">
@@ -81,7 +82,7 @@ const ConversationHistory = ({
                       <button
                         onClick={(e) => {
                           e.stopPropagation();
-                          onDeleteConversation(conversation.id);
+                          onDeleteConversation(conversation.session_id);
                         }}
                         className="text-gray-400 hover:text-red-500 transition-colors"
                         title="Delete conversation"
@@ -90,6 +91,7 @@ const ConversationHistory = ({
                       </button>
                     </div>
                     <p className="text-xs text-gray-500 truncate mt-1">
+                      {conversation.message_count > 0 && `${conversation.message_count} messages · `}
                       {getConversationPreview(conversation)}
                     </p>
                     <div className="flex items-center text-xs text-gray-400 mt-1">
@@ -45,15 +45,76 @@ export const chatAPI = {
     return response.data;
   },
 
+  // Send a message and receive the AI response as it is generated.
+  // onToken is called with each text chunk; resolves with { session_id, message_id }.
+  streamMessage: async (message, onToken, sessionId = null, userId = 1) => {
+    const payload = {
+      message,
+      user_id: userId,
+    };
+    
+    if (sessionId) {
+      payload.session_id = sessionId;
+    }
+    
+    const response = await fetch(`${API_BASE_URL}/api/chat/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(payload),
+    });
+    
+    if (!response.ok || !response.body) {
+      throw new Error(`Stream request failed: ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const result = { session_id: null, message_id: null };
+    let buffer = '';
+    
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      
+      // Server-sent events are separated by a blank line
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      
+      for (const rawEvent of events) {
+        let eventName = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event: ')) eventName = line.slice(7);
+          if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (!data) continue;
+        
+        const parsed = JSON.parse(data);
+        if (eventName === 'message') {
+          onToken(parsed.token);
+        } else {
+          Object.assign(result, parsed);
+        }
+      }
+    }
+    
+    return result;
+  },
+
   // Get a specific chat session
   getSession: async (sessionId) => {
     const response = await api.get(`/api/sessions/${sessionId}`);
     return response.data;
   },
 
-  // List all chat sessions
-  getSessions: async () => {
-    const response = await api.get('/api/sessions');
+  // List chat sessions as summaries, one page at a time (pass next_cursor to continue)
+  getSessions: async ({ cursor = null, limit = 20, includeMessages = false } = {}) => {
+    const params = { limit, include_messages: includeMessages };
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    const response = await api.get('/api/sessions', { params });
     return response.data;
   },
 
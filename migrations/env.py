@@ -0,0 +1,54 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.database import DATABASE_URL, Base
+from app import models  # noqa: F401  (registers the tables on Base.metadata)
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def run_migrations_offline():
+    """Emit the migration SQL without connecting to the database"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_on(connection):
+    # A caller migrating a scratch schema keeps its alembic_version there too
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        version_table_schema=config.attributes.get("version_table_schema"),
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """Run migrations against the database in DATABASE_URL, or on a connection passed in config.attributes"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations_on(connection)
+        return
+
+    connectable = create_engine(DATABASE_URL, poolclass=pool.NullPool)
+
+    with connectable.connect() as connection:
+        run_migrations_on(connection)
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
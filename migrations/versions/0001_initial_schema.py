@@ -0,0 +1,144 @@
+"""Initial schema, as created by Base.metadata.create_all before migrations were introduced
+
+Databases created by the old create_all startup hook can be brought under
+migration control with `alembic stamp 0001_initial_schema`.
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001_initial_schema"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "distribution_centers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("latitude", sa.Float(), nullable=False),
+        sa.Column("longitude", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_distribution_centers_id", "distribution_centers", ["id"])
+
+    op.create_table(
+        "products",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cost", sa.Float(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("brand", sa.String(), nullable=False),
+        sa.Column("retail_price", sa.Float(), nullable=False),
+        sa.Column("department", sa.String(), nullable=False),
+        sa.Column("sku", sa.String(), nullable=False),
+        sa.Column("distribution_center_id", sa.Integer(), sa.ForeignKey("distribution_centers.id")),
+    )
+    op.create_index("ix_products_id", "products", ["id"])
+
+    op.create_table(
+        "inventory_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id")),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("sold_at", sa.DateTime(), nullable=True),
+        sa.Column("cost", sa.Float(), nullable=False),
+        sa.Column("product_category", sa.String(), nullable=False),
+        sa.Column("product_name", sa.String(), nullable=False),
+        sa.Column("product_brand", sa.String(), nullable=False),
+        sa.Column("product_retail_price", sa.Float(), nullable=False),
+        sa.Column("product_department", sa.String(), nullable=False),
+        sa.Column("product_sku", sa.String(), nullable=False),
+        sa.Column("product_distribution_center_id", sa.Integer(), sa.ForeignKey("distribution_centers.id")),
+    )
+    op.create_index("ix_inventory_items_id", "inventory_items", ["id"])
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("first_name", sa.String(), nullable=False),
+        sa.Column("last_name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False, unique=True),
+        sa.Column("age", sa.Integer(), nullable=True),
+        sa.Column("gender", sa.String(), nullable=True),
+        sa.Column("state", sa.String(), nullable=True),
+        sa.Column("street_address", sa.String(), nullable=True),
+        sa.Column("postal_code", sa.String(), nullable=True),
+        sa.Column("city", sa.String(), nullable=True),
+        sa.Column("country", sa.String(), nullable=True),
+        sa.Column("latitude", sa.Float(), nullable=True),
+        sa.Column("longitude", sa.Float(), nullable=True),
+        sa.Column("traffic_source", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+
+    op.create_table(
+        "orders",
+        sa.Column("order_id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("gender", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("returned_at", sa.DateTime(), nullable=True),
+        sa.Column("shipped_at", sa.DateTime(), nullable=True),
+        sa.Column("delivered_at", sa.DateTime(), nullable=True),
+        sa.Column("num_of_item", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_orders_order_id", "orders", ["order_id"])
+
+    op.create_table(
+        "order_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.order_id")),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id")),
+        sa.Column("inventory_item_id", sa.Integer(), sa.ForeignKey("inventory_items.id")),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("shipped_at", sa.DateTime(), nullable=True),
+        sa.Column("delivered_at", sa.DateTime(), nullable=True),
+        sa.Column("returned_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_order_items_id", "order_items", ["id"])
+
+    op.create_table(
+        "chat_sessions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("session_id", sa.String(), nullable=False, unique=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("is_active", sa.Boolean(), server_default=sa.true()),
+    )
+    op.create_index("ix_chat_sessions_id", "chat_sessions", ["id"])
+
+    op.create_table(
+        "chat_messages",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("session_id", sa.Integer(), sa.ForeignKey("chat_sessions.id")),
+        sa.Column("message_type", sa.String(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_chat_messages_id", "chat_messages", ["id"])
+
+
+def downgrade():
+    for table in [
+        "chat_messages",
+        "chat_sessions",
+        "order_items",
+        "orders",
+        "users",
+        "inventory_items",
+        "products",
+        "distribution_centers",
+    ]:
+        op.drop_table(table)
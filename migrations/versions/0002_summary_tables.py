@@ -0,0 +1,76 @@
+"""Intent labels on chat messages, availability and sales summary tables
+
+Revision ID: 0002_summary_tables
+Revises: 0001_initial_schema
+Create Date: 2026-10-17 00:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.availability import AVAILABILITY_TRIGGER_DDL, AVAILABILITY_TRIGGER_DROP_DDL, rebuild_product_availability
+from app.sales import SALES_TRIGGER_DDL, SALES_TRIGGER_DROP_DDL, refresh_product_sales
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_summary_tables"
+down_revision = "0001_initial_schema"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Between the intent classifier and the introduction of migrations, the API's create_all
+    # startup hook created these objects on new databases (but added no column to existing
+    # ones), so a database stamped at 0001 may already have some of them.
+    inspector = sa.inspect(op.get_bind())
+    # Only the target schema: tables elsewhere on the search path (e.g. public, for a scratch schema) don't count
+    tables = set(inspector.get_table_names(schema=inspector.default_schema_name))
+
+    if "query_type" not in {column["name"] for column in inspector.get_columns("chat_messages")}:
+        op.add_column("chat_messages", sa.Column("query_type", sa.String(), nullable=True))
+
+    if "product_availability" not in tables:
+        op.create_table(
+            "product_availability",
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), primary_key=True),
+            sa.Column("available_count", sa.Integer(), nullable=False, server_default="0"),
+        )
+    if "product_dc_availability" not in tables:
+        op.create_table(
+            "product_dc_availability",
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), primary_key=True),
+            sa.Column("distribution_center_id", sa.Integer(), primary_key=True),
+            sa.Column("available_count", sa.Integer(), nullable=False, server_default="0"),
+        )
+    if "product_sales" not in tables:
+        op.create_table(
+            "product_sales",
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), primary_key=True),
+            sa.Column("units_sold", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("units_returned", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("last_sold_at", sa.DateTime(), nullable=True),
+        )
+    if "ix_product_sales_units_sold" not in {index["name"] for index in inspector.get_indexes("product_sales")}:
+        op.create_index("ix_product_sales_units_sold", "product_sales", [sa.text("units_sold DESC")])
+
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for statement in AVAILABILITY_TRIGGER_DDL + SALES_TRIGGER_DDL:
+            op.execute(statement)
+
+    # Backfill from existing inventory and sales
+    rebuild_product_availability(bind)
+    refresh_product_sales(bind)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        for statement in SALES_TRIGGER_DROP_DDL + AVAILABILITY_TRIGGER_DROP_DDL:
+            op.execute(statement)
+
+    op.drop_index("ix_product_sales_units_sold", table_name="product_sales")
+    op.drop_table("product_sales")
+    op.drop_table("product_dc_availability")
+    op.drop_table("product_availability")
+    op.drop_column("chat_messages", "query_type")
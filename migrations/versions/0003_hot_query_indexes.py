@@ -0,0 +1,96 @@
+"""Indexes for the chat and LLMService lookups
+
+Indexes are built with CREATE INDEX CONCURRENTLY outside a transaction, so the
+migration can run against a live database without blocking writes. The
+redundant ix_<table>_id indexes (duplicates of the primary keys) are dropped to
+cut write amplification on the large tables.
+
+Revision ID: 0003_hot_query_indexes
+Revises: 0002_summary_tables
+Create Date: 2026-10-17 00:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_hot_query_indexes"
+down_revision = "0002_summary_tables"
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns, extra options)
+INDEXES = [
+    ("ix_inventory_items_product_id_unsold", "inventory_items", ["product_id"],
+     {"postgresql_where": sa.text("sold_at IS NULL")}),
+    ("ix_order_items_order_id", "order_items", ["order_id"], {}),
+    ("ix_order_items_product_id", "order_items", ["product_id"], {}),
+    ("ix_orders_user_id_created_at", "orders", ["user_id", sa.text("created_at DESC")], {}),
+    ("ix_chat_messages_session_id_timestamp", "chat_messages", ["session_id", "timestamp"], {}),
+    ("ix_products_sku", "products", ["sku"], {}),
+]
+
+# Trigram indexes serve the ILIKE '%x%' filters in LLMService._search_products
+TRIGRAM_INDEXES = [
+    ("ix_products_category_trgm", "category"),
+    ("ix_products_brand_trgm", "brand"),
+    ("ix_products_department_trgm", "department"),
+]
+
+REDUNDANT_PRIMARY_KEY_INDEXES = [
+    ("ix_distribution_centers_id", "distribution_centers", "id"),
+    ("ix_products_id", "products", "id"),
+    ("ix_inventory_items_id", "inventory_items", "id"),
+    ("ix_users_id", "users", "id"),
+    ("ix_orders_order_id", "orders", "order_id"),
+    ("ix_order_items_id", "order_items", "id"),
+    ("ix_chat_sessions_id", "chat_sessions", "id"),
+    ("ix_chat_messages_id", "chat_messages", "id"),
+]
+
+
+def _trigram_available(bind) -> bool:
+    """pg_trgm ships with PostgreSQL contrib but is not installed everywhere"""
+    if bind.dialect.name != "postgresql":
+        return False
+    available = bind.execute(
+        sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    ).scalar()
+    if not available:
+        print("pg_trgm is not available on this server; skipping trigram indexes")
+    return bool(available)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True, **options)
+
+        if _trigram_available(bind):
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for name, column in TRIGRAM_INDEXES:
+                op.create_index(
+                    name, "products", [column],
+                    if_not_exists=True,
+                    postgresql_concurrently=True,
+                    postgresql_using="gin",
+                    postgresql_ops={column: "gin_trgm_ops"},
+                )
+
+        for name, table, _ in REDUNDANT_PRIMARY_KEY_INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, column in REDUNDANT_PRIMARY_KEY_INDEXES:
+            op.create_index(name, table, [column], if_not_exists=True, postgresql_concurrently=True)
+
+        for name, _ in TRIGRAM_INDEXES:
+            op.drop_index(name, table_name="products", if_exists=True, postgresql_concurrently=True)
+
+        for name, table, _, _ in INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
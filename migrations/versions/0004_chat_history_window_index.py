@@ -0,0 +1,54 @@
+"""Newest-first index for windowed conversation history reads
+
+Replaces chat_messages(session_id, timestamp) with
+(session_id, timestamp DESC, id DESC), matching the ORDER BY ... LIMIT used by
+get_conversation_history, including the id tie-breaker.
+
+Revision ID: 0004_chat_history_window_index
+Revises: 0003_hot_query_indexes
+Create Date: 2026-10-17 00:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004_chat_history_window_index"
+down_revision = "0003_hot_query_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_chat_messages_session_id_timestamp_desc",
+            "chat_messages",
+            ["session_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_chat_messages_session_id_timestamp",
+            table_name="chat_messages",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_chat_messages_session_id_timestamp",
+            "chat_messages",
+            ["session_id", "timestamp"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_chat_messages_session_id_timestamp_desc",
+            table_name="chat_messages",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
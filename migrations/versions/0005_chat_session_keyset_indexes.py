@@ -0,0 +1,37 @@
+"""Keyset pagination indexes for the chat session listing
+
+/api/sessions pages through chat_sessions ordered by (created_at DESC, id DESC),
+optionally filtered by user_id.
+
+Revision ID: 0005_chat_session_keyset_indexes
+Revises: 0004_chat_history_window_index
+Create Date: 2026-10-17 00:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005_chat_session_keyset_indexes"
+down_revision = "0004_chat_history_window_index"
+branch_labels = None
+depends_on = None
+
+# (index name, columns)
+INDEXES = [
+    ("ix_chat_sessions_created_at_id", [sa.text("created_at DESC"), sa.text("id DESC")]),
+    ("ix_chat_sessions_user_id_created_at_id", ["user_id", sa.text("created_at DESC"), sa.text("id DESC")]),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, "chat_sessions", columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in INDEXES:
+            op.drop_index(name, table_name="chat_sessions", if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,37 @@
+"""Watermarks and chunk checksums for incremental CSV ingestion
+
+Revision ID: 0006_ingestion_state
+Revises: 0005_chat_session_keyset_indexes
+Create Date: 2026-10-17 00:50:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006_ingestion_state"
+down_revision = "0005_chat_session_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ingestion_watermarks",
+        sa.Column("table_name", sa.String(), primary_key=True),
+        sa.Column("watermark", sa.DateTime(), nullable=True),
+        sa.Column("chunk_size", sa.Integer(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "ingestion_chunk_checksums",
+        sa.Column("table_name", sa.String(), primary_key=True),
+        sa.Column("chunk_index", sa.Integer(), primary_key=True),
+        sa.Column("checksum", sa.String(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("ingestion_chunk_checksums")
+    op.drop_table("ingestion_watermarks")
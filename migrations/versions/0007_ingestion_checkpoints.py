@@ -0,0 +1,30 @@
+"""Per-chunk checkpoints for resumable CSV ingestion
+
+Revision ID: 0007_ingestion_checkpoints
+Revises: 0006_ingestion_state
+Create Date: 2026-10-17 01:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007_ingestion_checkpoints"
+down_revision = "0006_ingestion_state"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ingestion_checkpoints",
+        sa.Column("table_name", sa.String(), primary_key=True),
+        sa.Column("chunk", sa.String(), primary_key=True),
+        sa.Column("rows", sa.Integer(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table("ingestion_checkpoints")
@@ -0,0 +1,25 @@
+"""Record where each chat message's intent label came from
+
+Revision ID: 0008_intent_label_source
+Revises: 0007_ingestion_checkpoints
+Create Date: 2026-10-17 01:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0008_intent_label_source"
+down_revision = "0007_ingestion_checkpoints"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing labels have no known source, so the intent classifier no longer trains on them
+    op.add_column("chat_messages", sa.Column("query_type_source", sa.String(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("chat_messages", "query_type_source")
@@ -0,0 +1,49 @@
+"""Tie ingestion checkpoints to a load run and its input files
+
+Revision ID: 0009_ingestion_runs
+Revises: 0008_intent_label_source
+Create Date: 2026-10-17 01:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0009_ingestion_runs"
+down_revision = "0008_intent_label_source"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ingestion_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("inputs", sa.Text(), nullable=False),
+        sa.Column("incremental", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("started_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+    )
+    # Existing checkpoints belong to no known run and input, so they can't be resumed safely
+    op.drop_table("ingestion_checkpoints")
+    op.create_table(
+        "ingestion_checkpoints",
+        sa.Column("run_id", sa.Integer(), sa.ForeignKey("ingestion_runs.id"), primary_key=True),
+        sa.Column("table_name", sa.String(), primary_key=True),
+        sa.Column("chunk", sa.String(), primary_key=True),
+        sa.Column("rows", sa.Integer(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table("ingestion_checkpoints")
+    op.create_table(
+        "ingestion_checkpoints",
+        sa.Column("table_name", sa.String(), primary_key=True),
+        sa.Column("chunk", sa.String(), primary_key=True),
+        sa.Column("rows", sa.Integer(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.drop_table("ingestion_runs")
@@ -0,0 +1,33 @@
+"""Record the indexes, foreign keys and triggers a parallel load defers
+
+Revision ID: 0010_ingestion_deferred_ddl
+Revises: 0009_ingestion_runs
+Create Date: 2026-10-17 09:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0010_ingestion_deferred_ddl"
+down_revision = "0009_ingestion_runs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ingestion_deferred_ddl",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("run_id", sa.Integer(), sa.ForeignKey("ingestion_runs.id"), nullable=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("table_name", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("definition", sa.Text(), nullable=True),
+        sa.Column("deferred_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table("ingestion_deferred_ddl")
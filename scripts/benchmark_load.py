@@ -0,0 +1,98 @@
+"""
+Benchmark the CSV loader: serial COPY against the parallel loader with deferred
+indexes and foreign keys, at one or more worker counts.
+
+Each run loads into a fresh scratch schema, so the benchmark never touches the
+application tables:
+
+    python scripts/benchmark_load.py path/to/csv_dir --workers 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_URL
+from scripts.ingest import (
+    DEFAULT_CHUNK_SIZE, SUMMARY_TABLES, TABLES,
+    analyze_tables, load_all, load_all_parallel, rebuild_summaries
+)
+
+def scratch_engine(schema: str):
+    """Engine whose connections, including those of worker processes, default to the scratch schema; public stays on the path for pg_trgm"""
+    url = make_url(DATABASE_URL).update_query_dict({"options": f"-csearch_path={schema},public"})
+    return create_engine(url)
+
+def reset_schema(schema: str):
+    """Recreate the scratch schema and migrate it to the current application schema"""
+    admin = create_engine(DATABASE_URL)
+    with admin.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {schema}"))
+    admin.dispose()
+
+    engine = scratch_engine(schema)
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    alembic_config = Config(os.path.join(project_dir, "alembic.ini"))
+    alembic_config.set_main_option("script_location", os.path.join(project_dir, "migrations"))
+    with engine.connect() as connection:
+        alembic_config.attributes["connection"] = connection
+        # Otherwise alembic finds public.alembic_version through the search path and skips the migration
+        alembic_config.attributes["version_table_schema"] = schema
+        command.upgrade(alembic_config, "head")
+        connection.commit()
+    return engine
+
+def timed_load(schema: str, csv_dir: str, chunk_size: int, workers: int) -> float:
+    """Full load including summary rebuild and ANALYZE, returning wall seconds"""
+    engine = reset_schema(schema)
+    start = time.perf_counter()
+    if workers > 1:
+        load_all_parallel(engine, csv_dir, chunk_size, workers)
+    else:
+        load_all(engine, csv_dir, chunk_size)
+    rebuild_summaries(engine)
+    analyze_tables(engine, [table.name for table in TABLES] + SUMMARY_TABLES)
+    seconds = time.perf_counter() - start
+    engine.dispose()
+    return seconds
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial against parallel CSV loading")
+    parser.add_argument("csv_dir")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--schema", default="bench_load")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    print(f"cores: {os.cpu_count()}")
+    print("\n=== serial ===")
+    serial = timed_load(args.schema, args.csv_dir, args.chunk_size, 1)
+    results = {}
+    for workers in args.workers:
+        print(f"\n=== parallel, {workers} workers ===")
+        results[workers] = timed_load(args.schema, args.csv_dir, args.chunk_size, workers)
+
+    print(f"\n{'mode':<22} {'wall time':>10} {'speedup':>8}")
+    print(f"{'serial':<22} {serial:>9.1f}s {1:>7.2f}x")
+    for workers, seconds in results.items():
+        print(f"{f'parallel ({workers} workers)':<22} {seconds:>9.1f}s {serial / seconds:>7.2f}x")
+
+    if not args.keep:
+        admin = create_engine(DATABASE_URL)
+        with admin.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE"))
+        admin.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Benchmark the top_products lookup: the original GROUP BY over order_items and
+inventory_items against the product_sales rollup.
+
+Synthetic data is generated inside a scratch schema, so the benchmark can run
+against any PostgreSQL database without touching the application tables:
+
+    python scripts/benchmark_top_products.py --order-items 5000000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine
+from app.sales import SALES_TRIGGER_DDL
+
+# The query LLMService._get_top_products ran before the rollup existed
+LEGACY_QUERY = """
+SELECT p.id, p.name, p.brand, p.category, p.retail_price,
+       COUNT(oi.id) as total_sales,
+       COUNT(ii.id) as available_inventory
+FROM products p
+LEFT JOIN order_items oi ON p.id = oi.product_id
+LEFT JOIN inventory_items ii ON p.id = ii.product_id AND ii.sold_at IS NULL
+GROUP BY p.id, p.name, p.brand, p.category, p.retail_price
+ORDER BY total_sales DESC
+LIMIT :limit
+"""
+
+# The same aggregate without the inventory fan-out, for reference
+AGGREGATE_QUERY = """
+SELECT p.id, p.name, p.brand, p.category, p.retail_price,
+       s.total_sales
+FROM (
+    SELECT product_id, COUNT(*) as total_sales
+    FROM order_items
+    GROUP BY product_id
+) s
+JOIN products p ON p.id = s.product_id
+ORDER BY s.total_sales DESC
+LIMIT :limit
+"""
+
+ROLLUP_QUERY = """
+SELECT p.id, p.name, p.brand, p.category, p.retail_price,
+       ps.units_sold as total_sales
+FROM product_sales ps
+JOIN products p ON p.id = ps.product_id
+ORDER BY ps.units_sold DESC
+LIMIT :limit
+"""
+
+def create_dataset(conn, schema: str, products: int, inventory_items: int, order_items: int):
+    """Create and fill a scratch schema with skewed synthetic sales"""
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {schema}"))
+    conn.execute(text(f"SET search_path TO {schema}, public"))
+
+    conn.execute(text("""
+        CREATE TABLE products (
+            id integer PRIMARY KEY, name varchar NOT NULL, brand varchar NOT NULL,
+            category varchar NOT NULL, retail_price float NOT NULL
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE inventory_items (
+            id integer PRIMARY KEY, product_id integer, sold_at timestamp
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE order_items (
+            id integer PRIMARY KEY, product_id integer, created_at timestamp, returned_at timestamp
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE product_sales (
+            product_id integer PRIMARY KEY, units_sold integer NOT NULL DEFAULT 0,
+            units_returned integer NOT NULL DEFAULT 0, last_sold_at timestamp
+        )
+    """))
+
+    print(f"Generating {products:,} products, {inventory_items:,} inventory items, {order_items:,} order items...")
+    conn.execute(text("""
+        INSERT INTO products
+        SELECT g, 'Product ' || g, 'Brand ' || (g % 200), 'Category ' || (g % 25), 10 + (g % 90)
+        FROM generate_series(1, :n) g
+    """), {"n": products})
+    # Popular products get more stock and many more sales (power-law skew)
+    conn.execute(text("""
+        INSERT INTO inventory_items
+        SELECT g, 1 + floor(:products * power(random(), 2))::int,
+               CASE WHEN random() < 0.6 THEN now() END
+        FROM generate_series(1, :n) g
+    """), {"n": inventory_items, "products": products})
+    conn.execute(text("""
+        INSERT INTO order_items
+        SELECT g, 1 + floor(:products * power(random(), 3))::int,
+               now() - random() * interval '365 days',
+               CASE WHEN random() < 0.1 THEN now() END
+        FROM generate_series(1, :n) g
+    """), {"n": order_items, "products": products})
+
+    conn.execute(text("CREATE INDEX ON inventory_items (product_id) WHERE sold_at IS NULL"))
+    conn.execute(text("CREATE INDEX ON order_items (product_id)"))
+    conn.execute(text("""
+        INSERT INTO product_sales
+        SELECT product_id, COUNT(*), COUNT(returned_at), MAX(created_at)
+        FROM order_items GROUP BY product_id
+    """))
+    conn.execute(text("CREATE INDEX ix_product_sales_units_sold ON product_sales (units_sold DESC)"))
+    conn.execute(text("ANALYZE"))
+
+def time_query(conn, query: str, limit: int, repeat: int):
+    """Run a query repeatedly and return (median seconds, rows of the last run)"""
+    timings = []
+    rows = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(text(query), {"limit": limit}).all()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), rows
+
+def time_trigger_overhead(conn, batch_size: int):
+    """Measure how much the rollup triggers add to a batch of order item inserts"""
+    insert = text("""
+        INSERT INTO order_items
+        SELECT (SELECT MAX(id) FROM order_items) + g, 1 + (g % 1000), now(), NULL
+        FROM generate_series(1, :n) g
+    """)
+    start = time.perf_counter()
+    conn.execute(insert, {"n": batch_size})
+    without_triggers = time.perf_counter() - start
+
+    for statement in SALES_TRIGGER_DDL:
+        conn.execute(text(statement))
+    start = time.perf_counter()
+    conn.execute(insert, {"n": batch_size})
+    with_triggers = time.perf_counter() - start
+    return without_triggers, with_triggers
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark top_products against the product_sales rollup")
+    parser.add_argument("--products", type=int, default=30000)
+    parser.add_argument("--inventory-items", type=int, default=500000)
+    parser.add_argument("--order-items", type=int, default=3000000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--schema", default="bench_top_products")
+    parser.add_argument("--skip-legacy", action="store_true",
+                        help="Skip the original fan-out query, which can take minutes at this scale")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        create_dataset(conn, args.schema, args.products, args.inventory_items, args.order_items)
+        conn.commit()
+
+        results = {}
+        if not args.skip_legacy:
+            results["legacy join"] = time_query(conn, LEGACY_QUERY, args.limit, 1)
+        results["aggregate"] = time_query(conn, AGGREGATE_QUERY, args.limit, args.repeat)
+        results["rollup"] = time_query(conn, ROLLUP_QUERY, args.limit, args.repeat)
+
+        rollup_seconds, rollup_rows = results["rollup"]
+        _, aggregate_rows = results["aggregate"]
+        matches = [row.total_sales for row in rollup_rows] == [row.total_sales for row in aggregate_rows]
+
+        print(f"\ntop {args.limit} products over {args.order_items:,} order items")
+        for name, (seconds, _) in results.items():
+            print(f"  {name:<12} {seconds * 1000:10.2f} ms  ({seconds / rollup_seconds:,.0f}x rollup)")
+        print(f"  rollup sales counts match the aggregate: {matches}")
+
+        without_triggers, with_triggers = time_trigger_overhead(conn, 10000)
+        print(f"\ninserting 10,000 order items: {without_triggers * 1000:.1f} ms without rollup triggers, "
+              f"{with_triggers * 1000:.1f} ms with")
+        conn.rollback()
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE"))
+            conn.commit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Generate a synthetic e-commerce dataset in the CSV layout scripts/load_data.py reads,
+for benchmarking the LLMService queries at production scale.
+
+Rows follow the columns in app/models.py with skew similar to the real export: a few
+brands carry most of the catalog, sales follow a long-tailed product popularity, most
+users place one order while a few place dozens, and orders move through a realistic
+status mix. Generation is vectorized with numpy and seeded, so the same --seed and
+--scale always produce the same files.
+
+    python scripts/generate_data.py data/synthetic --scale 1      # ~1M rows
+    python scripts/generate_data.py data/synthetic --scale 10     # ~10M rows
+    python scripts/generate_data.py --load --scale 10 --workers 4 # generate into a temp dir and load it
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Rows at --scale 1; order_items and inventory_items follow from orders
+BASE_ROWS = {"products": 29_000, "users": 100_000, "orders": 125_000}
+# Unsold inventory items per sold one
+UNSOLD_PER_SOLD = 1.6
+BATCH_ROWS = 500_000
+
+START = np.datetime64("2019-01-01T00:00:00", "s")
+END = np.datetime64("2024-01-01T00:00:00", "s")
+DAY = 86_400
+
+DISTRIBUTION_CENTERS = [
+    ("Memphis TN", 35.1174, -89.9711),
+    ("Chicago IL", 41.8369, -87.6847),
+    ("Houston TX", 29.7604, -95.3698),
+    ("Los Angeles CA", 34.05, -118.25),
+    ("New Orleans LA", 29.95, -90.0667),
+    ("Port Authority of New York/New Jersey NY/NJ", 40.634, -73.7834),
+    ("Philadelphia PA", 39.95, -75.1667),
+    ("Mobile AL", 30.6944, -88.0431),
+    ("Charleston SC", 32.7833, -79.9333),
+    ("Savannah GA", 32.0167, -81.1167),
+]
+
+# (category, median retail price)
+CATEGORIES = [
+    ("Intimates", 25), ("Jeans", 70), ("Tops & Tees", 30), ("Fashion Hoodies & Sweatshirts", 55),
+    ("Sweaters", 65), ("Swim", 45), ("Sleep & Lounge", 35), ("Shorts", 35), ("Accessories", 30),
+    ("Active", 40), ("Outerwear & Coats", 120), ("Pants", 55), ("Socks", 12), ("Dresses", 75),
+    ("Shirts", 45), ("Shoes", 85), ("Jackets", 110), ("Suits & Sport Coats", 180), ("Skirts", 45),
+    ("Leggings", 30), ("Blazers & Jackets", 95), ("Plus", 40), ("Maternity", 45), ("Underwear", 20),
+    ("Jumpsuits & Rompers", 60), ("Socks & Hosiery", 15),
+]
+BRANDS = [
+    "Nike", "Adidas", "Levi's", "Calvin Klein", "Ralph Lauren", "Puma", "Carhartt", "Hanes", "Columbia",
+    "Tommy Hilfiger", "Under Armour", "Champion", "Wrangler", "Dockers", "Allegra K", "Quiksilver",
+    "Volcom", "Diesel", "True Religion", "Lucky Brand", "Speedo", "Jockey", "Fruit of the Loom",
+    "The North Face", "Patagonia", "Reebok", "New Balance", "Vans", "Converse", "Gap", "Guess",
+    "Michael Kors", "Kenneth Cole", "Nautica", "Perry Ellis", "Van Heusen", "Haggar", "Izod",
+    "Timberland", "Lee",
+]
+ADJECTIVES = [
+    "Classic", "Slim Fit", "Relaxed", "Essential", "Vintage", "Performance", "Lightweight", "Cotton",
+    "Stretch", "Premium", "Everyday", "Heritage", "Tech", "Organic", "Washed", "Ribbed",
+]
+FIRST_NAMES = {
+    "M": ["James", "John", "Robert", "Michael", "William", "David", "Joseph", "Daniel", "Carlos", "Wei",
+          "Lucas", "Mateo", "Ahmed", "Kenji", "Ivan", "Noah", "Liam", "Ethan", "Omar", "Raj"],
+    "F": ["Mary", "Patricia", "Jennifer", "Linda", "Elizabeth", "Susan", "Jessica", "Sarah", "Maria", "Mei",
+          "Sofia", "Camila", "Fatima", "Yuki", "Olga", "Emma", "Olivia", "Ava", "Layla", "Priya"],
+}
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Lee",
+    "Wang", "Li", "Zhang", "Silva", "Santos", "Kim", "Park", "Nguyen", "Khan", "Sato",
+]
+# (country, state, city, latitude, longitude, share of users)
+LOCATIONS = [
+    ("China", "Guangdong", "Shenzhen", 22.54, 114.06, 0.18), ("China", "Shanghai", "Shanghai", 31.23, 121.47, 0.16),
+    ("United States", "California", "Los Angeles", 34.05, -118.24, 0.08),
+    ("United States", "Texas", "Houston", 29.76, -95.37, 0.06),
+    ("United States", "New York", "New York", 40.71, -74.01, 0.06),
+    ("United States", "Florida", "Miami", 25.76, -80.19, 0.04),
+    ("Brasil", "São Paulo", "São Paulo", -23.55, -46.63, 0.14), ("Brasil", "Rio de Janeiro", "Rio de Janeiro", -22.91, -43.17, 0.05),
+    ("South Korea", "Seoul", "Seoul", 37.57, 126.98, 0.05), ("France", "Île-de-France", "Paris", 48.86, 2.35, 0.05),
+    ("United Kingdom", "England", "London", 51.51, -0.13, 0.05), ("Germany", "Berlin", "Berlin", 52.52, 13.40, 0.04),
+    ("Spain", "Madrid", "Madrid", 40.42, -3.70, 0.03), ("Japan", "Tokyo", "Tokyo", 35.68, 139.69, 0.01),
+]
+STREETS = ["Main St", "Oak Ave", "Pine Rd", "Maple Dr", "Cedar Ln", "Elm St", "Park Ave", "Lake Rd"]
+TRAFFIC_SOURCES = (["Search", "Organic", "Facebook", "Email", "Display"], [0.70, 0.15, 0.06, 0.05, 0.04])
+# Order status mix, and which of shipped/delivered/returned each status has reached
+ORDER_STATUSES = (["Complete", "Shipped", "Processing", "Cancelled", "Returned"], [0.25, 0.30, 0.20, 0.15, 0.10])
+SHIPPED = {"Complete", "Shipped", "Returned"}
+DELIVERED = {"Complete", "Returned"}
+ITEMS_PER_ORDER = ([1, 2, 3, 4], [0.62, 0.24, 0.09, 0.05])
+
+TABLE_STREAMS = {name: i for i, name in enumerate(
+    ["distribution_centers", "products", "users", "orders", "order_items", "inventory_items"]
+)}
+
+def table_rng(seed: int, table: str) -> np.random.Generator:
+    """Independent stream per table, so changing one table's generator doesn't shift the others"""
+    return np.random.default_rng([seed, TABLE_STREAMS[table]])
+
+def zipf_weights(rng: np.random.Generator, n: int, exponent: float) -> np.ndarray:
+    """Probabilities following rank^-exponent, assigned to the n items in random order"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+def random_times(rng: np.random.Generator, start: np.ndarray, end, n: int) -> np.ndarray:
+    """Uniform timestamps in [start, end), elementwise when start is an array"""
+    span = (np.asarray(end, dtype="datetime64[s]") - start).astype(np.int64)
+    return start + (rng.random(n) * np.maximum(span, 1)).astype("timedelta64[s]")
+
+def later(rng: np.random.Generator, base: np.ndarray, min_days: float, max_days: float, mask: np.ndarray) -> np.ndarray:
+    """base plus a random delay where mask is set, NaT elsewhere"""
+    seconds = rng.uniform(min_days * DAY, max_days * DAY, len(base)).astype("timedelta64[s]")
+    return np.where(mask, base + seconds, np.datetime64("NaT"))
+
+def pick(rng: np.random.Generator, values, n: int, p=None) -> np.ndarray:
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=n, p=p)]
+
+def generate_distribution_centers() -> Dict[str, np.ndarray]:
+    names, latitudes, longitudes = zip(*DISTRIBUTION_CENTERS)
+    return {
+        "id": np.arange(1, len(names) + 1),
+        "name": np.array(names, dtype=object),
+        "latitude": np.array(latitudes),
+        "longitude": np.array(longitudes),
+    }
+
+def generate_products(rng: np.random.Generator, n: int, centers: int) -> Dict[str, np.ndarray]:
+    category_index = rng.choice(len(CATEGORIES), size=n)
+    median_price = np.array([price for _, price in CATEGORIES])[category_index]
+    retail_price = np.round(median_price * rng.lognormal(0, 0.5, n), 2)
+    brand = pick(rng, BRANDS, n, zipf_weights(rng, len(BRANDS), 1.1))
+    category = np.array([name for name, _ in CATEGORIES], dtype=object)[category_index]
+    ids = np.arange(1, n + 1)
+    return {
+        "id": ids,
+        "cost": np.round(retail_price * rng.uniform(0.35, 0.65, n), 2),
+        "category": category,
+        "name": brand + " " + pick(rng, ADJECTIVES, n) + " " + category,
+        "brand": brand,
+        "retail_price": retail_price,
+        "department": pick(rng, ["Women", "Men"], n, [0.52, 0.48]),
+        "sku": np.char.add("SKU", np.char.zfill(ids.astype(str), 10)).astype(object),
+        "distribution_center_id": rng.integers(1, centers + 1, n),
+    }
+
+def generate_users(rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    ids = np.arange(1, n + 1)
+    gender = pick(rng, ["F", "M"], n, [0.5, 0.5])
+    first_name = np.where(gender == "F", pick(rng, FIRST_NAMES["F"], n), pick(rng, FIRST_NAMES["M"], n))
+    last_name = pick(rng, LAST_NAMES, n)
+    location = rng.choice(len(LOCATIONS), size=n, p=[loc[5] for loc in LOCATIONS])
+    country, state, city, latitude, longitude = (
+        np.array([loc[i] for loc in LOCATIONS], dtype=object if i < 3 else float)[location] for i in range(5)
+    )
+    return {
+        "id": ids,
+        "first_name": first_name,
+        "last_name": last_name,
+        # The id keeps emails unique
+        "email": np.char.add(
+            np.char.lower((first_name + "." + last_name).astype(str)), np.char.add(ids.astype(str), "@example.com")
+        ).astype(object),
+        "age": rng.integers(12, 71, n),
+        "gender": gender,
+        "state": state,
+        "street_address": np.char.add(rng.integers(1, 9999, n).astype(str), " ").astype(object) + pick(rng, STREETS, n),
+        "postal_code": np.char.zfill(rng.integers(0, 100_000, n).astype(str), 5).astype(object),
+        "city": city,
+        "country": country,
+        "latitude": np.round(latitude + rng.normal(0, 0.2, n), 6),
+        "longitude": np.round(longitude + rng.normal(0, 0.2, n), 6),
+        "traffic_source": pick(rng, TRAFFIC_SOURCES[0], n, TRAFFIC_SOURCES[1]),
+        "created_at": random_times(rng, START, END - np.timedelta64(30, "D"), n),
+    }
+
+def generate_orders(rng: np.random.Generator, n: int, users: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # Lognormal buying propensity: most users order once or never, a few order dozens of times
+    propensity = rng.lognormal(0, 1.3, len(users["id"]))
+    user_index = rng.choice(len(users["id"]), size=n, p=propensity / propensity.sum())
+    status = pick(rng, ORDER_STATUSES[0], n, ORDER_STATUSES[1])
+    # Each order comes after its user signed up; order ids follow creation time
+    created_at = random_times(rng, users["created_at"][user_index], END, n)
+    chronological = np.argsort(created_at, kind="stable")
+    user_index, created_at = user_index[chronological], created_at[chronological]
+    shipped_at = later(rng, created_at, 0.1, 3, np.isin(status, list(SHIPPED)))
+    delivered_at = later(rng, shipped_at, 1, 6, np.isin(status, list(DELIVERED)))
+    return {
+        "order_id": np.arange(1, n + 1),
+        "user_id": users["id"][user_index],
+        "status": status,
+        "gender": users["gender"][user_index],
+        "created_at": created_at,
+        "returned_at": later(rng, delivered_at, 1, 14, status == "Returned"),
+        "shipped_at": shipped_at,
+        "delivered_at": delivered_at,
+        "num_of_item": rng.choice(ITEMS_PER_ORDER[0], size=n, p=ITEMS_PER_ORDER[1]),
+    }
+
+def generate_order_items(rng: np.random.Generator, orders: Dict[str, np.ndarray],
+                         products: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    order_index = np.repeat(np.arange(len(orders["order_id"])), orders["num_of_item"])
+    n = len(order_index)
+    # Long-tailed product popularity, so top products and product_sales are meaningfully skewed
+    product_index = rng.choice(len(products["id"]), size=n, p=zipf_weights(rng, len(products["id"]), 0.9))
+    ids = np.arange(1, n + 1)
+    return {
+        "id": ids,
+        "order_id": orders["order_id"][order_index],
+        "user_id": orders["user_id"][order_index],
+        "product_id": products["id"][product_index],
+        # Every sold item is backed by its own inventory item, numbered first in inventory_items
+        "inventory_item_id": ids,
+        "status": orders["status"][order_index],
+        "created_at": orders["created_at"][order_index],
+        "shipped_at": orders["shipped_at"][order_index],
+        "delivered_at": orders["delivered_at"][order_index],
+        "returned_at": orders["returned_at"][order_index],
+        "sale_price": products["retail_price"][product_index],
+    }
+
+def generate_inventory_items(rng: np.random.Generator, order_items: Dict[str, np.ndarray],
+                             products: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    sold = len(order_items["id"])
+    unsold = int(sold * UNSOLD_PER_SOLD)
+    n = sold + unsold
+    # Sold items first (ids match order_items.inventory_item_id), then stock spread more evenly
+    product_index = np.concatenate([
+        order_items["product_id"] - 1,
+        rng.choice(len(products["id"]), size=unsold, p=zipf_weights(rng, len(products["id"]), 0.5)),
+    ])
+    sold_at = np.concatenate([
+        # Cancelled orders put their item back in stock
+        np.where(order_items["status"] == "Cancelled", np.datetime64("NaT"), order_items["created_at"]),
+        np.full(unsold, np.datetime64("NaT"), dtype="datetime64[s]"),
+    ])
+    received = np.concatenate([order_items["created_at"], random_times(rng, START, END, unsold)])
+    created_at = received - rng.uniform(1 * DAY, 120 * DAY, n).astype("timedelta64[s]")
+    return {
+        "id": np.arange(1, n + 1),
+        "product_id": products["id"][product_index],
+        "created_at": created_at,
+        "sold_at": sold_at,
+        "cost": products["cost"][product_index],
+        "product_category": products["category"][product_index],
+        "product_name": products["name"][product_index],
+        "product_brand": products["brand"][product_index],
+        "product_retail_price": products["retail_price"][product_index],
+        "product_department": products["department"][product_index],
+        "product_sku": products["sku"][product_index],
+        "product_distribution_center_id": products["distribution_center_id"][product_index],
+    }
+
+def write_table(path: str, columns: Dict[str, np.ndarray], batch_rows: int = BATCH_ROWS) -> int:
+    """Write columns as CSV in batches, with timestamps in the export's "... UTC" format"""
+    rows = len(next(iter(columns.values())))
+    for start in range(0, max(rows, 1), batch_rows):
+        batch = pd.DataFrame({name: values[start:start + batch_rows] for name, values in columns.items()})
+        batch.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False,
+                     date_format="%Y-%m-%d %H:%M:%S UTC")
+    return rows
+
+def generate(out_dir: str, scale: float, seed: int) -> Dict[str, int]:
+    """Write all six CSVs into out_dir, returning the row count of each"""
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {}
+
+    def emit(table: str, columns: Dict[str, np.ndarray]):
+        start = time.perf_counter()
+        counts[table] = write_table(os.path.join(out_dir, f"{table}.csv"), columns)
+        print(f"{table:<22} {counts[table]:>12,} rows  {time.perf_counter() - start:>6.1f}s")
+
+    centers = generate_distribution_centers()
+    emit("distribution_centers", centers)
+    products = generate_products(table_rng(seed, "products"), max(1, int(BASE_ROWS["products"] * scale)), len(centers["id"]))
+    emit("products", products)
+    users = generate_users(table_rng(seed, "users"), max(1, int(BASE_ROWS["users"] * scale)))
+    emit("users", users)
+    orders = generate_orders(table_rng(seed, "orders"), max(1, int(BASE_ROWS["orders"] * scale)), users)
+    del users
+    emit("orders", orders)
+    order_items = generate_order_items(table_rng(seed, "order_items"), orders, products)
+    del orders
+    emit("order_items", order_items)
+    inventory_items = generate_inventory_items(table_rng(seed, "inventory_items"), order_items, products)
+    del order_items
+    emit("inventory_items", inventory_items)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic e-commerce dataset")
+    parser.add_argument("out_dir", nargs="?", help="Directory for the CSVs (required unless --load)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Size multiplier; 1 is about 1M rows in total, 10 about 10M")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--load", action="store_true",
+                        help="Load the generated data into DATABASE_URL (an empty schema) with scripts/load_data.py")
+    parser.add_argument("--workers", type=int, default=1, help="Loader processes with --load")
+    args = parser.parse_args()
+
+    if not args.out_dir and not args.load:
+        parser.error("give an output directory, or --load")
+
+    out_dir = args.out_dir or tempfile.mkdtemp(prefix="synthetic_")
+    start = time.perf_counter()
+    counts = generate(out_dir, args.scale, args.seed)
+    print(f"{'total':<22} {sum(counts.values()):>12,} rows  {time.perf_counter() - start:>6.1f}s  -> {out_dir}")
+
+    if args.load:
+        from scripts import load_data
+        sys.argv = [sys.argv[0], out_dir, "--workers", str(args.workers)]
+        try:
+            load_data.main()
+        finally:
+            if not args.out_dir:
+                shutil.rmtree(out_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
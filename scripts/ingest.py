@@ -0,0 +1,989 @@
+"""
+Bulk CSV ingestion for the e-commerce export.
+
+Each CSV is streamed in chunks, converted column by column to the types declared
+in app.models, and written with PostgreSQL COPY FROM STDIN (batched INSERTs on
+other databases).
+
+Incremental loads upsert only new or changed rows: rows whose timestamps reach
+the table's stored watermark, or, for tables without timestamps, chunks whose
+checksum differs from the previous load.
+
+Parallel full loads split each large CSV into byte ranges loaded by a process
+pool, with secondary indexes, foreign keys and summary triggers deferred until
+all tables are in. Their definitions are recorded in the database before they
+are dropped, so whatever a killed load leaves dropped is restored by the next.
+
+Every chunk is committed together with a checkpoint row of its load run, so an
+interrupted load can be resumed without loading any chunk twice. A run records
+the size and checksum of its CSVs and is marked complete at the end; only an
+unfinished run over the same files can be resumed.
+
+Rows that would violate the schema (unparseable values, missing required
+values, unknown foreign keys, duplicate keys) are set aside in a quarantine CSV
+with their reasons before the chunk is written, so one bad row never fails a
+chunk.
+"""
+
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+from sqlalchemy import DateTime, Float, Integer, create_engine, delete, func, select, text, update
+from sqlalchemy.dialects import sqlite
+
+from app.availability import rebuild_product_availability
+from app.sales import refresh_product_sales
+from app.models import (
+    DistributionCenter, Product, InventoryItem, User, Order, OrderItem,
+    IngestionWatermark, IngestionChunkChecksum, IngestionCheckpoint, IngestionRun, IngestionDeferredDDL
+)
+
+# Load order respects the foreign keys between the tables
+TABLES = [
+    DistributionCenter.__table__,
+    Product.__table__,
+    InventoryItem.__table__,
+    User.__table__,
+    Order.__table__,
+    OrderItem.__table__,
+]
+
+TABLES_BY_NAME = {table.name: table for table in TABLES}
+
+# Summary tables derived from the loaded tables
+SUMMARY_TABLES = ["product_availability", "product_dc_availability", "product_sales"]
+
+# Timestamps that advance when a row is created or changes state. Tables not listed
+# here are compared chunk by chunk with content checksums.
+WATERMARK_COLUMNS = {
+    "inventory_items": ["created_at", "sold_at"],
+    "users": ["created_at"],
+    "orders": ["created_at", "shipped_at", "delivered_at", "returned_at"],
+    "order_items": ["created_at", "shipped_at", "delivered_at", "returned_at"],
+}
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Integer columns are PostgreSQL int4
+INT32_MIN, INT32_MAX = -2**31, 2**31 - 1
+
+@dataclass
+class LoadStats:
+    table: str
+    rows: int = 0
+    unchanged: int = 0
+    resumed: int = 0
+    quarantined: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+class LoadRefused(ValueError):
+    """A load that was refused before writing anything: a full load into non-empty tables, or a
+    --resume whose last load finished or doesn't match this one"""
+
+@dataclass
+class IngestionState:
+    watermark: Optional[pd.Timestamp] = None
+    chunk_size: Optional[int] = None
+    checksums: Dict[int, str] = field(default_factory=dict)
+
+def csv_path_for(csv_dir: str, table) -> str:
+    """CSV files in the export are named after their tables"""
+    return os.path.join(csv_dir, f"{table.name}.csv")
+
+def default_quarantine_dir(csv_path: str) -> str:
+    """Rejected rows go next to the CSVs unless a directory is given"""
+    return os.path.join(os.path.dirname(os.path.abspath(csv_path)), "quarantine")
+
+class ByteRange(io.RawIOBase):
+    """Read-only view of the bytes [start, end) of a file"""
+
+    def __init__(self, path: str, start: int, end: int):
+        self.file = open(path, "rb")
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        read = self.file.readinto(memoryview(buffer)[:size])
+        self.remaining -= read
+        return read
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+def partition_csv(csv_path: str, parts: int) -> List[Tuple[int, int]]:
+    """Split a CSV's data rows into byte ranges that start and end on line boundaries.
+
+    Assumes no quoted field spans lines, which holds for the e-commerce export.
+    """
+    size = os.path.getsize(csv_path)
+    with open(csv_path, "rb") as f:
+        f.readline()
+        bounds = [f.tell()]
+        for part in range(1, parts):
+            f.seek(bounds[0] + (size - bounds[0]) * part // parts)
+            f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+def read_csv_chunks(csv_path: str, table, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    byte_range: Optional[Tuple[int, int]] = None, columns: Optional[List[str]] = None):
+    """Stream a CSV, or one byte range of it, in chunks, keeping only the columns the table defines
+    (or the given subset of them).
+
+    Everything is read as text so that type conversion happens once per column in prepare_chunk.
+    """
+    columns = set(columns or [column.name for column in table.columns])
+    if byte_range is None:
+        return pd.read_csv(
+            csv_path,
+            dtype=str,
+            usecols=lambda name: name in columns,
+            chunksize=chunk_size,
+        )
+
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    return pd.read_csv(
+        io.BufferedReader(ByteRange(csv_path, *byte_range)),
+        header=None,
+        names=header,
+        dtype=str,
+        usecols=lambda name: name in columns,
+        chunksize=chunk_size,
+    )
+
+def parse_timestamps(values: pd.Series) -> pd.Series:
+    """Parse a column of export timestamps to naive UTC in one pass.
+
+    The export writes "2022-09-29 02:12:48 UTC"; with the suffix stripped the column parses on
+    pandas' vectorized ISO 8601 path. Values with explicit offsets take the slower UTC conversion.
+    Unparseable values become NaT and are reported by validate_chunk.
+    """
+    values = values.str.removesuffix(" UTC")
+    if values.str.contains(r"(?:Z|[+-]\d{2}:?\d{2})$", na=False).any():
+        return pd.to_datetime(values, utc=True, format="ISO8601", errors="coerce").dt.tz_convert(None)
+    return pd.to_datetime(values, format="ISO8601", errors="coerce")
+
+def parse_integers(values: pd.Series) -> pd.Series:
+    """Parse a column to nullable int32-range integers; anything else becomes NA"""
+    numbers = pd.to_numeric(values, errors="coerce")
+    valid = (numbers % 1 == 0) & numbers.between(INT32_MIN, INT32_MAX)
+    return numbers.where(valid).astype("Int64")
+
+def prepare_chunk(table, df: pd.DataFrame) -> pd.DataFrame:
+    """Convert a chunk of text columns to the table's column types, vectorized.
+
+    Values that don't convert become nulls; validate_chunk compares against the raw chunk to report them.
+    """
+    prepared = {}
+    for column in table.columns:
+        if column.name not in df.columns:
+            continue
+        values = df[column.name]
+        if isinstance(column.type, DateTime):
+            values = parse_timestamps(values)
+        elif isinstance(column.type, Integer):
+            values = parse_integers(values)
+        elif isinstance(column.type, Float):
+            values = pd.to_numeric(values, errors="coerce").astype("float64")
+        prepared[column.name] = values
+    return pd.DataFrame(prepared)
+
+@dataclass
+class References:
+    """What a table's rows are validated against: foreign key targets and known unique values"""
+    foreign_keys: Dict[str, pd.Index] = field(default_factory=dict)
+    # column -> Series mapping each known value to the primary key of the row holding it
+    unique: Dict[str, pd.Series] = field(default_factory=dict)
+
+def required_columns(table) -> List[str]:
+    """Columns that must be present and non-null in the CSV"""
+    return [
+        column.name for column in table.columns
+        if (column.primary_key or not column.nullable) and column.default is None and column.server_default is None
+    ]
+
+def unique_columns(table) -> List[str]:
+    """Single-column primary keys and unique constraints"""
+    columns = [column.name for column in table.primary_key.columns][:1]
+    return columns + [column.name for column in table.columns if column.unique and not column.primary_key]
+
+def load_references(connection, table, incremental: bool = False) -> References:
+    """Read foreign key targets and existing unique values from the database.
+
+    Parent tables are loaded first, so their ids are already in the database. Existing primary
+    keys only conflict in full loads; incremental loads update them in place.
+    """
+    references = References()
+    for fk in table.foreign_keys:
+        target = fk.column
+        references.foreign_keys[fk.parent.name] = pd.Index(connection.execute(
+            text(f'SELECT DISTINCT "{target.name}" FROM "{target.table.name}"')
+        ).scalars().all())
+
+    primary_key = list(table.primary_key.columns)[0].name
+    for name in unique_columns(table):
+        if name == primary_key and incremental:
+            continue
+        rows = connection.execute(text(f'SELECT "{name}", "{primary_key}" FROM "{table.name}"')).all()
+        references.unique[name] = pd.Series(
+            [row[1] for row in rows], index=pd.Index([row[0] for row in rows]), dtype=object
+        )
+    return references
+
+def validate_chunk(table, raw: pd.DataFrame, prepared: pd.DataFrame, references: References) -> pd.Series:
+    """Check a prepared chunk against the table's constraints, vectorized per column.
+
+    Returns the reasons each row is rejected ("" for valid rows). Unique values of the
+    valid rows are added to references so later chunks are checked against them.
+    """
+    reasons = pd.Series("", index=prepared.index, dtype=object)
+
+    def reject(mask: pd.Series, reason: str):
+        mask = mask.fillna(False).astype(bool)
+        if mask.any():
+            reasons[mask] = reasons[mask] + reason + "; "
+
+    required = required_columns(table)
+    for column in table.columns:
+        if column.name not in prepared.columns:
+            continue
+        given = raw[column.name].notna()
+        if isinstance(column.type, (DateTime, Integer, Float)):
+            reject(given & prepared[column.name].isna(), f"invalid {column.name}")
+        if column.name in required:
+            reject(~given, f"missing {column.name}")
+
+    for name, targets in references.foreign_keys.items():
+        values = prepared[name]
+        reject(values.notna() & ~values.isin(targets), f"unknown {name}")
+
+    primary_key = list(table.primary_key.columns)[0].name
+    for name in unique_columns(table):
+        values = prepared[name]
+        reject(values.notna() & values.duplicated(keep="first"), f"duplicate {name}")
+        known = references.unique.get(name)
+        if known is not None and not known.empty:
+            owner = values.map(known)
+            if name == primary_key:
+                reject(owner.notna(), f"duplicate {name}")
+            else:
+                reject(owner.notna() & (owner != prepared[primary_key]), f"{name} already used by another row")
+
+    # Remember the unique values of rows that will be loaded
+    valid = reasons == ""
+    for name in references.unique:
+        loaded = prepared.loc[valid, list(dict.fromkeys([name, primary_key]))].dropna()
+        additions = pd.Series(loaded[primary_key].to_numpy(dtype=object), index=pd.Index(loaded[name]), dtype=object)
+        known = references.unique.get(name)
+        if additions.empty:
+            continue
+        if known is not None and not known.empty:
+            # Incremental loads see rows already in the database again; map() needs each value once
+            additions = pd.concat([known, additions])
+            additions = additions[~additions.index.duplicated(keep="last")]
+        references.unique[name] = additions
+    return reasons
+
+class Quarantine:
+    """Append-only CSV of rejected rows with the chunk, row and reasons for each"""
+
+    def __init__(self, directory: str, name: str):
+        self.path = os.path.join(directory, f"{name}.csv")
+        self.directory = directory
+        self.rows = 0
+
+    def write(self, raw: pd.DataFrame, reasons: pd.Series, chunk: str):
+        rejected = raw.copy()
+        rejected.insert(0, "_chunk", chunk)
+        rejected.insert(1, "_row", raw.index)
+        rejected["_reasons"] = reasons.str.rstrip("; ")
+        os.makedirs(self.directory, exist_ok=True)
+        rejected.to_csv(self.path, mode="a", index=False, header=not os.path.exists(self.path))
+        self.rows += len(rejected)
+
+def clear_quarantine(directory: str, table):
+    """Remove a table's quarantine files from a previous load"""
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename == f"{table.name}.csv" or (filename.startswith(f"{table.name}.") and filename.endswith(".csv")):
+            os.remove(os.path.join(directory, filename))
+
+def check_columns(table, csv_path: str):
+    """Fail fast when a CSV lacks a column every row needs"""
+    header = set(pd.read_csv(csv_path, nrows=0).columns)
+    missing = [name for name in required_columns(table) if name not in header]
+    if missing:
+        raise ValueError(f"{csv_path} is missing required columns: {', '.join(missing)}")
+
+def row_watermarks(table, df: pd.DataFrame) -> Optional[pd.Series]:
+    """Latest timestamp of each row, or None for tables compared by checksum"""
+    columns = [name for name in WATERMARK_COLUMNS.get(table.name, []) if name in df.columns]
+    if not columns:
+        return None
+    return df[columns].max(axis=1)
+
+def chunk_checksum(chunk: pd.DataFrame) -> str:
+    """Checksum of a raw CSV chunk's contents, computed from vectorized row hashes"""
+    row_hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+def copy_chunk(connection, table, df: pd.DataFrame, target: Optional[str] = None):
+    """Write a chunk with COPY FROM STDIN (PostgreSQL)"""
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, date_format="%Y-%m-%d %H:%M:%S.%f")
+    buffer.seek(0)
+    columns = ", ".join(f'"{name}"' for name in df.columns)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY "{target or table.name}" ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+
+def insert_chunk(connection, table, df: pd.DataFrame):
+    """Write a chunk with one batched INSERT (databases without COPY)"""
+    records = df.astype(object).where(df.notna(), None).to_dict("records")
+    if records:
+        connection.execute(table.insert(), records)
+
+def write_chunk(connection, table, df: pd.DataFrame):
+    """Write a prepared chunk with the fastest path the dialect supports"""
+    if connection.dialect.name == "postgresql":
+        copy_chunk(connection, table, df)
+    else:
+        insert_chunk(connection, table, df)
+
+def upsert_chunk(connection, table, df: pd.DataFrame):
+    """Insert new rows and update changed ones, keyed on the primary key.
+
+    On PostgreSQL the chunk is COPied into a temporary staging table and merged with
+    INSERT ... ON CONFLICT DO UPDATE, skipping rows whose values are unchanged.
+    """
+    primary_key = [column.name for column in table.primary_key.columns]
+    updated = [name for name in df.columns if name not in primary_key]
+
+    if connection.dialect.name == "postgresql":
+        staging = f"staging_{table.name}"
+        columns = ", ".join(f'"{name}"' for name in df.columns)
+        connection.execute(text(
+            f'CREATE TEMPORARY TABLE "{staging}" (LIKE "{table.name}" INCLUDING DEFAULTS) ON COMMIT DROP'
+        ))
+        copy_chunk(connection, table, df, target=staging)
+        assignments = ", ".join(f'"{name}" = EXCLUDED."{name}"' for name in updated)
+        current = ", ".join(f'"{table.name}"."{name}"' for name in updated)
+        incoming = ", ".join(f'EXCLUDED."{name}"' for name in updated)
+        connection.execute(text(f"""
+            INSERT INTO "{table.name}" ({columns})
+            SELECT {columns} FROM "{staging}"
+            ON CONFLICT ({", ".join(f'"{name}"' for name in primary_key)}) DO UPDATE
+            SET {assignments}
+            WHERE ({current}) IS DISTINCT FROM ({incoming})
+        """))
+        return
+
+    if connection.dialect.name != "sqlite":
+        raise NotImplementedError(f"Incremental loads are not supported on {connection.dialect.name}")
+    records = df.astype(object).where(df.notna(), None).to_dict("records")
+    if records:
+        statement = sqlite.insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=primary_key,
+            set_={name: statement.excluded[name] for name in updated}
+        )
+        connection.execute(statement, records)
+
+def get_ingestion_state(connection, table) -> IngestionState:
+    """Watermark and chunk checksums recorded by the previous load of a table"""
+    watermark = connection.execute(
+        select(IngestionWatermark.watermark, IngestionWatermark.chunk_size)
+        .where(IngestionWatermark.table_name == table.name)
+    ).first()
+    checksums = connection.execute(
+        select(IngestionChunkChecksum.chunk_index, IngestionChunkChecksum.checksum)
+        .where(IngestionChunkChecksum.table_name == table.name)
+    ).all()
+    if watermark is None:
+        return IngestionState(checksums=dict(checksums))
+    return IngestionState(
+        watermark=pd.Timestamp(watermark.watermark) if watermark.watermark else None,
+        chunk_size=watermark.chunk_size,
+        checksums=dict(checksums)
+    )
+
+def save_ingestion_state(connection, table, state: IngestionState):
+    """Record a table's watermark and chunk checksums after a load"""
+    connection.execute(delete(IngestionWatermark).where(IngestionWatermark.table_name == table.name))
+    connection.execute(delete(IngestionChunkChecksum).where(IngestionChunkChecksum.table_name == table.name))
+    connection.execute(IngestionWatermark.__table__.insert(), {
+        "table_name": table.name,
+        "watermark": state.watermark.to_pydatetime() if state.watermark is not None else None,
+        "chunk_size": state.chunk_size,
+    })
+    if state.checksums:
+        connection.execute(IngestionChunkChecksum.__table__.insert(), [
+            {"table_name": table.name, "chunk_index": index, "checksum": checksum}
+            for index, checksum in state.checksums.items()
+        ])
+
+def checkpoint_key(chunk_size: int, index: int, byte_range: Optional[Tuple[int, int]] = None) -> str:
+    """Identify a chunk by the layout that produced it, so resumes only skip identical chunks"""
+    key = f"{chunk_size}:{index}"
+    return f"{byte_range[0]}-{byte_range[1]}:{key}" if byte_range else key
+
+def get_checkpoints(engine, table, run_id: int) -> Set[str]:
+    """Chunks of a table committed so far by a load run"""
+    with engine.connect() as connection:
+        return set(connection.execute(
+            select(IngestionCheckpoint.chunk)
+            .where(IngestionCheckpoint.run_id == run_id, IngestionCheckpoint.table_name == table.name)
+        ).scalars())
+
+def check_checkpoint_layout(table, completed: Set[str], prefixes: List[str]):
+    """Refuse to resume with a chunk layout that differs from the interrupted load"""
+    foreign = [key for key in completed if not any(key.startswith(prefix) for prefix in prefixes)]
+    if foreign:
+        raise ValueError(
+            f"{table.name} has checkpoints from a load with a different --chunk-size or --workers "
+            f"(e.g. {foreign[0]}); resume with the same options"
+        )
+
+def save_checkpoint(connection, table, run_id: Optional[int], key: str, rows: int):
+    """Record a committed chunk; called in the chunk's own transaction. Loads outside a run aren't checkpointed."""
+    if run_id is not None:
+        connection.execute(IngestionCheckpoint.__table__.insert(), {
+            "run_id": run_id, "table_name": table.name, "chunk": key, "rows": rows
+        })
+
+def input_fingerprint(csv_dir: str) -> Dict[str, Dict[str, object]]:
+    """Size and SHA-1 of each table's CSV, so a resume can tell it is reading the same files"""
+    fingerprint = {}
+    for table in TABLES:
+        path = csv_path_for(csv_dir, table)
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        fingerprint[table.name] = {"size": os.path.getsize(path), "sha1": digest.hexdigest()}
+    return fingerprint
+
+def finish_load(engine, run_id: int):
+    """Mark a run complete; its checkpoints are no longer needed"""
+    with engine.begin() as connection:
+        connection.execute(update(IngestionRun).where(IngestionRun.id == run_id).values(completed_at=func.now()))
+        connection.execute(delete(IngestionCheckpoint).where(IngestionCheckpoint.run_id == run_id))
+
+def reset_sequence(connection, table):
+    """Move a serial primary key's sequence past the loaded ids (PostgreSQL only)"""
+    if connection.dialect.name != "postgresql":
+        return
+    primary_key = list(table.primary_key.columns)[0].name
+    connection.execute(text(f"""
+        SELECT setval(pg_get_serial_sequence('{table.name}', '{primary_key}'), MAX("{primary_key}"))
+        FROM "{table.name}"
+        WHERE pg_get_serial_sequence('{table.name}', '{primary_key}') IS NOT NULL
+        HAVING MAX("{primary_key}") IS NOT NULL
+    """))
+
+def load_table(engine, table, csv_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+               incremental: bool = False, resume: bool = False, quarantine_dir: Optional[str] = None,
+               run_id: Optional[int] = None) -> LoadStats:
+    """Stream one CSV into its table, committing each chunk with its checkpoint.
+
+    A full load COPies every row into an empty table. An incremental load upserts only rows
+    at or past the stored watermark (or chunks whose checksum changed), so its database work
+    scales with the delta. Both record the new watermark and checksums for the next run.
+    With resume, chunks checkpointed by run_id are skipped. Rows failing
+    validation are written to <quarantine_dir>/<table>.csv instead of the table.
+    """
+    print(f"Loading {table.name}{' (incremental)' if incremental else ''}...")
+    stats = LoadStats(table.name)
+    start = time.perf_counter()
+
+    check_columns(table, csv_path)
+    quarantine = Quarantine(quarantine_dir or default_quarantine_dir(csv_path), table.name)
+    with engine.connect() as connection:
+        references = load_references(connection, table, incremental)
+
+    completed = set()
+    if resume:
+        completed = get_checkpoints(engine, table, run_id)
+        check_checkpoint_layout(table, completed, [f"{chunk_size}:"])
+
+    previous = IngestionState()
+    if incremental:
+        with engine.connect() as connection:
+            previous = get_ingestion_state(connection, table)
+    checksums_comparable = incremental and previous.chunk_size == chunk_size
+    state = IngestionState(watermark=previous.watermark, chunk_size=chunk_size)
+
+    for index, chunk in enumerate(read_csv_chunks(csv_path, table, chunk_size)):
+        if table.name not in WATERMARK_COLUMNS:
+            state.checksums[index] = chunk_checksum(chunk)
+            if checksums_comparable and previous.checksums.get(index) == state.checksums[index]:
+                stats.unchanged += len(chunk)
+                continue
+
+        key = checkpoint_key(chunk_size, index)
+        if key in completed:
+            stats.resumed += len(chunk)
+            continue
+
+        prepared = prepare_chunk(table, chunk)
+        reasons = validate_chunk(table, chunk, prepared, references)
+        rejected = reasons != ""
+        if rejected.any():
+            quarantine.write(chunk[rejected], reasons[rejected], key)
+            stats.quarantined += int(rejected.sum())
+            prepared = prepared[~rejected]
+
+        watermarks = row_watermarks(table, prepared)
+        if watermarks is not None:
+            if incremental and previous.watermark is not None:
+                # >= reloads rows sharing the boundary timestamp; rows without any timestamp are always reloaded
+                changed = watermarks.isna() | (watermarks >= previous.watermark)
+                stats.unchanged += int((~changed).sum())
+                prepared = prepared[changed]
+                watermarks = watermarks[changed]
+            latest = watermarks.max()
+            if pd.notna(latest) and (state.watermark is None or latest > state.watermark):
+                state.watermark = latest
+
+        with engine.begin() as connection:
+            if prepared.empty:
+                pass
+            elif incremental:
+                upsert_chunk(connection, table, prepared)
+            else:
+                write_chunk(connection, table, prepared)
+            save_checkpoint(connection, table, run_id, key, len(prepared))
+        stats.rows += len(prepared)
+        print(f"  {stats.rows:,} rows ({stats.rows / (time.perf_counter() - start):,.0f} rows/sec)")
+
+    with engine.begin() as connection:
+        if stats.resumed and table.name in WATERMARK_COLUMNS:
+            # Rows of skipped chunks were never seen by this run, but they are in the table
+            stored = table_watermark(connection, table)
+            if stored is not None and (state.watermark is None or stored > state.watermark):
+                state.watermark = stored
+        reset_sequence(connection, table)
+        save_ingestion_state(connection, table, state)
+
+    stats.seconds = time.perf_counter() - start
+    print(f"Loaded {stats.rows:,} {table.name} in {stats.seconds:.1f}s ({stats.rows_per_second:,.0f} rows/sec)"
+          + (f", {stats.unchanged:,} unchanged" if incremental else "")
+          + (f", {stats.resumed:,} already loaded" if resume else "")
+          + (f", {stats.quarantined:,} quarantined in {quarantine.path}" if stats.quarantined else ""))
+    return stats
+
+def start_load(engine, csv_dir: str, resume: bool, quarantine_dir: str, incremental: bool = False) -> int:
+    """Check the CSVs exist and return the id of the run to load them in. A new full load needs empty tables.
+
+    With resume, that is the last run, which must be unfinished, of the same kind and over
+    the same files. Otherwise a new run starts and the previous checkpoints and rejects are forgotten.
+    """
+    missing = [csv_path_for(csv_dir, table) for table in TABLES if not os.path.exists(csv_path_for(csv_dir, table))]
+    if missing:
+        raise FileNotFoundError(f"Missing CSV files: {', '.join(missing)}")
+
+    if not resume and not incremental:
+        with engine.connect() as connection:
+            loaded = [
+                table.name for table in TABLES
+                if connection.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{table.name}")')).scalar()
+            ]
+        if loaded:
+            # Every row would be quarantined as a duplicate of itself
+            raise LoadRefused(
+                f"{', '.join(loaded)} already contain rows; use --incremental to load the export into "
+                "existing data, or empty the tables for a full reload"
+            )
+
+    inputs = input_fingerprint(csv_dir)
+    with engine.begin() as connection:
+        if resume:
+            last = connection.execute(
+                select(IngestionRun.id, IngestionRun.inputs, IngestionRun.incremental, IngestionRun.completed_at)
+                .order_by(IngestionRun.id.desc())
+                .limit(1)
+            ).first()
+            if last is None:
+                raise LoadRefused("There is no interrupted load to resume; run without --resume")
+            if last.completed_at is not None:
+                raise LoadRefused(
+                    f"The last load finished at {last.completed_at:%Y-%m-%d %H:%M:%S}, so there is nothing "
+                    "to resume; run without --resume to load again"
+                )
+            if last.incremental != incremental:
+                raise LoadRefused("The interrupted load was " + ("" if last.incremental else "not ")
+                                 + "incremental; resume it with the same options")
+            previous = json.loads(last.inputs)
+            changed = [name for name, fingerprint in inputs.items() if previous.get(name) != fingerprint]
+            if changed:
+                raise LoadRefused(
+                    f"{', '.join(changed)} changed since the interrupted load; run without --resume to start over"
+                )
+            return last.id
+
+        connection.execute(delete(IngestionCheckpoint))
+        run_id = connection.execute(
+            IngestionRun.__table__.insert().values(inputs=json.dumps(inputs), incremental=incremental)
+        ).inserted_primary_key[0]
+    for table in TABLES:
+        clear_quarantine(quarantine_dir, table)
+    return run_id
+
+def load_all(engine, csv_dir: str, chunk_size: int = DEFAULT_CHUNK_SIZE, incremental: bool = False,
+             resume: bool = False, quarantine_dir: Optional[str] = None) -> list:
+    """Load every table from csv_dir in foreign key order"""
+    quarantine_dir = quarantine_dir or os.path.join(os.path.abspath(csv_dir), "quarantine")
+    # Indexes, foreign keys and triggers a killed parallel load never put back
+    restored = restore_deferred_ddl(engine)
+    run_id = start_load(engine, csv_dir, resume, quarantine_dir, incremental)
+    # Incremental upserts keep the summaries current through the triggers; a full load rebuilds them afterwards
+    with nullcontext() if incremental else summary_triggers_disabled(engine, TABLES):
+        results = [
+            load_table(engine, table, csv_path_for(csv_dir, table), chunk_size, incremental, resume, quarantine_dir,
+                       run_id)
+            for table in TABLES
+        ]
+    if restored:
+        validate_foreign_keys(engine, restored)
+    finish_load(engine, run_id)
+    return results
+
+@contextmanager
+def summary_triggers_disabled(engine, tables: list):
+    """Disable the summary triggers of tables for a full load (PostgreSQL). The caller rebuilds the summaries."""
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    names = [table.name for table in tables]
+    with engine.begin() as connection:
+        for name in names:
+            connection.execute(text(f'ALTER TABLE "{name}" DISABLE TRIGGER USER'))
+    try:
+        yield
+    finally:
+        with engine.begin() as connection:
+            for name in names:
+                connection.execute(text(f'ALTER TABLE "{name}" ENABLE TRIGGER USER'))
+
+# Engine of a parallel load worker process, created by init_worker
+_worker_engine = None
+
+def init_worker(url):
+    """Give each worker process its own engine; connections must not cross a fork"""
+    global _worker_engine
+    _worker_engine = create_engine(url)
+
+def claimed_by_earlier_partitions(table, csv_path: str, partitions: List[Tuple[int, int]],
+                                  chunk_size: int) -> List[Dict[str, pd.Series]]:
+    """Unique values each partition repeats from an earlier one, for each partition.
+
+    Only the key columns are read, in file order, so that as in a serial load the first
+    occurrence of a value is loaded and the later ones are quarantined. Each result maps
+    a unique column to a Series of repeated value -> primary key of the first occurrence.
+    """
+    names = unique_columns(table)
+    primary_key = names[0]
+    seen: Dict[str, pd.Series] = {}
+    claimed = []
+    for byte_range in partitions:
+        keys = pd.concat([
+            prepare_chunk(table, chunk)
+            for chunk in read_csv_chunks(csv_path, table, chunk_size, byte_range, columns=names)
+        ] or [pd.DataFrame(columns=names)])
+        repeats = {}
+        for name in names:
+            values = keys[list(dict.fromkeys([name, primary_key]))].dropna().drop_duplicates(name)
+            first = pd.Series(values[primary_key].to_numpy(dtype=object), index=pd.Index(values[name]), dtype=object)
+            earlier = seen.get(name)
+            if earlier is not None:
+                repeated = first.index.isin(earlier.index)
+                if repeated.any():
+                    repeats[name] = earlier[first.index[repeated]]
+                first = first[~repeated]
+            seen[name] = first if earlier is None else pd.concat([earlier, first])
+        claimed.append(repeats)
+    return claimed
+
+def load_partition(table_name: str, csv_path: str, byte_range: Tuple[int, int], chunk_size: int,
+                   completed: Set[str], quarantine_dir: str, run_id: int,
+                   claimed: Optional[Dict[str, pd.Series]] = None) -> Tuple[int, int, int]:
+    """Load one byte range of a CSV in a worker process.
+
+    Returns (rows loaded, rows already loaded, rows quarantined). Duplicate keys are detected
+    within the partition, against rows already in the database, and against the values
+    claimed by earlier partitions (see claimed_by_earlier_partitions).
+    """
+    table = TABLES_BY_NAME[table_name]
+    quarantine = Quarantine(quarantine_dir, f"{table_name}.{byte_range[0]}-{byte_range[1]}")
+    with _worker_engine.connect() as connection:
+        references = load_references(connection, table)
+    for name, values in (claimed or {}).items():
+        known = references.unique.get(name)
+        references.unique[name] = values if known is None or known.empty else pd.concat([known, values])
+    rows = resumed = 0
+    for index, chunk in enumerate(read_csv_chunks(csv_path, table, chunk_size, byte_range)):
+        key = checkpoint_key(chunk_size, index, byte_range)
+        if key in completed:
+            resumed += len(chunk)
+            continue
+        prepared = prepare_chunk(table, chunk)
+        reasons = validate_chunk(table, chunk, prepared, references)
+        rejected = reasons != ""
+        if rejected.any():
+            quarantine.write(chunk[rejected], reasons[rejected], key)
+            prepared = prepared[~rejected]
+        with _worker_engine.begin() as connection:
+            write_chunk(connection, table, prepared)
+            save_checkpoint(connection, table, run_id, key, len(prepared))
+        rows += len(prepared)
+    return rows, resumed, quarantine.rows
+
+def table_watermark(connection, table) -> Optional[pd.Timestamp]:
+    """Latest watermark timestamp already stored in a table"""
+    # One MAX per column rather than GREATEST, which SQLite lacks
+    columns = ", ".join(f'MAX("{name}")' for name in WATERMARK_COLUMNS[table.name])
+    latest = [pd.Timestamp(value) for value in connection.execute(text(f'SELECT {columns} FROM "{table.name}"')).one()
+              if value is not None]
+    return max(latest) if latest else None
+
+def load_table_parallel(engine, pool, table, csv_path: str, chunk_size: int, workers: int,
+                        resume: bool = False, quarantine_dir: Optional[str] = None,
+                        run_id: Optional[int] = None) -> LoadStats:
+    """Load one CSV across the process pool, one byte range per worker.
+
+    Tables without timestamps keep the serial path, which records the chunk checksums
+    used by incremental loads. Each partition quarantines to <quarantine_dir>/<table>.<range>.csv.
+    """
+    quarantine_dir = quarantine_dir or default_quarantine_dir(csv_path)
+    if table.name not in WATERMARK_COLUMNS:
+        return load_table(engine, table, csv_path, chunk_size, resume=resume, quarantine_dir=quarantine_dir, run_id=run_id)
+
+    check_columns(table, csv_path)
+
+    partitions = partition_csv(csv_path, workers)
+    print(f"Loading {table.name} in {len(partitions)} partitions...")
+    stats = LoadStats(table.name)
+    start = time.perf_counter()
+
+    completed = set()
+    if resume:
+        completed = get_checkpoints(engine, table, run_id)
+        check_checkpoint_layout(table, completed, [f"{first}-{last}:{chunk_size}:" for first, last in partitions])
+
+    claimed = claimed_by_earlier_partitions(table, csv_path, partitions, chunk_size)
+    futures = [
+        pool.submit(
+            load_partition, table.name, csv_path, byte_range, chunk_size, completed, quarantine_dir, run_id, repeats
+        )
+        for byte_range, repeats in zip(partitions, claimed)
+    ]
+    for future in futures:
+        rows, resumed, quarantined = future.result()
+        stats.rows += rows
+        stats.resumed += resumed
+        stats.quarantined += quarantined
+
+    with engine.begin() as connection:
+        reset_sequence(connection, table)
+        save_ingestion_state(connection, table, IngestionState(
+            watermark=table_watermark(connection, table),
+            chunk_size=chunk_size
+        ))
+
+    stats.seconds = time.perf_counter() - start
+    print(f"Loaded {stats.rows:,} {table.name} in {stats.seconds:.1f}s ({stats.rows_per_second:,.0f} rows/sec)"
+          + (f", {stats.quarantined:,} quarantined in {quarantine_dir}" if stats.quarantined else ""))
+    return stats
+
+def restore_statement(item) -> str:
+    """DDL restoring one deferred index, foreign key (NOT VALID) or table's user triggers"""
+    if item.kind == "index":
+        return item.definition
+    if item.kind == "foreign_key":
+        return f'ALTER TABLE "{item.table_name}" ADD CONSTRAINT "{item.name}" {item.definition} NOT VALID'
+    return f'ALTER TABLE "{item.table_name}" ENABLE TRIGGER USER'
+
+def restore_deferred_ddl(engine, workers: int = 1) -> list:
+    """Restore everything recorded in ingestion_deferred_ddl and return the foreign keys re-added.
+
+    Each object is restored in the transaction that deletes its record, so an interrupted
+    restore picks up where it stopped. Indexes are rebuilt in parallel, then the foreign keys
+    are re-added NOT VALID and the triggers enabled.
+    """
+    with engine.connect() as connection:
+        pending = connection.execute(select(IngestionDeferredDDL).order_by(IngestionDeferredDDL.id)).all()
+    if not pending:
+        return []
+
+    def restore(item):
+        with engine.begin() as connection:
+            connection.execute(text(restore_statement(item)))
+            connection.execute(delete(IngestionDeferredDDL).where(IngestionDeferredDDL.id == item.id))
+
+    indexes = [item for item in pending if item.kind == "index"]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as threads:
+        list(threads.map(restore, indexes))
+    print(f"Rebuilt {len(indexes)} indexes in {time.perf_counter() - start:.1f}s")
+
+    foreign_keys = [item for item in pending if item.kind == "foreign_key"]
+    for item in foreign_keys + [item for item in pending if item.kind == "trigger"]:
+        restore(item)
+    return foreign_keys
+
+def validate_foreign_keys(engine, foreign_keys: list, workers: int = 1):
+    """VALIDATE the foreign keys restore_deferred_ddl re-added NOT VALID, one thread per table"""
+    def validate(statements):
+        with engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+
+    start = time.perf_counter()
+    by_table = {}
+    for fk in foreign_keys:
+        by_table.setdefault(fk.table_name, []).append(f'ALTER TABLE "{fk.table_name}" VALIDATE CONSTRAINT "{fk.name}"')
+    with ThreadPoolExecutor(max_workers=workers) as threads:
+        list(threads.map(validate, by_table.values()))
+    print(f"Validated {len(foreign_keys)} foreign keys in {time.perf_counter() - start:.1f}s")
+
+@contextmanager
+def deferred_indexes_and_constraints(engine, tables: list, workers: int, run_id: Optional[int] = None):
+    """Drop secondary indexes and foreign keys and disable summary triggers for a bulk load.
+
+    Primary keys and unique constraints stay in place. Their definitions are recorded in
+    ingestion_deferred_ddl in the transaction that drops them, so a load killed before its
+    cleanup leaves them to restore_deferred_ddl; anything still recorded from such a load is
+    restored here too. Afterwards the indexes are rebuilt in parallel and the foreign keys
+    re-added NOT VALID, then validated in parallel, one thread per table. The summary tables
+    must be rebuilt by the caller.
+    """
+    names = [table.name for table in tables]
+    with engine.begin() as connection:
+        indexes = connection.execute(text("""
+            SELECT c.relname AS table_name, i.relname AS index_name, pg_get_indexdef(ix.indexrelid) AS definition
+            FROM pg_index ix
+            JOIN pg_class i ON i.oid = ix.indexrelid
+            JOIN pg_class c ON c.oid = ix.indrelid
+            WHERE c.relname = ANY(:names)
+              AND c.relnamespace = to_regnamespace(current_schema())
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint con WHERE con.conindid = ix.indexrelid)
+        """), {"names": names}).all()
+        foreign_keys = connection.execute(text("""
+            SELECT c.relname AS table_name, con.conname AS constraint_name, pg_get_constraintdef(con.oid) AS definition
+            FROM pg_constraint con
+            JOIN pg_class c ON c.oid = con.conrelid
+            WHERE con.contype = 'f'
+              AND c.relname = ANY(:names)
+              AND c.relnamespace = to_regnamespace(current_schema())
+        """), {"names": names}).all()
+        # Tables whose triggers an interrupted load left disabled are already recorded
+        disabled = set(connection.execute(
+            select(IngestionDeferredDDL.table_name).where(IngestionDeferredDDL.kind == "trigger")
+        ).scalars())
+
+        records = (
+            [{"kind": "index", "table_name": index.table_name, "name": index.index_name,
+              "definition": index.definition} for index in indexes]
+            # A constraint left NOT VALID by a failed load is re-added, and validated, like the others
+            + [{"kind": "foreign_key", "table_name": fk.table_name, "name": fk.constraint_name,
+                "definition": fk.definition.removesuffix(" NOT VALID")} for fk in foreign_keys]
+            + [{"kind": "trigger", "table_name": name, "name": None, "definition": None}
+               for name in names if name not in disabled]
+        )
+        if records:
+            connection.execute(IngestionDeferredDDL.__table__.insert(), [dict(record, run_id=run_id) for record in records])
+
+        for fk in foreign_keys:
+            connection.execute(text(f'ALTER TABLE "{fk.table_name}" DROP CONSTRAINT "{fk.constraint_name}"'))
+        for index in indexes:
+            connection.execute(text(f'DROP INDEX "{index.index_name}"'))
+        for name in names:
+            connection.execute(text(f'ALTER TABLE "{name}" DISABLE TRIGGER USER'))
+    print(f"Deferred {len(indexes)} indexes and {len(foreign_keys)} foreign keys")
+
+    loaded = False
+    try:
+        yield
+        loaded = True
+    finally:
+        restored = restore_deferred_ddl(engine, workers)
+
+        if loaded:
+            validate_foreign_keys(engine, restored, workers)
+        else:
+            print("Load failed; foreign keys were restored NOT VALID and still need VALIDATE CONSTRAINT")
+
+def load_all_parallel(engine, csv_dir: str, chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = 4,
+                      resume: bool = False, quarantine_dir: Optional[str] = None) -> list:
+    """Full load of every table with a process pool and deferred indexes (PostgreSQL only)"""
+    quarantine_dir = quarantine_dir or os.path.join(os.path.abspath(csv_dir), "quarantine")
+    run_id = start_load(engine, csv_dir, resume, quarantine_dir)
+
+    # Forked workers must not inherit pooled connections
+    engine.dispose()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(engine.url,)) as pool:
+        with deferred_indexes_and_constraints(engine, TABLES, workers, run_id):
+            results = [
+                load_table_parallel(
+                    engine, pool, table, csv_path_for(csv_dir, table), chunk_size, workers, resume, quarantine_dir,
+                    run_id
+                )
+                for table in TABLES
+            ]
+    finish_load(engine, run_id)
+    return results
+
+def rebuild_summaries(engine):
+    """Build the summary tables read by the chat queries"""
+    with engine.begin() as connection:
+        print("Rebuilding product availability...")
+        rebuild_product_availability(connection)
+        print("Refreshing product sales rollup...")
+        refresh_product_sales(connection)
+
+def analyze_tables(engine, table_names: list):
+    """Refresh planner statistics after a load"""
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        for name in table_names:
+            connection.execute(text(f'ANALYZE "{name}"'))
+    print(f"Analyzed {len(table_names)} tables in {time.perf_counter() - start:.1f}s")
+
+def print_summary(results: list):
+    """Print rows/sec per table"""
+    total_rows = sum(stats.rows for stats in results)
+    total_seconds = sum(stats.seconds for stats in results)
+    total_unchanged = sum(stats.unchanged for stats in results)
+    total_resumed = sum(stats.resumed for stats in results)
+    total_quarantined = sum(stats.quarantined for stats in results)
+    print(f"\n{'table':<22} {'rows':>12} {'unchanged':>12} {'resumed':>12} {'quarantined':>12} "
+          f"{'seconds':>9} {'rows/sec':>12}")
+    for stats in results:
+        print(f"{stats.table:<22} {stats.rows:>12,} {stats.unchanged:>12,} {stats.resumed:>12,} "
+              f"{stats.quarantined:>12,} {stats.seconds:>9.1f} {stats.rows_per_second:>12,.0f}")
+    if total_seconds:
+        print(f"{'total':<22} {total_rows:>12,} {total_unchanged:>12,} {total_resumed:>12,} "
+              f"{total_quarantined:>12,} {total_seconds:>9.1f} {total_rows / total_seconds:>12,.0f}")
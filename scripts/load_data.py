@@ -1,205 +1,71 @@
-import pandas as pd
+import argparse
 import os
 import sys
-from sqlalchemy.orm import Session
-from datetime import datetime
+import time
+from alembic import command
+from alembic.config import Config
 
 # Add the parent directory to the path so we can import from app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import SessionLocal, engine
-from app.models import Base, DistributionCenter, Product, InventoryItem, User, Order, OrderItem
+from app.database import engine
+from scripts.ingest import (
+    DEFAULT_CHUNK_SIZE, SUMMARY_TABLES, TABLES, LoadRefused,
+    analyze_tables, load_all, load_all_parallel, print_summary, rebuild_summaries
+)
 
-def load_distribution_centers(db: Session, csv_path: str):
-    """Load distribution centers from CSV"""
-    print("Loading distribution centers...")
-    df = pd.read_csv(csv_path)
-    
-    for _, row in df.iterrows():
-        dc = DistributionCenter(
-            id=row['id'],
-            name=row['name'],
-            latitude=row['latitude'],
-            longitude=row['longitude']
-        )
-        db.add(dc)
-    
-    db.commit()
-    print(f"Loaded {len(df)} distribution centers")
+def upgrade_schema():
+    """Create or upgrade tables"""
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    alembic_config = Config(os.path.join(project_dir, "alembic.ini"))
+    alembic_config.set_main_option("script_location", os.path.join(project_dir, "migrations"))
+    command.upgrade(alembic_config, "head")
 
-def load_products(db: Session, csv_path: str):
-    """Load products from CSV"""
-    print("Loading products...")
-    df = pd.read_csv(csv_path)
-    
-    for _, row in df.iterrows():
-        product = Product(
-            id=row['id'],
-            cost=row['cost'],
-            category=row['category'],
-            name=row['name'],
-            brand=row['brand'],
-            retail_price=row['retail_price'],
-            department=row['department'],
-            sku=row['sku'],
-            distribution_center_id=row['distribution_center_id']
-        )
-        db.add(product)
-    
-    db.commit()
-    print(f"Loaded {len(df)} products")
-
-def load_inventory_items(db: Session, csv_path: str):
-    """Load inventory items from CSV"""
-    print("Loading inventory items...")
-    df = pd.read_csv(csv_path)
-    
-    # Process in chunks to avoid memory issues
-    chunk_size = 1000
-    for i in range(0, len(df), chunk_size):
-        chunk = df.iloc[i:i+chunk_size]
-        
-        for _, row in chunk.iterrows():
-            # Convert timestamp strings to datetime objects
-            created_at = pd.to_datetime(row['created_at']) if pd.notna(row['created_at']) else None
-            sold_at = pd.to_datetime(row['sold_at']) if pd.notna(row['sold_at']) else None
-            
-            inventory_item = InventoryItem(
-                id=row['id'],
-                product_id=row['product_id'],
-                created_at=created_at,
-                sold_at=sold_at,
-                cost=row['cost'],
-                product_category=row['product_category'],
-                product_name=row['product_name'],
-                product_brand=row['product_brand'],
-                product_retail_price=row['product_retail_price'],
-                product_department=row['product_department'],
-                product_sku=row['product_sku'],
-                product_distribution_center_id=row['product_distribution_center_id']
-            )
-            db.add(inventory_item)
-        
-        db.commit()
-        print(f"Processed {min(i+chunk_size, len(df))}/{len(df)} inventory items")
+def main():
+    """Main function to load all data"""
+    parser = argparse.ArgumentParser(description="Load the e-commerce CSV export into the database")
+    parser.add_argument("csv_dir", help="Directory containing distribution_centers.csv, products.csv, ...")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows read from each CSV per chunk")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Upsert only rows that are new or changed since the last load")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes for a parallel full load (PostgreSQL); 1 loads serially")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted load, skipping chunks it already committed")
+    parser.add_argument("--quarantine-dir",
+                        help="Where rows failing validation are written (default: <csv_dir>/quarantine)")
+    args = parser.parse_args()
 
-def load_users(db: Session, csv_path: str):
-    """Load users from CSV"""
-    print("Loading users...")
-    df = pd.read_csv(csv_path)
-    
-    for _, row in df.iterrows():
-        created_at = pd.to_datetime(row['created_at']) if pd.notna(row['created_at']) else None
-        
-        user = User(
-            id=row['id'],
-            first_name=row['first_name'],
-            last_name=row['last_name'],
-            email=row['email'],
-            age=row['age'] if pd.notna(row['age']) else None,
-            gender=row['gender'],
-            state=row['state'],
-            street_address=row['street_address'],
-            postal_code=row['postal_code'],
-            city=row['city'],
-            country=row['country'],
-            latitude=row['latitude'] if pd.notna(row['latitude']) else None,
-            longitude=row['longitude'] if pd.notna(row['longitude']) else None,
-            traffic_source=row['traffic_source'],
-            created_at=created_at
-        )
-        db.add(user)
-    
-    db.commit()
-    print(f"Loaded {len(df)} users")
+    if args.workers > 1 and (args.incremental or engine.dialect.name != "postgresql"):
+        parser.error("--workers is only supported for full loads into PostgreSQL")
 
-def load_orders(db: Session, csv_path: str):
-    """Load orders from CSV"""
-    print("Loading orders...")
-    df = pd.read_csv(csv_path)
-    
-    for _, row in df.iterrows():
-        created_at = pd.to_datetime(row['created_at']) if pd.notna(row['created_at']) else None
-        returned_at = pd.to_datetime(row['returned_at']) if pd.notna(row['returned_at']) else None
-        shipped_at = pd.to_datetime(row['shipped_at']) if pd.notna(row['shipped_at']) else None
-        delivered_at = pd.to_datetime(row['delivered_at']) if pd.notna(row['delivered_at']) else None
-        
-        order = Order(
-            order_id=row['order_id'],
-            user_id=row['user_id'],
-            status=row['status'],
-            gender=row['gender'],
-            created_at=created_at,
-            returned_at=returned_at,
-            shipped_at=shipped_at,
-            delivered_at=delivered_at,
-            num_of_item=row['num_of_item']
-        )
-        db.add(order)
-    
-    db.commit()
-    print(f"Loaded {len(df)} orders")
+    upgrade_schema()
 
-def load_order_items(db: Session, csv_path: str):
-    """Load order items from CSV"""
-    print("Loading order items...")
-    df = pd.read_csv(csv_path)
-    
-    # Process in chunks to avoid memory issues
-    chunk_size = 1000
-    for i in range(0, len(df), chunk_size):
-        chunk = df.iloc[i:i+chunk_size]
-        
-        for _, row in chunk.iterrows():
-            created_at = pd.to_datetime(row['created_at']) if pd.notna(row['created_at']) else None
-            shipped_at = pd.to_datetime(row['shipped_at']) if pd.notna(row['shipped_at']) else None
-            delivered_at = pd.to_datetime(row['delivered_at']) if pd.notna(row['delivered_at']) else None
-            returned_at = pd.to_datetime(row['returned_at']) if pd.notna(row['returned_at']) else None
-            
-            order_item = OrderItem(
-                id=row['id'],
-                order_id=row['order_id'],
-                user_id=row['user_id'],
-                product_id=row['product_id'],
-                inventory_item_id=row['inventory_item_id'],
-                status=row['status'],
-                created_at=created_at,
-                shipped_at=shipped_at,
-                delivered_at=delivered_at,
-                returned_at=returned_at
+    try:
+        start = time.perf_counter()
+        if args.workers > 1:
+            results = load_all_parallel(
+                engine, args.csv_dir, args.chunk_size, args.workers, args.resume, args.quarantine_dir
             )
-            db.add(order_item)
-        
-        db.commit()
-        print(f"Processed {min(i+chunk_size, len(df))}/{len(df)} order items")
+        else:
+            results = load_all(
+                engine, args.csv_dir, args.chunk_size, args.incremental, args.resume, args.quarantine_dir
+            )
+        # Incremental upserts go through the summary table triggers; full loads rebuild once at the end
+        if not args.incremental:
+            rebuild_summaries(engine)
+        analyze_tables(engine, [table.name for table in TABLES] + SUMMARY_TABLES)
+        print_summary(results)
+        print(f"Data loading completed successfully in {time.perf_counter() - start:.1f}s!")
 
-def main():
-    """Main function to load all data"""
-    # Create tables
-    Base.metadata.create_all(bind=engine)
-    
-    # Get database session
-    db = SessionLocal()
-    
-    try:
-        # Define CSV file paths
-        csv_dir = r"C:\Users\rohan\Downloads\archive\archive"
-        
-        # Load data in order (respecting foreign key constraints)
-        load_distribution_centers(db, os.path.join(csv_dir, "distribution_centers.csv"))
-        load_products(db, os.path.join(csv_dir, "products.csv"))
-        load_inventory_items(db, os.path.join(csv_dir, "inventory_items.csv"))
-        load_users(db, os.path.join(csv_dir, "users.csv"))
-        load_orders(db, os.path.join(csv_dir, "orders.csv"))
-        load_order_items(db, os.path.join(csv_dir, "order_items.csv"))
-        
-        print("Data loading completed successfully!")
-        
+    except LoadRefused as e:
+        print(f"Error loading data: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"Error loading data: {e}")
-        db.rollback()
-    finally:
-        db.close()
+        print("Committed chunks are checkpointed; rerun with --resume (and the same options) to continue")
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
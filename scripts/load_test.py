@@ -0,0 +1,321 @@
+"""
+End-to-end load test: N concurrent simulated users chat through /api/chat and browse
+/api/sessions and /api/sessions/{id}; reports throughput and p50/p95/p99 latency.
+
+By default the script starts the mock Groq server (scripts/mock_llm_server.py) and the
+API under uvicorn against DATABASE_URL, which should already hold seeded data
+(or pass --seed-csv to load a CSV export into an empty database first):
+
+    python scripts/load_test.py --users 50 --duration 60 --llm-latency-ms 400
+    python scripts/load_test.py --users 50 --base-url http://localhost:8000   # drive a running API
+
+Results are written as JSON (--output) so runs can be compared; --compare prints the
+change against an earlier result file.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import text
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MESSAGES = [
+    "Do you have any {brand} {category}?",
+    "What is the status of order #{order_id}?",
+    "Can you show my order history? I'm user {user_id}",
+    "What are your most popular products right now?",
+    "Are {brand} {category} in stock?",
+    "How do I return an item?",
+]
+BRANDS = ["nike", "adidas", "puma", "levi", "calvin", "ralph"]
+CATEGORIES = ["shirts", "pants", "dresses", "shoes", "jackets", "sweaters"]
+
+class SampleIds:
+    """Real user and order ids, so lookups hit rows rather than empty results"""
+
+    def __init__(self, users: List[int], orders: List[int]):
+        self.users = users or [1]
+        self.orders = orders or [1]
+
+def load_sample_ids(limit: int = 1000) -> SampleIds:
+    try:
+        from app.database import engine
+        with engine.connect() as connection:
+            users = connection.execute(text("SELECT id FROM users ORDER BY random() LIMIT :n"), {"n": limit}).scalars().all()
+            orders = connection.execute(text("SELECT order_id FROM orders ORDER BY random() LIMIT :n"), {"n": limit}).scalars().all()
+        engine.dispose()
+        return SampleIds(list(users), list(orders))
+    except Exception as e:
+        print(f"Could not read sample ids from the database, using defaults: {e}")
+        return SampleIds([], [])
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(q * len(values))) - 1))]
+
+class Stats:
+    """Latencies and errors per endpoint, recorded only after the warmup"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.recording = False
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        if not self.recording:
+            return
+        self.latencies.setdefault(endpoint, [])
+        self.errors.setdefault(endpoint, 0)
+        if ok:
+            self.latencies[endpoint].append(seconds)
+        else:
+            self.errors[endpoint] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        results = {}
+        all_latencies = []
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            latencies = sorted(self.latencies.get(endpoint, []))
+            all_latencies.extend(latencies)
+            results[endpoint] = describe(latencies, self.errors.get(endpoint, 0), elapsed)
+        results["total"] = describe(sorted(all_latencies), sum(self.errors.values()), elapsed)
+        return results
+
+def describe(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+    }
+
+async def timed(stats: Stats, endpoint: str, request) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        response = await request
+    except httpx.HTTPError:
+        stats.record(endpoint, time.perf_counter() - start, ok=False)
+        return None
+    stats.record(endpoint, time.perf_counter() - start, ok=response.status_code < 400)
+    return response
+
+def make_message(rng: random.Random, ids: SampleIds, user_id: int) -> str:
+    return rng.choice(MESSAGES).format(
+        brand=rng.choice(BRANDS),
+        category=rng.choice(CATEGORIES),
+        order_id=rng.choice(ids.orders),
+        user_id=user_id,
+    )
+
+async def simulated_user(client: httpx.AsyncClient, stats: Stats, ids: SampleIds, deadline: float,
+                         turns: int, think_time: float, rng: random.Random):
+    """Chat for a few turns in a new session, then list the user's sessions and open this one"""
+    async def think():
+        if think_time > 0:
+            await asyncio.sleep(rng.expovariate(1 / think_time))
+
+    while time.monotonic() < deadline:
+        user_id = rng.choice(ids.users)
+        session_id = None
+        for _ in range(turns):
+            if time.monotonic() >= deadline:
+                return
+            payload = {"message": make_message(rng, ids, user_id), "user_id": user_id}
+            if session_id:
+                payload["session_id"] = session_id
+            response = await timed(stats, "chat", client.post("/api/chat", json=payload))
+            if response is not None and response.status_code == 200:
+                session_id = response.json()["session_id"]
+            await think()
+
+        await timed(stats, "sessions", client.get("/api/sessions", params={"user_id": user_id, "limit": 10}))
+        if session_id:
+            await timed(stats, "session_detail", client.get(f"/api/sessions/{session_id}"))
+        await think()
+
+async def run_load(args, ids: SampleIds) -> Dict:
+    stats = Stats()
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        deadline = time.monotonic() + args.warmup + args.duration
+        users = [
+            asyncio.create_task(simulated_user(
+                client, stats, ids, deadline, args.turns, args.think_time, random.Random(rng.random())
+            ))
+            for _ in range(args.users)
+        ]
+        await asyncio.sleep(args.warmup)
+        stats.recording = True
+        started = time.monotonic()
+        await asyncio.gather(*users)
+        elapsed = time.monotonic() - started
+
+        server = {}
+        for name, path in (("pool", "/api/admin/pool"), ("cache", "/api/admin/cache")):
+            try:
+                server[name] = (await client.get(path, headers={"X-Admin-Token": os.getenv("ADMIN_TOKEN", "")})).json()
+            except (httpx.HTTPError, ValueError):
+                pass
+    return {"elapsed_s": round(elapsed, 2), "endpoints": stats.summary(elapsed), "server": server}
+
+def wait_until_healthy(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} did not become healthy within {timeout:.0f}s")
+
+def start_servers(args, log_file) -> List[subprocess.Popen]:
+    """Start the mock LLM server and the API under uvicorn, pointed at the mock"""
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    mock = subprocess.Popen(
+        [sys.executable, os.path.join(PROJECT_DIR, "scripts", "mock_llm_server.py"),
+         "--port", str(args.mock_port),
+         "--latency-ms", str(args.llm_latency_ms),
+         "--jitter-ms", str(args.llm_jitter_ms)],
+        stdout=log_file, stderr=subprocess.STDOUT,
+    )
+    # The admin endpoints snapshotted after the run need a token
+    os.environ.setdefault("ADMIN_TOKEN", secrets.token_urlsafe(16))
+    env = dict(os.environ, GROQ_BASE_URL=mock_url)
+    env.setdefault("GROQ_API_KEY", "mock")
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=PROJECT_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+    )
+    processes = [mock, api]
+    try:
+        wait_until_healthy(f"{mock_url}/health")
+        wait_until_healthy(f"{args.base_url}/api/health")
+    except Exception:
+        stop_servers(processes)
+        raise
+    return processes
+
+def stop_servers(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(endpoints: Dict[str, Dict[str, float]]):
+    print(f"\n{'endpoint':<16} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, row in endpoints.items():
+        print(f"{name:<16} {row['requests']:>9,} {row['errors']:>7,} {row['throughput_rps']:>8.1f} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}")
+
+def print_comparison(previous: Dict, current: Dict):
+    def change(old: float, new: float) -> str:
+        return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+
+    print(f"\nCompared with {previous.get('started_at')} ({previous.get('git_commit')}):")
+    print(f"{'endpoint':<16} {'req/s':>16} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+    for name, row in current["endpoints"].items():
+        old = previous.get("endpoints", {}).get(name)
+        if not old:
+            continue
+        cells = [
+            f"{old[key]:.1f}→{row[key]:.1f} {change(old[key], row[key])}"
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+        ]
+        print(f"{name:<16} " + " ".join(f"{cell:>18}" for cell in cells))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chat API with a mock LLM")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=60, help="Measured seconds, after the warmup")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of load before measuring")
+    parser.add_argument("--turns", type=int, default=3, help="Chat messages per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between a user's requests, in seconds")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="Drive an already running API instead of starting one")
+    parser.add_argument("--port", type=int, default=8010, help="Port for the API started by the script")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API started by the script")
+    parser.add_argument("--mock-port", type=int, default=8011)
+    parser.add_argument("--llm-latency-ms", type=float, default=400, help="Mean mock LLM latency")
+    parser.add_argument("--llm-jitter-ms", type=float, default=150, help="Standard deviation of the mock LLM latency")
+    parser.add_argument("--seed-csv", help="Load this CSV export into the (empty) database before the test")
+    parser.add_argument("--output", help="Result file (default: benchmarks/load_test_<time>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    if args.seed_csv:
+        subprocess.run([sys.executable, os.path.join(PROJECT_DIR, "scripts", "load_data.py"), args.seed_csv], check=True)
+
+    ids = load_sample_ids()
+    started_at = datetime.now(timezone.utc)
+    processes = []
+    log_path = None
+    if args.base_url is None:
+        args.base_url = f"http://127.0.0.1:{args.port}"
+        log_file = tempfile.NamedTemporaryFile("w", prefix="load_test_", suffix=".log", delete=False)
+        log_path = log_file.name
+        processes = start_servers(args, log_file)
+        print(f"API and mock LLM started (logs: {log_path})")
+
+    try:
+        print(f"Running {args.users} users for {args.warmup:.0f}s warmup + {args.duration:.0f}s against {args.base_url}")
+        run = asyncio.run(run_load(args, ids))
+    finally:
+        stop_servers(processes)
+
+    result = {
+        "started_at": started_at.isoformat(),
+        "git_commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        **run,
+    }
+    print_report(result["endpoints"])
+
+    output = args.output or os.path.join(
+        PROJECT_DIR, "benchmarks", f"load_test_{started_at.strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), result)
+
+if __name__ == "__main__":
+    main()
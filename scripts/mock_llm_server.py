@@ -0,0 +1,169 @@
+"""
+Local stand-in for the Groq chat-completions API, for load tests without network
+calls or API quota. Responses are canned; latency is drawn per request.
+
+    python scripts/mock_llm_server.py --port 8001 --latency-ms 400 --jitter-ms 150
+    GROQ_BASE_URL=http://localhost:8001 GROQ_API_KEY=mock python run.py
+
+Classification prompts (max_tokens <= 50) are answered with a category picked
+from keywords in the quoted customer message; everything else gets a short reply,
+streamed word by word when stream=true. Requests offering tools (LLM_MODE=tools)
+get a tool call for the same category before any tool results are sent back.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+CATEGORY_KEYWORDS = [
+    ("order_status", ("status", "track", "where is", "deliver", "shipped")),
+    ("user_orders", ("history", "my orders", "past orders")),
+    ("inventory_check", ("in stock", "inventory", "sku")),
+    ("top_products", ("popular", "best", "top", "trending")),
+    ("product_search", ("shirt", "pants", "dress", "shoe", "jacket", "nike", "adidas", "levi")),
+]
+
+# Category -> tool called for it in tools mode
+CATEGORY_TOOLS = {
+    "order_status": "get_order_status",
+    "user_orders": "get_user_orders",
+    "inventory_check": "check_inventory",
+    "top_products": "get_top_products",
+    "product_search": "search_products",
+}
+
+REPLY = ("Thanks for reaching out! Based on the information I have, here is what I found. "
+         "Let me know if there is anything else I can help you with today.")
+
+app = FastAPI(title="Mock Groq API")
+app.state.latency = 0.4
+app.state.jitter = 0.15
+app.state.token_delay = 0.01
+app.state.requests = 0
+
+def classify(prompt: str) -> str:
+    # The classification prompt quotes the customer message on its own line
+    return category_of(prompt.split('"')[1] if prompt.count('"') >= 2 else prompt)
+
+def category_of(message: str) -> str:
+    message = message.lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in message for keyword in keywords):
+            return category
+    return "general_help"
+
+def tool_arguments(category: str, message: str) -> dict:
+    numbers = [int(n) for n in re.findall(r"\d+", message)]
+    if category == "order_status":
+        return {"order_id": numbers[0]} if numbers else {}
+    if category == "user_orders":
+        return {"user_id": numbers[0] if numbers else 1}
+    if category == "inventory_check":
+        return {"product_id": numbers[0]} if numbers else {}
+    if category == "product_search":
+        brand = next((word for word in ("nike", "adidas", "levi") if word in message.lower()), None)
+        return {"brand": brand} if brand else {}
+    return {}
+
+def tool_call(body: dict):
+    """A tool call for the latest user message, unless tool results have already been sent"""
+    messages = body.get("messages", [])
+    if not body.get("tools") or any(message.get("role") == "tool" for message in messages):
+        return None
+    message = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+    category = category_of(message)
+    if category not in CATEGORY_TOOLS:
+        return None
+    return {
+        "id": f"call_{uuid.uuid4().hex[:12]}",
+        "type": "function",
+        "function": {"name": CATEGORY_TOOLS[category], "arguments": json.dumps(tool_arguments(category, message))},
+    }
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+async def simulated_latency():
+    await asyncio.sleep(max(0.0, random.gauss(app.state.latency, app.state.jitter)))
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    app.state.requests += 1
+    messages = body.get("messages", [])
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    is_classification = (body.get("max_tokens") or 0) <= 50
+    call = tool_call(body)
+    content = "" if call else classify(prompt) if is_classification else REPLY
+    usage = {
+        "prompt_tokens": estimate_tokens(prompt),
+        "completion_tokens": estimate_tokens(content),
+        "total_tokens": estimate_tokens(prompt) + estimate_tokens(content),
+    }
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "mock")
+
+    if body.get("stream"):
+        async def events():
+            await simulated_latency()
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")},
+                                 "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(app.state.token_delay)
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "x_groq": {"id": completion_id, "usage": usage},
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await simulated_latency()
+    message = {"role": "assistant", "content": content}
+    if call:
+        message["tool_calls"] = [call]
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if call else "stop"}],
+        "usage": usage,
+    }
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy", "requests": app.state.requests}
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Groq chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=400, help="Mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=150, help="Standard deviation of the latency")
+    parser.add_argument("--token-delay-ms", type=float, default=10, help="Delay between streamed words")
+    args = parser.parse_args()
+
+    app.state.latency = args.latency_ms / 1000
+    app.state.jitter = args.jitter_ms / 1000
+    app.state.token_delay = args.token_delay_ms / 1000
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Shared test setup.
+
+The API is pointed at a throwaway SQLite database before anything from app is imported.
+Tests that take the `engine` fixture run once on SQLite and once on PostgreSQL; the
+PostgreSQL run needs TEST_POSTGRES_URL, a database the tests may create schemas in,
+and is skipped without it.
+"""
+
+import os
+import tempfile
+import uuid
+
+DATA_DIR = tempfile.mkdtemp(prefix="chatbot-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DATA_DIR, 'app.db')}"
+os.environ["CHAT_WRITE_BEHIND"] = "false"
+os.environ.setdefault("GROQ_API_KEY", "test")
+for name in ("ASYNC_DATABASE_URL", "DATABASE_REPLICA_URLS", "CACHE_REDIS_URL"):
+    os.environ.pop(name, None)
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+def migrate(engine, schema=None):
+    """Run the Alembic migrations on engine, keeping alembic_version in schema if given"""
+    config = Config(os.path.join(PROJECT_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(PROJECT_DIR, "migrations"))
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        config.attributes["version_table_schema"] = schema
+        command.upgrade(config, "head")
+        connection.commit()
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    migrate(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def postgresql_engine():
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin = create_engine(TEST_POSTGRES_URL)
+    with admin.begin() as connection:
+        connection.execute(text(f"CREATE SCHEMA {schema}"))
+    # public stays on the path for extensions such as pg_trgm
+    engine = create_engine(make_url(TEST_POSTGRES_URL).update_query_dict({"options": f"-csearch_path={schema},public"}))
+    try:
+        migrate(engine, schema)
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def engine(request):
+    """A freshly migrated database on each backend"""
+    return request.getfixturevalue(f"{request.param}_engine")
@@ -0,0 +1,142 @@
+import csv
+
+import pandas as pd
+import pytest
+from sqlalchemy import select, text
+
+from app.models import IngestionWatermark
+from scripts import ingest
+from scripts.ingest import LoadRefused, load_all
+
+COLUMNS = {
+    "distribution_centers": ["id", "name", "latitude", "longitude"],
+    "products": ["id", "cost", "category", "name", "brand", "retail_price", "department", "sku",
+                 "distribution_center_id"],
+    "inventory_items": ["id", "product_id", "created_at", "sold_at", "cost", "product_category", "product_name",
+                        "product_brand", "product_retail_price", "product_department", "product_sku",
+                        "product_distribution_center_id"],
+    "users": ["id", "first_name", "last_name", "email", "age", "gender", "state", "street_address", "postal_code",
+              "city", "country", "latitude", "longitude", "traffic_source", "created_at"],
+    "orders": ["order_id", "user_id", "status", "gender", "created_at", "returned_at", "shipped_at", "delivered_at",
+               "num_of_item"],
+    "order_items": ["id", "order_id", "user_id", "product_id", "inventory_item_id", "status", "created_at",
+                    "shipped_at", "delivered_at", "returned_at", "sale_price"],
+}
+
+def export():
+    """A small, consistent export; the latest order timestamp is in the first rows"""
+    return {
+        "distribution_centers": [[1, "DC 1", 25.5, -75.3], [2, "DC 2", 40.1, -73.9]],
+        "products": [[i, 10.0 * i, "Jeans", f"Product {i}", "Levi's", 20.0 * i, "Women", f"SKU{i}", 1 + i % 2]
+                     for i in range(1, 5)],
+        "inventory_items": [[i, 1 + i % 4, f"2022-01-0{i} 08:00:00 UTC", "", 10.0, "Jeans", f"Product {1 + i % 4}",
+                             "Levi's", 20.0, "Women", f"SKU{1 + i % 4}", 1 + i % 2] for i in range(1, 7)],
+        "users": [[i, "Ann", "Lee", f"user{i}@example.com", 30, "F", "CA", "1 Main St", "90210", "LA", "US",
+                   34.0, -118.2, "Search", f"2022-02-0{i} 09:00:00 UTC"] for i in range(1, 5)],
+        "orders": [[1, 1, "Complete", "F", "2022-03-01 10:00:00 UTC", "", "2022-03-02 10:00:00 UTC",
+                    "2023-06-01 10:00:00 UTC", 1]]
+                  + [[i, 1 + i % 4, "Processing", "F", f"2022-03-0{i} 10:00:00 UTC", "", "", "", 1] for i in range(2, 6)],
+        "order_items": [[i, 1 + i % 5, 1 + (1 + i % 5) % 4, 1 + i % 4, i, "Processing", f"2022-03-0{1 + i % 5} 11:00:00 UTC",
+                         "", "", "", 19.99] for i in range(1, 7)],
+    }
+
+def write_export(directory, tables):
+    directory.mkdir(exist_ok=True)
+    for name, rows in tables.items():
+        with open(directory / f"{name}.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS[name])
+            writer.writerows(rows)
+    return str(directory)
+
+def row_counts(engine):
+    with engine.connect() as connection:
+        return {name: connection.execute(text(f'SELECT COUNT(*) FROM "{name}"')).scalar() for name in COLUMNS}
+
+def watermark(engine, table_name):
+    with engine.connect() as connection:
+        return pd.Timestamp(connection.execute(
+            select(IngestionWatermark.watermark).where(IngestionWatermark.table_name == table_name)
+        ).scalar())
+
+def test_resume_loads_the_rest_of_an_interrupted_load_once(engine, tmp_path, monkeypatch):
+    csv_dir = write_export(tmp_path / "csv", export())
+    quarantine_dir = str(tmp_path / "quarantine")
+
+    write_chunk = ingest.write_chunk
+    calls = []
+
+    def fail_on_second_orders_chunk(connection, table, df):
+        if table.name == "orders":
+            calls.append(len(df))
+            if len(calls) == 2:
+                raise ConnectionError("connection lost")
+        write_chunk(connection, table, df)
+
+    monkeypatch.setattr(ingest, "write_chunk", fail_on_second_orders_chunk)
+    with pytest.raises(ConnectionError):
+        load_all(engine, csv_dir, chunk_size=2, quarantine_dir=quarantine_dir)
+    assert row_counts(engine)["orders"] == 2
+    monkeypatch.setattr(ingest, "write_chunk", write_chunk)
+
+    results = {stats.table: stats for stats in load_all(engine, csv_dir, chunk_size=2, resume=True,
+                                                         quarantine_dir=quarantine_dir)}
+
+    assert row_counts(engine) == {name: len(rows) for name, rows in export().items()}
+    assert results["orders"].resumed == 2
+    assert results["orders"].rows == 3
+    assert results["products"].resumed == 4
+    assert sum(stats.quarantined for stats in results.values()) == 0
+    # The latest timestamp was in a chunk the resumed run skipped
+    assert watermark(engine, "orders") == pd.Timestamp("2023-06-01 10:00:00")
+
+def test_resume_is_refused_once_the_input_changed(engine, tmp_path, monkeypatch):
+    tables = export()
+    csv_dir = write_export(tmp_path / "csv", tables)
+    quarantine_dir = str(tmp_path / "quarantine")
+    monkeypatch.setattr(ingest, "write_chunk", lambda connection, table, df: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        load_all(engine, csv_dir, chunk_size=2, quarantine_dir=quarantine_dir)
+    monkeypatch.undo()
+
+    tables["users"][0][1] = "Changed"
+    write_export(tmp_path / "csv", tables)
+
+    with pytest.raises(LoadRefused, match="users"):
+        load_all(engine, csv_dir, chunk_size=2, resume=True, quarantine_dir=quarantine_dir)
+
+def test_full_load_into_loaded_tables_is_refused(engine, tmp_path):
+    csv_dir = write_export(tmp_path / "csv", export())
+    load_all(engine, csv_dir, chunk_size=2, quarantine_dir=str(tmp_path / "quarantine"))
+
+    with pytest.raises(LoadRefused, match="--incremental"):
+        load_all(engine, csv_dir, chunk_size=2, quarantine_dir=str(tmp_path / "quarantine"))
+
+def test_incremental_load_applies_new_and_changed_rows(engine, tmp_path):
+    tables = export()
+    csv_dir = write_export(tmp_path / "csv", tables)
+    quarantine_dir = str(tmp_path / "quarantine")
+    load_all(engine, csv_dir, chunk_size=2, quarantine_dir=quarantine_dir)
+
+    # A shipped order, a new user with a new order, and a renamed product (a table without timestamps)
+    tables["orders"][2][2] = "Shipped"
+    tables["orders"][2][6] = "2023-07-01 10:00:00 UTC"
+    tables["users"].append([5, "Bo", "Kim", "user5@example.com", 41, "M", "NY", "2 Side St", "10001", "NYC", "US",
+                            40.7, -74.0, "Email", "2023-07-02 09:00:00 UTC"])
+    tables["orders"].append([6, 5, "Processing", "M", "2023-07-02 10:00:00 UTC", "", "", "", 1])
+    tables["products"][1][3] = "Renamed"
+    write_export(tmp_path / "csv", tables)
+
+    results = {stats.table: stats for stats in load_all(engine, csv_dir, chunk_size=2, incremental=True,
+                                                         quarantine_dir=quarantine_dir)}
+
+    assert row_counts(engine) == {name: len(rows) for name, rows in tables.items()}
+    with engine.connect() as connection:
+        status, shipped_at = connection.execute(text("SELECT status, shipped_at FROM orders WHERE order_id = 3")).one()
+        assert (status, pd.Timestamp(shipped_at)) == ("Shipped", pd.Timestamp("2023-07-01 10:00:00"))
+        assert connection.execute(text("SELECT name FROM products WHERE id = 2")).scalar() == "Renamed"
+    assert results["distribution_centers"].rows == 0
+    # The two changes, plus the order at the old watermark, which is inclusive
+    assert (results["orders"].rows, results["orders"].unchanged) == (3, 3)
+    assert sum(stats.quarantined for stats in results.values()) == 0
+    assert watermark(engine, "users") == pd.Timestamp("2023-07-02 09:00:00")
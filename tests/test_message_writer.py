@@ -0,0 +1,84 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from app import message_writer as module
+from app.message_writer import MessageWriter
+
+fcntl = pytest.importorskip("fcntl")
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(module, "CHAT_WRITE_BEHIND_DIR", str(tmp_path))
+    return tmp_path
+
+def crashed_log(log_dir, records, torn=b""):
+    """A log left behind by a worker that died, ending in a partly written record"""
+    path = log_dir / "messages-4242-0badf00d.log"
+    path.write_bytes(b"".join(json.dumps(record).encode() + b"\n" for record in records) + torn)
+    return path
+
+def recording_writer(fails=False):
+    """A writer whose database writes are recorded instead of executed"""
+    writer = MessageWriter(enabled=True)
+    writer.written = []
+
+    async def write(rows, updates):
+        if fails:
+            raise ConnectionError("database unavailable")
+        writer.written.append((rows, updates))
+
+    writer._write = write
+    return writer
+
+RECORDS = [
+    {"op": "insert", "id": 11, "session_id": 1, "message_type": "user", "content": "where is my order",
+     "query_type": None, "query_type_source": None, "timestamp": "2024-05-01T10:00:00.123456"},
+    # Written before timestamps and label sources were logged
+    {"op": "insert", "id": 12, "session_id": 1, "message_type": "assistant", "content": "it shipped",
+     "query_type": None},
+    {"op": "query_type", "id": 11, "query_type": "order_status", "query_type_source": "local"},
+    # A label for a message that was already in the database
+    {"op": "query_type", "id": 7, "query_type": "product_search", "query_type_source": "llm"},
+]
+
+def test_replay_inserts_a_crashed_workers_log_and_removes_it(log_dir):
+    path = crashed_log(log_dir, RECORDS, torn=b'{"op": "insert", "id": 13, "ses')
+    writer = recording_writer()
+
+    asyncio.run(writer.replay())
+
+    [(rows, updates)] = writer.written
+    by_id = {row["id"]: row for row in rows}
+    # The torn record was never acknowledged, so it is dropped
+    assert sorted(by_id) == [11, 12]
+    assert by_id[11]["timestamp"] == datetime(2024, 5, 1, 10, 0, 0, 123456)
+    assert (by_id[11]["query_type"], by_id[11]["query_type_source"]) == ("order_status", "local")
+    assert isinstance(by_id[12]["timestamp"], datetime)
+    assert by_id[12]["query_type_source"] is None
+    assert updates == {7: {"query_type": "product_search", "query_type_source": "llm"}}
+    assert not path.exists()
+    assert writer.stats()["pending"] == 0
+
+def test_replay_keeps_the_log_when_the_database_refuses(log_dir):
+    path = crashed_log(log_dir, RECORDS)
+    writer = recording_writer(fails=True)
+
+    asyncio.run(writer.replay())
+
+    assert path.exists()
+    # Still pending, so the running writer retries them
+    assert sorted(row["id"] for row in writer.pending_messages(1)) == [11, 12]
+
+def test_replay_skips_a_running_workers_log(log_dir):
+    path = crashed_log(log_dir, RECORDS)
+    writer = recording_writer()
+
+    with open(path, "rb") as held:
+        fcntl.flock(held.fileno(), fcntl.LOCK_EX)
+        asyncio.run(writer.replay())
+
+    assert writer.written == []
+    assert path.exists()
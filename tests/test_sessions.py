@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from app import main
+from app.database import SessionLocal, engine as app_engine
+from app.models import ChatMessage, ChatSession
+from conftest import migrate
+
+@pytest.fixture(scope="module")
+def client():
+    migrate(app_engine)
+    with TestClient(main.app) as client:
+        yield client
+
+@pytest.fixture
+def sessions(client):
+    """Five sessions, two of them created in the same second, and their messages"""
+    with SessionLocal() as db:
+        db.execute(delete(ChatMessage))
+        db.execute(delete(ChatSession))
+        created = {
+            "oldest": datetime(2024, 1, 1, 9, 0),
+            "first": datetime(2024, 1, 1, 10, 0),
+            "tie-a": datetime(2024, 1, 1, 11, 0),
+            "tie-b": datetime(2024, 1, 1, 11, 0),
+            "newest": datetime(2024, 1, 1, 12, 0),
+        }
+        rows = {name: ChatSession(session_id=name, created_at=at) for name, at in created.items()}
+        db.add_all(rows.values())
+        db.flush()
+        db.add_all([
+            ChatMessage(session_id=rows["first"].id, message_type="user", content="hello",
+                        timestamp=datetime(2024, 1, 1, 10, 1)),
+            ChatMessage(session_id=rows["first"].id, message_type="assistant", content="hi there",
+                        timestamp=datetime(2024, 1, 1, 10, 2)),
+            ChatMessage(session_id=rows["tie-a"].id, message_type="user", content="same second 1",
+                        timestamp=datetime(2024, 1, 1, 11, 5)),
+            ChatMessage(session_id=rows["tie-a"].id, message_type="assistant", content="same second 2",
+                        timestamp=datetime(2024, 1, 1, 11, 5)),
+            ChatMessage(session_id=rows["tie-b"].id, message_type="user", content="tie b",
+                        timestamp=datetime(2024, 1, 1, 11, 6)),
+            ChatMessage(session_id=rows["newest"].id, message_type="user", content="latest",
+                        timestamp=datetime(2024, 1, 1, 12, 1)),
+        ])
+        db.commit()
+        return {name: row.id for name, row in rows.items()}
+
+def all_pages(client, **params):
+    pages, cursor = [], None
+    while True:
+        response = client.get("/api/sessions", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        page = response.json()
+        pages.append(page["sessions"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return pages
+
+def test_cursor_pages_cover_every_session_once_newest_first(client, sessions):
+    pages = all_pages(client, limit=2)
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    listed = [session["id"] for page in pages for session in page]
+    # Sessions created in the same second are ordered by id
+    assert listed == [sessions[name] for name in ("newest", "tie-b", "tie-a", "first", "oldest")]
+
+def test_sessions_carry_message_count_and_last_message(client, sessions):
+    listed = {session["session_id"]: session for page in all_pages(client, limit=2) for session in page}
+
+    assert listed["first"]["message_count"] == 2
+    assert listed["first"]["last_message"] == "hi there"
+    # Messages stamped in the same second: the later id is the last one
+    assert listed["tie-a"]["last_message"] == "same second 2"
+    assert listed["oldest"]["message_count"] == 0
+    assert listed["oldest"]["last_message"] is None
+    assert listed["oldest"]["last_message_at"] is None
+
+def test_transcripts_only_with_include_messages(client, sessions):
+    without = client.get("/api/sessions", params={"limit": 5}).json()["sessions"]
+    with_messages = client.get("/api/sessions", params={"limit": 5, "include_messages": True}).json()["sessions"]
+
+    assert all(session["messages"] is None for session in without)
+    first = next(session for session in with_messages if session["session_id"] == "first")
+    assert [message["content"] for message in first["messages"]] == ["hello", "hi there"]
+
+def test_malformed_cursor_is_rejected(client, sessions):
+    response = client.get("/api/sessions", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400